@@ -1,20 +1,51 @@
 from __future__ import annotations
 
+import atexit
+import contextvars
 import csv
-import io
 import json
+import multiprocessing
 import os
 import re
+import secrets
 import socket
 import sqlite3
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from decimal import Decimal, InvalidOperation, ROUND_DOWN, ROUND_HALF_UP
-from datetime import date, datetime
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial
 from pathlib import Path
-
-from flask import Flask, Response, flash, redirect, render_template, request, url_for
+from typing import Iterable, Iterator, NamedTuple
+
+from flask import (
+    Flask,
+    Response,
+    abort,
+    flash,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    session,
+    stream_template,
+    url_for,
+)
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 from openpyxl import Workbook
 
+try:
+    import fcntl
+except ImportError:  # Windows (executar.bat): sem trava entre processos
+    fcntl = None
+
 # In executables (PyInstaller), persist files beside the .exe.
 BASE_DIR = (
     Path(sys.executable).resolve().parent
@@ -31,21 +62,7 @@ DATA_DIR = (
     else BASE_DIR / "dados"
 )
 DATABASE_PATH = DATA_DIR / "fundef.db"
-FUNDEF_DATA_INICIAL = date(1997, 1, 1)
-FUNDEF_DATA_FINAL = date(2006, 12, 31)
-CARGA_HORARIA_SEMANAL_FIXA = 20
 VALOR_PADRAO_PRECATORIO = "5.632.494,99"
-ESCOLA_OPCOES = {
-    "escola": "Escola",
-    "seduc": "Seduc",
-}
-SITUACAO_SERVIDOR_OPCOES = {
-    "ativo": "Ativo",
-    "aposentado": "Aposentado",
-    "falecido": "Falecido",
-    "sem vínculo": "Sem vínculo",
-    "sem vinculo": "Sem vínculo",
-}
 
 app = Flask(
     __name__,
@@ -100,41 +117,132 @@ FORM_FIELDS = [
     "aceitou_declaracao",
 ]
 
+# validação/normalização (compilada uma vez, sem dependência de Flask)
+from validacao import (
+    CARGA_HORARIA_SEMANAL_FIXA,
+    ESCOLA_OPCOES,
+    FUNDEF_DATA_FINAL,
+    FUNDEF_DATA_INICIAL,
+    SITUACAO_SERVIDOR_OPCOES,
+    alteracoes_importacao,
+    calcular_meses_trabalhados,
+    cpf_valido,
+    hash_linha,
+    linha_para_payload,
+    mapear_cabecalhos,
+    normalizar_dados_formulario,
+    normalizar_escola,
+    normalizar_situacao_servidor,
+    only_digits,
+    preparar_linha_importacao,
+    tentar_calcular_meses_validos,
+    validar_cpfs_lote,
+    validar_dados,
+    validar_edicao_em_lote,
+    validar_lote,
+)
+
+from busca import IndiceBusca
+from importacao import (
+    EXTENSOES_CSV,
+    EXTENSOES_EXCEL,
+    Lote,
+    Preparados,
+    analisar_arquivo,
+    em_lotes,
+    linhas_csv,
+    linhas_excel,
+    preparar_em_processos,
+)
+from compressao import MiddlewareCompressao
+from estaticos import CACHE_IMUTAVEL, Estaticos
+from logs import configurar_logs
+from perfil import MiddlewarePerfil
+
 # camada de dados (Firestore por padrão, fallback para SQLite se USE_FIREBASE=0)
 from db_layer import (
     USE_FIREBASE,
     init_db as db_init,
     list_professores as db_list_professores,
     list_rascunhos as db_list_rascunhos,
-    find_professor_by_cpf as db_find_professor_by_cpf,
     get_professor as db_get_professor,
     insert_professor as db_insert_professor,
     update_professor as db_update_professor,
     delete_professor as db_delete_professor,
+    update_professores_em_lote as db_update_professores_em_lote,
+    delete_professores_em_lote as db_delete_professores_em_lote,
+    get_importacao as db_get_importacao,
+    registrar_importacao as db_registrar_importacao,
+    hashes_importacao as db_hashes_importacao,
     save_rascunho as db_save_rascunho,
     carregar_rascunho as db_carregar_rascunho,
     remover_rascunho as db_remover_rascunho,
+    atualizar_campos_rascunho as db_atualizar_campos_rascunho,
+    expirar_rascunhos as db_expirar_rascunhos,
+    CpfDuplicado,
+    ErroBackend,
+    RascunhoNaoEncontrado,
+    contagem_chamadas_ativa,
+    encerrar_contagem_chamadas,
+    iniciar_contagem_chamadas,
+    registrar_chamada,
+    situacao_disjuntor,
+    estado_firebase,
+    sondar_firestore,
     export_professores as db_export_professores,
     get_professores_for_rateio as db_professores_rateio,
+    get_totais_rateio as db_totais_rateio,
+    get_estatisticas as db_get_estatisticas,
+    reconstruir_estatisticas as db_reconstruir_estatisticas,
+    DIMENSOES_ESTATISTICAS,
+    VALOR_NAO_INFORMADO,
 )
 
+logger = configurar_logs().getChild("app")
 
-def get_connection() -> sqlite3.Connection:
-    db_path = DATABASE_PATH
+
+_data_dir_gravavel: Path | None = None
+
+
+def get_data_dir() -> Path:
+    global _data_dir_gravavel
+    if _data_dir_gravavel is not None:
+        return _data_dir_gravavel
     try:
         DATA_DIR.mkdir(parents=True, exist_ok=True)
+        _data_dir_gravavel = DATA_DIR
     except OSError:
         # Em ambientes como Vercel, o código fica em filesystem somente leitura.
         # Usa /tmp/dados como fallback gravável (dados não são persistentes entre deploys).
         tmp_dir = Path("/tmp") / "dados"
         tmp_dir.mkdir(parents=True, exist_ok=True)
-        db_path = tmp_dir / "fundef.db"
+        _data_dir_gravavel = tmp_dir
+    return _data_dir_gravavel
+
+
+# conexões abertas desde o início do processo (uma por uso; não há pool)
+_conexoes_sqlite_criadas = 0
+_lock_conexoes_sqlite = threading.Lock()
 
+
+def get_connection() -> sqlite3.Connection:
+    global _conexoes_sqlite_criadas
+    db_path = get_data_dir() / DATABASE_PATH.name
     connection = sqlite3.connect(db_path)
+    with _lock_conexoes_sqlite:
+        _conexoes_sqlite_criadas += 1
     connection.row_factory = sqlite3.Row
+    if contagem_chamadas_ativa():
+        connection.set_trace_callback(_contar_comando_sqlite)
     return connection
 
 
+def _contar_comando_sqlite(sql: str) -> None:
+    # comandos executados por triggers chegam como comentários "-- ..."
+    if not sql.startswith("--"):
+        registrar_chamada(f"sqlite:{sql.split(None, 1)[0].upper()}")
+
+
 def init_db() -> None:
     with get_connection() as conn:
         conn.execute(
@@ -200,6 +308,14 @@ def init_db() -> None:
                     """
                 )
 
+        if "atualizado_em" not in colunas:
+            # revisão da linha (cache de fragmentos do index); vazio até a 1ª edição
+            conn.execute("ALTER TABLE professores ADD COLUMN atualizado_em TEXT")
+
+        if "hash_importacao" not in colunas:
+            # hash da linha da planilha de origem; vazio após edição manual
+            conn.execute("ALTER TABLE professores ADD COLUMN hash_importacao TEXT")
+
         if "situacao_servidor" not in colunas:
             conn.execute("ALTER TABLE professores ADD COLUMN situacao_servidor TEXT")
             conn.execute(
@@ -219,6 +335,8 @@ def init_db() -> None:
             (CARGA_HORARIA_SEMANAL_FIXA, CARGA_HORARIA_SEMANAL_FIXA),
         )
 
+        criar_estatisticas_sqlite(conn)
+
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS rascunhos_professores (
@@ -232,44 +350,103 @@ def init_db() -> None:
             """
         )
 
-
-def get_table_columns(conn: sqlite3.Connection, table_name: str) -> set[str]:
-    return {linha["name"] for linha in conn.execute(f"PRAGMA table_info({table_name})").fetchall()}
-
-
-def only_digits(value: str) -> str:
-    return re.sub(r"\D", "", value or "")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS importacoes (
+                hash_arquivo TEXT PRIMARY KEY,
+                nome_arquivo TEXT NOT NULL DEFAULT '',
+                criado_em TEXT NOT NULL,
+                linhas INTEGER NOT NULL DEFAULT 0,
+                inseridos INTEGER NOT NULL DEFAULT 0,
+                atualizados INTEGER NOT NULL DEFAULT 0,
+                inalterados INTEGER NOT NULL DEFAULT 0,
+                duplicados INTEGER NOT NULL DEFAULT 0,
+                erros INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
 
 
-def cpf_valido(cpf: str) -> bool:
-    cpf = only_digits(cpf)
-    if len(cpf) != 11:
-        return False
-    if cpf == cpf[0] * 11:
-        return False
+# Expressão SQL do valor de cada dimensão de ``estatisticas`` para uma linha
+# de ``professores`` ({t} = NEW, OLD ou alias da tabela).
+_EXPRESSOES_ESTATISTICAS = {
+    "total": "''",
+    "escola": "COALESCE(NULLIF(TRIM({t}.escola), ''), 'Não informado')",
+    "cargo": "COALESCE(NULLIF(TRIM({t}.cargo), ''), 'Não informado')",
+    "situacao_servidor": "COALESCE(NULLIF(TRIM({t}.situacao_servidor), ''), 'Não informado')",
+    "meses": "COALESCE(NULLIF(CAST({t}.quantidade_meses_trabalhados AS TEXT), ''), 'Não informado')",
+}
 
-    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    digito_1 = (soma * 10 % 11) % 10
-    if digito_1 != int(cpf[9]):
-        return False
 
-    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    digito_2 = (soma * 10 % 11) % 10
-    return digito_2 == int(cpf[10])
+def _sql_valores_estatisticas(linha: str, sinal: int) -> str:
+    """VALUES com as linhas de ``estatisticas`` afetadas pelo registro NEW/OLD."""
+    return ", ".join(
+        f"('{dimensao}', {expressao.format(t=linha)}, {sinal})"
+        for dimensao, expressao in _EXPRESSOES_ESTATISTICAS.items()
+    )
 
 
-def calcular_meses_trabalhados(data_inicio: date, data_fim: date) -> int:
-    return (data_fim.year - data_inicio.year) * 12 + (data_fim.month - data_inicio.month) + 1
+def criar_estatisticas_sqlite(conn: sqlite3.Connection) -> None:
+    """Tabela agregada ``estatisticas`` mantida por triggers em ``professores``."""
+    existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estatisticas'"
+    ).fetchone()
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS estatisticas (
+            dimensao TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimensao, valor)
+        )
+        """
+    )
+    upsert = "ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + excluded.total"
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS estatisticas_apos_insert AFTER INSERT ON professores
+        BEGIN
+            INSERT INTO estatisticas (dimensao, valor, total)
+            VALUES {_sql_valores_estatisticas("NEW", 1)} {upsert};
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS estatisticas_apos_delete AFTER DELETE ON professores
+        BEGIN
+            INSERT INTO estatisticas (dimensao, valor, total)
+            VALUES {_sql_valores_estatisticas("OLD", -1)} {upsert};
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS estatisticas_apos_update
+        AFTER UPDATE OF escola, cargo, situacao_servidor, quantidade_meses_trabalhados ON professores
+        BEGIN
+            INSERT INTO estatisticas (dimensao, valor, total)
+            VALUES {_sql_valores_estatisticas("OLD", -1)} {upsert};
+            INSERT INTO estatisticas (dimensao, valor, total)
+            VALUES {_sql_valores_estatisticas("NEW", 1)} {upsert};
+        END
+        """
+    )
+    if not existia:
+        reconstruir_estatisticas_sqlite(conn)
 
 
-def normalizar_escola(value: str) -> str:
-    texto = (value or "").strip()
-    return ESCOLA_OPCOES.get(texto.lower(), texto)
+def reconstruir_estatisticas_sqlite(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM estatisticas")
+    consultas = " UNION ALL ".join(
+        f"SELECT '{dimensao}', {expressao.format(t='p')}, COUNT(*) FROM professores AS p GROUP BY 2"
+        for dimensao, expressao in _EXPRESSOES_ESTATISTICAS.items()
+    )
+    conn.execute(f"INSERT INTO estatisticas (dimensao, valor, total) {consultas}")
 
 
-def normalizar_situacao_servidor(value: str) -> str:
-    texto = (value or "").strip()
-    return SITUACAO_SERVIDOR_OPCOES.get(texto.lower(), texto)
+def get_table_columns(conn: sqlite3.Connection, table_name: str) -> set[str]:
+    return {linha["name"] for linha in conn.execute(f"PRAGMA table_info({table_name})").fetchall()}
 
 
 def parse_decimal_input(value: str) -> Decimal:
@@ -326,6 +503,15 @@ def distribuir_rateio(valor_total_rateio: Decimal, pesos: list[Decimal]) -> list
 
 @app.template_filter("moeda_br")
 def formatar_moeda_br(valor: object) -> str:
+    # tabelas de rateio repetem os mesmos valores (mesmos meses, mesma cota)
+    try:
+        return _formatar_moeda_br(valor)
+    except TypeError:  # valor não hashable
+        return _formatar_moeda_br.__wrapped__(valor)
+
+
+@lru_cache(maxsize=4096, typed=True)
+def _formatar_moeda_br(valor: object) -> str:
     try:
         numero = Decimal(str(valor))
     except (InvalidOperation, TypeError, ValueError):
@@ -340,88 +526,78 @@ def formatar_moeda_br(valor: object) -> str:
     return f"{sinal}R$ {inteiro_formatado},{decimal}"
 
 
-def validar_dados(form: dict[str, str]) -> tuple[list[str], int | None]:
-    erros: list[str] = []
-    meses_calculados: int | None = None
-
-    obrigatorios = {
-        "nome": "Nome completo",
-        "cpf": "CPF",
-        "escola": "Local de Trabalho",
-        "cargo": "Cargo",
-        "situacao_servidor": "Situação do servidor",
-        "data_admissao": "Data de admissão",
-        "endereco": "Endereço",
-        "banco": "Banco",
-        "agencia": "Agência",
-        "conta": "Conta",
-        "tipo_conta": "Tipo de conta",
-        "data_inicio_fundef": "Data inicial FUNDEF",
-        "data_fim_fundef": "Data final FUNDEF",
-        "carga_horaria": "Carga horária",
-    }
-
-    for campo, nome_legivel in obrigatorios.items():
-        if not form.get(campo, "").strip():
-            erros.append(f"{nome_legivel} é obrigatório.")
-
-    cpf = form.get("cpf", "")
-    if cpf and not cpf_valido(cpf):
-        erros.append("CPF inválido.")
-
-    escola = normalizar_escola(form.get("escola", ""))
-    if escola and escola not in ESCOLA_OPCOES.values():
-        erros.append('O campo Local de Trabalho deve ser "Escola" ou "Seduc".')
-
-    situacao_servidor = normalizar_situacao_servidor(form.get("situacao_servidor", ""))
-    if situacao_servidor and situacao_servidor not in SITUACAO_SERVIDOR_OPCOES.values():
-        erros.append(
-            'A situação do servidor deve ser "Ativo", "Aposentado", "Falecido" ou "Sem vínculo".'
-        )
-
-    telefone = only_digits(form.get("telefone", ""))
-    if telefone and len(telefone) not in (10, 11):
-        erros.append("Telefone deve ter 10 ou 11 dígitos.")
-
-    email = form.get("email", "").strip()
-    if email and not re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", email):
-        erros.append("E-mail inválido.")
-
-    data_inicio = form.get("data_inicio_fundef", "")
-    data_fim = form.get("data_fim_fundef", "")
-    try:
-        data_inicio_dt = datetime.strptime(data_inicio, "%Y-%m-%d").date()
-        data_fim_dt = datetime.strptime(data_fim, "%Y-%m-%d").date()
-        if data_inicio_dt > data_fim_dt:
-            erros.append("A data inicial do FUNDEF não pode ser maior que a data final.")
-        else:
-            if data_inicio_dt < FUNDEF_DATA_INICIAL or data_fim_dt > FUNDEF_DATA_FINAL:
-                erros.append(
-                    "As datas do FUNDEF devem estar entre 01/01/1997 e 31/12/2006 "
-                    "(período de vigência)."
-                )
-            else:
-                meses_calculados = calcular_meses_trabalhados(data_inicio_dt, data_fim_dt)
-                if meses_calculados < 1 or meses_calculados > 120:
-                    erros.append(
-                        "O período informado deve resultar em quantidade de meses entre 1 e 120."
-                    )
-    except ValueError:
-        erros.append("As datas do FUNDEF devem estar em formato válido.")
-
-    try:
-        carga = int(form.get("carga_horaria", "0"))
-        if carga != CARGA_HORARIA_SEMANAL_FIXA:
-            erros.append(
-                "A carga horária do período do FUNDEF é fixa em 20 horas semanais."
-            )
-    except ValueError:
-        erros.append("A carga horária deve ser numérica.")
-
-    if form.get("aceitou_declaracao") != "on":
-        erros.append("É necessário aceitar a declaração de veracidade.")
-
-    return erros, meses_calculados
+# static/ com nomes versionados pelo hash e variantes gzip/brotli, montados uma vez
+estaticos = Estaticos(Path(app.static_folder)).carregar()
+
+
+@app.template_global()
+def url_estatico(nome: str) -> str:
+    """URL versionada (cache imutável) de um arquivo de static/."""
+    versionado = estaticos.nome_versionado(nome)
+    if versionado is None:
+        return url_for("static", filename=nome)
+    return url_for("estatico_versionado", nome=versionado)
+
+
+# Bytecode dos templates em DATA_DIR: um processo novo (cold start, worker
+# reiniciado) carrega os templates sem recompilá-los.
+_dir_bytecode_jinja = get_data_dir() / "jinja"
+_dir_bytecode_jinja.mkdir(parents=True, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(_dir_bytecode_jinja))
+
+# Linhas da tabela do index já renderizadas, por (id, revisão). A revisão é
+# atualizado_em (gravado com microssegundos a cada edição) ou, antes da
+# primeira edição, criado_em; a página só renderiza as linhas que mudaram.
+CACHE_LINHAS_MAX = int(os.environ.get("CACHE_LINHAS_MAX", "10000") or 0)
+_cache_linhas: OrderedDict[tuple[object, object], Markup] = OrderedDict()
+_lock_cache_linhas = threading.Lock()
+
+
+def carimbo_revisao() -> str:
+    return datetime.now().isoformat(sep=" ", timespec="microseconds")
+
+
+@app.template_global()
+def linha_professor(professor: dict[str, object]) -> Markup:
+    revisao = professor.get("atualizado_em") or professor.get("criado_em")
+    chave = (professor.get("id"), revisao)
+    if CACHE_LINHAS_MAX > 0 and revisao:
+        with _lock_cache_linhas:
+            html = _cache_linhas.get(chave)
+            if html is not None:
+                _cache_linhas.move_to_end(chave)
+                return html
+    html = Markup(app.jinja_env.get_template("linha_professor.html").render(p=professor))
+    if CACHE_LINHAS_MAX > 0 and revisao:
+        with _lock_cache_linhas:
+            _cache_linhas[chave] = html
+            while len(_cache_linhas) > CACHE_LINHAS_MAX:
+                _cache_linhas.popitem(last=False)
+    return html
+
+
+@app.route("/estaticos/<path:nome>")
+def estatico_versionado(nome: str) -> Response:
+    arquivo = estaticos.buscar(nome)
+    if arquivo is None:
+        # hash de outra versão (página antiga em cache): manda para o arquivo
+        # atual pela rota comum, que não tem cache longo
+        original = estaticos.nome_original(nome)
+        if original is None:
+            abort(404)
+        return redirect(url_for("static", filename=original))
+    codificacao = estaticos.escolher_variante(arquivo, request.headers.get("Accept-Encoding", ""))
+    etag = f"{arquivo.hash}-{codificacao}"
+    if request.if_none_match.contains(etag):
+        resposta = Response(status=304)
+    else:
+        resposta = Response(arquivo.variantes[codificacao], mimetype=arquivo.tipo)
+        if codificacao != "identity":
+            resposta.headers["Content-Encoding"] = codificacao
+    resposta.set_etag(etag)
+    resposta.headers["Cache-Control"] = CACHE_IMUTAVEL
+    resposta.vary.add("Accept-Encoding")
+    return resposta
 
 
 def coletar_dados_formulario(form: dict[str, str]) -> dict[str, str]:
@@ -434,41 +610,10 @@ def coletar_dados_formulario(form: dict[str, str]) -> dict[str, str]:
     return dados
 
 
-def normalizar_dados_formulario(dados: dict[str, str]) -> dict[str, str]:
-    dados_normalizados = dict(dados)
-    dados_normalizados["escola"] = normalizar_escola(dados_normalizados.get("escola", ""))
-    dados_normalizados["situacao_servidor"] = normalizar_situacao_servidor(
-        dados_normalizados.get("situacao_servidor", "")
-    )
-    dados_normalizados["carga_horaria"] = str(CARGA_HORARIA_SEMANAL_FIXA)
-    dados_normalizados["cpf"] = only_digits(dados_normalizados.get("cpf", ""))
-    return dados_normalizados
-
-
-def tentar_calcular_meses_validos(dados: dict[str, str]) -> int | None:
-    data_inicio = dados.get("data_inicio_fundef", "")
-    data_fim = dados.get("data_fim_fundef", "")
-    if not data_inicio or not data_fim:
-        return None
-
-    try:
-        data_inicio_dt = datetime.strptime(data_inicio, "%Y-%m-%d").date()
-        data_fim_dt = datetime.strptime(data_fim, "%Y-%m-%d").date()
-    except ValueError:
-        return None
-
-    if data_inicio_dt > data_fim_dt:
-        return None
-    if data_inicio_dt < FUNDEF_DATA_INICIAL or data_fim_dt > FUNDEF_DATA_FINAL:
-        return None
-
-    meses = calcular_meses_trabalhados(data_inicio_dt, data_fim_dt)
-    if meses < 1 or meses > 120:
-        return None
-    return meses
-
-
 def salvar_rascunho_cadastro(dados: dict[str, str], rascunho_id: int | None = None) -> int:
+    if rascunho_id:
+        # o formulário completo substitui qualquer autosave ainda pendente
+        autosave_rascunhos.descartar(int(rascunho_id))
     payload = {campo: dados.get(campo, "") for campo in FORM_FIELDS}
     payload["carga_horaria"] = str(CARGA_HORARIA_SEMANAL_FIXA)
     # usa camada de dados (Firestore ou SQLite)
@@ -478,6 +623,8 @@ def salvar_rascunho_cadastro(dados: dict[str, str], rascunho_id: int | None = No
             return db_save_rascunho(payload, rascunho_id)
         except Exception:
             return 0
+        finally:
+            marcar_registro_alterado("rascunhos")
 
     # SQLite fallback: persiste na tabela rascunhos_professores
     dados_json = json.dumps({"dados": payload}, ensure_ascii=False)
@@ -494,6 +641,7 @@ def salvar_rascunho_cadastro(dados: dict[str, str], rascunho_id: int | None = No
                 """,
                 (nome_referencia, cpf, dados_json, agora, int(rascunho_id)),
             )
+        marcar_registro_alterado("rascunhos")
         return int(rascunho_id)
 
     with get_connection() as conn:
@@ -504,10 +652,15 @@ def salvar_rascunho_cadastro(dados: dict[str, str], rascunho_id: int | None = No
             """,
             (nome_referencia, cpf, dados_json, agora, agora),
         )
-        return int(cur.lastrowid or 0)
+    marcar_registro_alterado("rascunhos")
+    return int(cur.lastrowid or 0)
 
 
 def carregar_rascunho_cadastro(rascunho_id: int) -> dict[str, object] | None:
+    try:
+        autosave_rascunhos.descarregar(int(rascunho_id))
+    except RascunhoNaoEncontrado:
+        return None
     # Recupera o documento (Firestore) ou a linha (SQLite) e normaliza vários formatos
     payload: dict[str, object] = {}
     source: dict[str, object] = {}
@@ -569,12 +722,873 @@ def carregar_rascunho_cadastro(rascunho_id: int) -> dict[str, object] | None:
 
 
 def remover_rascunho(rascunho_id: int) -> None:
+    autosave_rascunhos.descartar(int(rascunho_id))
     if USE_FIREBASE:
-        return db_remover_rascunho(rascunho_id)
+        db_remover_rascunho(rascunho_id)
+    else:
+        with get_connection() as conn:
+            conn.execute("DELETE FROM rascunhos_professores WHERE id = ?", (int(rascunho_id),))
+    marcar_registro_alterado("rascunhos")
+    return None
+
+
+def gravar_campos_rascunho(rascunho_id: int | None, campos: dict[str, str]) -> int:
+    """Aplica só os campos alterados de um rascunho, sem ler o registro antes.
 
+    Só cria o rascunho quando ``rascunho_id`` é None. Um rascunho que sumiu
+    (concluído em cadastro ou excluído) levanta ``RascunhoNaoEncontrado``:
+    um autosave atrasado, ou o timer de outro worker, não pode recriá-lo.
+    """
+    if USE_FIREBASE:
+        novo_id = db_atualizar_campos_rascunho(rascunho_id, campos)
+        marcar_registro_alterado("rascunhos")
+        return novo_id
+
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    patch = json.dumps({"dados": campos}, ensure_ascii=False)
+    nome_referencia = (campos["nome"] or "")[:200] if "nome" in campos else None
     with get_connection() as conn:
-        conn.execute("DELETE FROM rascunhos_professores WHERE id = ?", (int(rascunho_id),))
-    return None
+        if rascunho_id is not None:
+            cur = conn.execute(
+                """
+                UPDATE rascunhos_professores
+                SET dados_json = json_patch(dados_json, ?),
+                    nome_referencia = COALESCE(?, nome_referencia),
+                    cpf = COALESCE(?, cpf),
+                    atualizado_em = ?
+                WHERE id = ?
+                """,
+                (patch, nome_referencia, campos.get("cpf"), agora, int(rascunho_id)),
+            )
+            if cur.rowcount == 0:
+                raise RascunhoNaoEncontrado(int(rascunho_id))
+        else:
+            cur = conn.execute(
+                """
+                INSERT INTO rascunhos_professores (nome_referencia, cpf, dados_json, criado_em, atualizado_em)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (nome_referencia or "", campos.get("cpf", ""), patch, agora, agora),
+            )
+            rascunho_id = cur.lastrowid
+    marcar_registro_alterado("rascunhos")
+    return int(rascunho_id or 0)
+
+
+class AutosaveRascunhos:
+    """Agrupa os salvamentos automáticos de cada rascunho.
+
+    A primeira alteração de um rascunho é gravada na hora; as que chegam
+    dentro de ``intervalo`` segundos são acumuladas e gravadas juntas ao fim
+    da janela, por um timer. O estado é por processo: um worker só agrupa
+    as requisições que ele mesmo recebe. O que sobra de cada rascunho depois
+    da janela (hora da última gravação, lock) é podado aos poucos.
+    """
+
+    def __init__(self, gravar, intervalo: float) -> None:
+        self._gravar = gravar
+        self._intervalo = intervalo
+        self._lock = threading.Lock()
+        self._pendentes: dict[int, dict[str, str]] = {}
+        self._ultima_gravacao: dict[int, float] = {}
+        self._timers: dict[int, threading.Timer] = {}
+        self._locks_gravacao: dict[int, threading.Lock] = {}
+        # tamanho de _ultima_gravacao que dispara a próxima poda
+        self._limite_poda = 256
+
+    def agendar(self, rascunho_id: int, campos: dict[str, str]) -> bool:
+        """Registra alterações; retorna True se foram gravadas imediatamente.
+
+        Repassa ``RascunhoNaoEncontrado`` de uma gravação imediata.
+        """
+        with self._lock:
+            if len(self._ultima_gravacao) >= self._limite_poda:
+                self._podar()
+            self._pendentes.setdefault(rascunho_id, {}).update(campos)
+            espera = (
+                self._ultima_gravacao.get(rascunho_id, float("-inf"))
+                + self._intervalo
+                - time.monotonic()
+            )
+            if espera > 0:
+                if rascunho_id not in self._timers:
+                    timer = threading.Timer(espera, self._descarregar_no_timer, args=(rascunho_id,))
+                    timer.daemon = True
+                    self._timers[rascunho_id] = timer
+                    timer.start()
+                return False
+        self.descarregar(rascunho_id)
+        return True
+
+    def descarregar(self, rascunho_id: int) -> None:
+        """Grava agora as alterações pendentes do rascunho, se houver."""
+        with self._lock:
+            lock_gravacao = self._locks_gravacao.setdefault(rascunho_id, threading.Lock())
+        with lock_gravacao:
+            with self._lock:
+                campos = self._pendentes.pop(rascunho_id, None)
+                timer = self._timers.pop(rascunho_id, None)
+                if campos:
+                    self._ultima_gravacao[rascunho_id] = time.monotonic()
+            if timer is not None:
+                timer.cancel()
+            if campos:
+                try:
+                    self._gravar(rascunho_id, campos)
+                except RascunhoNaoEncontrado:
+                    # a próxima alteração é gravada na hora e o cliente fica sabendo
+                    self.descartar(rascunho_id)
+                    raise
+
+    def _descarregar_no_timer(self, rascunho_id: int) -> None:
+        try:
+            self.descarregar(rascunho_id)
+        except RascunhoNaoEncontrado:
+            logger.info("autosave descartado: rascunho removido", extra={"operacao": "autosave", "rascunho_id": rascunho_id})
+
+    def descartar(self, rascunho_id: int) -> None:
+        with self._lock:
+            self._pendentes.pop(rascunho_id, None)
+            self._ultima_gravacao.pop(rascunho_id, None)
+            timer = self._timers.pop(rascunho_id, None)
+            lock_gravacao = self._locks_gravacao.get(rascunho_id)
+            if lock_gravacao is not None and not lock_gravacao.locked():
+                del self._locks_gravacao[rascunho_id]
+        if timer is not None:
+            timer.cancel()
+
+    def _podar(self) -> None:
+        """Esquece rascunhos fora da janela e sem nada pendente (chamado sob ``_lock``)."""
+        limite = time.monotonic() - self._intervalo
+        for rascunho_id, gravado_em in list(self._ultima_gravacao.items()):
+            if gravado_em < limite and rascunho_id not in self._pendentes and rascunho_id not in self._timers:
+                del self._ultima_gravacao[rascunho_id]
+        for rascunho_id, lock_gravacao in list(self._locks_gravacao.items()):
+            if rascunho_id not in self._ultima_gravacao and not lock_gravacao.locked():
+                del self._locks_gravacao[rascunho_id]
+        self._limite_poda = max(256, 2 * len(self._ultima_gravacao))
+
+    def descarregar_todos(self) -> None:
+        with self._lock:
+            ids = list(self._pendentes)
+        for rascunho_id in ids:
+            try:
+                self.descarregar(rascunho_id)
+            except RascunhoNaoEncontrado:
+                pass
+
+
+AUTOSAVE_INTERVALO_SEGUNDOS = float(os.environ.get("AUTOSAVE_INTERVALO_SEGUNDOS", "5") or 0)
+autosave_rascunhos = AutosaveRascunhos(gravar_campos_rascunho, AUTOSAVE_INTERVALO_SEGUNDOS)
+atexit.register(autosave_rascunhos.descarregar_todos)
+
+
+def normalizar_campos_autosave(campos: dict[str, object]) -> dict[str, str]:
+    normalizados: dict[str, str] = {}
+    for campo, valor in campos.items():
+        if campo not in FORM_FIELDS or campo == "carga_horaria":
+            continue
+        texto = str(valor if valor is not None else "").strip()
+        if campo == "aceitou_declaracao":
+            texto = "on" if texto.lower() in {"on", "1", "true", "sim"} else ""
+        elif campo == "cpf":
+            texto = only_digits(texto)
+        elif campo == "escola":
+            texto = normalizar_escola(texto)
+        elif campo == "situacao_servidor":
+            texto = normalizar_situacao_servidor(texto)
+        normalizados[campo] = texto
+    return normalizados
+
+
+# Versão do registro: um token por coleção ("professores", "rascunhos"),
+# gravado em DATA_DIR e trocado a cada escrita feita por esta aplicação. Serve
+# de ETag para páginas e exportações, permitindo responder 304 sem consultar o
+# banco. Escritas de outra instância ou de scripts não mudam esse arquivo, por
+# isso HTTP_CACHE_TTL limita por quantos segundos uma instância confia na
+# própria versão: 30 s por padrão no Firestore (compartilhado), sem limite no
+# SQLite local.
+HTTP_CACHE_TTL = int(os.environ.get("HTTP_CACHE_TTL", "30" if USE_FIREBASE else "0") or 0)
+
+
+def _caminho_versao_registro(colecao: str) -> Path:
+    return get_data_dir() / f"{colecao}.versao"
+
+
+def _ler_versao(arquivo) -> tuple[int, str]:
+    arquivo.seek(0)
+    geracao, _, origem = arquivo.read().strip().partition("-")
+    try:
+        return int(geracao, 16), origem
+    except ValueError:
+        return 0, ""
+
+
+def marcar_registro_alterado(colecao: str = "professores") -> str:
+    """Avança a versão da coleção e retorna a nova versão.
+
+    A versão é ``<geração hex>-<origem>``: a geração cresce de 1 em 1 (sob
+    ``flock``, entre workers do mesmo host) e a origem é sorteada quando o
+    arquivo é criado, para nunca repetir versões de outra instância.
+    """
+    caminho = _caminho_versao_registro(colecao)
+    try:
+        with open(caminho, "a+", encoding="utf-8") as arquivo:
+            if fcntl is not None:
+                fcntl.flock(arquivo, fcntl.LOCK_EX)
+            geracao, origem = _ler_versao(arquivo)
+            versao = f"{geracao + 1:x}-{origem or secrets.token_hex(4)}"
+            arquivo.seek(0)
+            arquivo.truncate()
+            arquivo.write(versao)
+    except OSError:
+        versao = f"1-{secrets.token_hex(4)}"
+    return versao
+
+
+def versao_anterior(versao: str) -> str:
+    geracao, _, origem = versao.partition("-")
+    return f"{int(geracao, 16) - 1:x}-{origem}"
+
+
+def _versao_colecao(colecao: str) -> tuple[str, float]:
+    caminho = _caminho_versao_registro(colecao)
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            if fcntl is not None:
+                fcntl.flock(arquivo, fcntl.LOCK_SH)
+            geracao, origem = _ler_versao(arquivo)
+            alterado_em = os.fstat(arquivo.fileno()).st_mtime
+    except OSError:
+        geracao, origem = 0, ""
+    if not origem:
+        # Instância nova: nunca reaproveitar ETags emitidos antes do arquivo existir.
+        return marcar_registro_alterado(colecao), time.time()
+    return f"{geracao:x}-{origem}", alterado_em
+
+
+def versao_registro(*colecoes: str) -> tuple[str, float]:
+    """Retorna (versão, timestamp da última alteração) das coleções (padrão: professores)."""
+    versoes = [_versao_colecao(colecao) for colecao in colecoes or ("professores",)]
+    versao = ".".join(v for v, _ in versoes)
+    alterado_em = max(t for _, t in versoes)
+    if HTTP_CACHE_TTL > 0:
+        versao = f"{versao}-{int(time.time() // HTTP_CACHE_TTL)}"
+    return versao, alterado_em
+
+
+def resposta_nao_modificada(etag: str) -> Response | None:
+    """Retorna 304 se o cliente já tem a versão ``etag``; caso contrário None."""
+    # Mensagens flash pendentes só aparecem numa renderização nova da página.
+    if session.get("_flashes"):
+        return None
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    resposta = Response(status=304)
+    resposta.set_etag(etag, weak=True)
+    resposta.cache_control.no_cache = True
+    resposta.cache_control.private = True
+    return resposta
+
+
+def resposta_com_versao(resposta: Response, etag: str, alterado_em: float) -> Response:
+    resposta.set_etag(etag, weak=True)
+    resposta.last_modified = datetime.fromtimestamp(alterado_em, timezone.utc)
+    resposta.cache_control.no_cache = True
+    resposta.cache_control.private = True
+    return resposta
+
+
+# Consultas independentes de uma mesma página (ex.: professores e rascunhos no
+# index) rodam em paralelo; a latência passa a ser a da mais lenta, não a soma.
+CONSULTAS_PARALELAS = int(os.environ.get("CONSULTAS_PARALELAS", "4") or 1)
+_executor_consultas: ThreadPoolExecutor | None = None
+_lock_executor_consultas = threading.Lock()
+# contadores de tarefas do pool (para o /readyz), atualizados em _rodar_consulta
+_tarefas_consultas = {"enviadas": 0, "iniciadas": 0, "concluidas": 0}
+_lock_tarefas_consultas = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    # criado sob demanda: nenhuma thread existe antes de um fork do servidor
+    global _executor_consultas
+    if _executor_consultas is None:
+        with _lock_executor_consultas:
+            if _executor_consultas is None:
+                _executor_consultas = ThreadPoolExecutor(
+                    max_workers=CONSULTAS_PARALELAS, thread_name_prefix="consulta"
+                )
+    return _executor_consultas
+
+
+def _rodar_consulta(contexto: contextvars.Context, chamada):
+    with _lock_tarefas_consultas:
+        _tarefas_consultas["iniciadas"] += 1
+    try:
+        return contexto.run(chamada)
+    finally:
+        with _lock_tarefas_consultas:
+            _tarefas_consultas["concluidas"] += 1
+
+
+def em_paralelo(*chamadas):
+    """Executa as funções sem argumentos ``chamadas`` ao mesmo tempo.
+
+    Retorna os resultados na mesma ordem; exceções são repassadas. Com
+    CONSULTAS_PARALELAS <= 1 executa em sequência.
+    """
+    if CONSULTAS_PARALELAS <= 1 or len(chamadas) < 2:
+        return [chamada() for chamada in chamadas]
+    # cada tarefa leva uma cópia do contexto (contagem de chamadas do perfilador)
+    with _lock_tarefas_consultas:
+        _tarefas_consultas["enviadas"] += len(chamadas) - 1
+    futuros = [
+        _executor().submit(_rodar_consulta, contextvars.copy_context(), chamada) for chamada in chamadas[1:]
+    ]
+    # a primeira roda na própria thread da requisição
+    primeiro = chamadas[0]()
+    return [primeiro] + [futuro.result() for futuro in futuros]
+
+
+def listar_professores() -> list[dict[str, object]]:
+    if USE_FIREBASE:
+        return db_list_professores()
+    with get_connection() as conn:
+        linhas = conn.execute("SELECT * FROM professores ORDER BY id DESC").fetchall()
+    return [dict(linha) for linha in linhas]
+
+
+RASCUNHOS_POR_PAGINA = int(os.environ.get("RASCUNHOS_POR_PAGINA", "50") or 50)
+RASCUNHO_TTL_DIAS = int(os.environ.get("RASCUNHO_TTL_DIAS", "90") or 0)
+
+
+def listar_rascunhos(pagina: int = 1) -> tuple[list[dict[str, object]], bool]:
+    """Retorna os rascunhos da página (mais recentes primeiro) e se há mais páginas."""
+    pagina = max(1, pagina)
+    deslocamento = (pagina - 1) * RASCUNHOS_POR_PAGINA
+    # pede um a mais só para saber se existe próxima página
+    limite = RASCUNHOS_POR_PAGINA + 1
+    if USE_FIREBASE:
+        rascunhos = db_list_rascunhos(limite=limite, deslocamento=deslocamento)
+    else:
+        with get_connection() as conn:
+            linhas = conn.execute(
+                """
+                SELECT id, nome_referencia, cpf, atualizado_em, criado_em
+                FROM rascunhos_professores
+                ORDER BY datetime(atualizado_em) DESC, id DESC
+                LIMIT ? OFFSET ?
+                """,
+                (limite, deslocamento),
+            ).fetchall()
+        rascunhos = [dict(linha) for linha in linhas]
+    return rascunhos[:RASCUNHOS_POR_PAGINA], len(rascunhos) > RASCUNHOS_POR_PAGINA
+
+
+def expirar_rascunhos(ttl_dias: int | None = None, lote: int = 400) -> int:
+    """Remove rascunhos sem atualização há mais de ``ttl_dias`` (padrão RASCUNHO_TTL_DIAS).
+
+    Retorna a quantidade removida. TTL zero ou negativo desativa a expiração.
+    """
+    ttl_dias = RASCUNHO_TTL_DIAS if ttl_dias is None else ttl_dias
+    if ttl_dias <= 0:
+        return 0
+    limite = (datetime.now() - timedelta(days=ttl_dias)).strftime("%Y-%m-%d %H:%M:%S")
+
+    if USE_FIREBASE:
+        removidos = db_expirar_rascunhos(limite, lote=lote)
+    else:
+        removidos = 0
+        while True:
+            # transações curtas: não trava o banco durante uma limpeza grande
+            with get_connection() as conn:
+                cur = conn.execute(
+                    """
+                    DELETE FROM rascunhos_professores
+                    WHERE id IN (
+                        SELECT id FROM rascunhos_professores
+                        WHERE datetime(atualizado_em) < datetime(?)
+                        LIMIT ?
+                    )
+                    """,
+                    (limite, lote),
+                )
+            removidos += cur.rowcount
+            if cur.rowcount < lote:
+                break
+
+    if removidos:
+        marcar_registro_alterado("rascunhos")
+    return removidos
+
+
+def buscar_professor(professor_id: int) -> dict[str, object] | None:
+    if USE_FIREBASE:
+        return db_get_professor(professor_id)
+    with get_connection() as conn:
+        linha = conn.execute(
+            "SELECT * FROM professores WHERE id = ?", (int(professor_id),)
+        ).fetchone()
+    return dict(linha) if linha else None
+
+
+def _colunas_professor(conn: sqlite3.Connection, payload: dict[str, object]) -> list[str]:
+    return [
+        coluna
+        for coluna in get_table_columns(conn, "professores")
+        if coluna in payload and coluna != "id"
+    ]
+
+
+def inserir_professor(payload: dict[str, object]) -> int:
+    professor_id = 0
+    try:
+        professor_id = _inserir_professor(payload)
+        return professor_id
+    finally:
+        versao = marcar_registro_alterado()
+        if professor_id:
+            indice_busca.adicionar({**payload, "id": professor_id}, versao, versao_anterior(versao))
+
+
+def _inserir_professor(payload: dict[str, object]) -> int:
+    if USE_FIREBASE:
+        return db_insert_professor(payload)
+
+    with get_connection() as conn:
+        colunas = _colunas_insercao(conn)
+        valores = [payload.get(coluna, "") for coluna in colunas]
+        try:
+            cur = conn.execute(
+                f"INSERT INTO professores ({', '.join(colunas)}) "
+                f"VALUES ({', '.join('?' for _ in colunas)})",
+                valores,
+            )
+        except sqlite3.IntegrityError as e:
+            _repassar_cpf_duplicado(e, payload)
+            raise
+        return int(cur.lastrowid or 0)
+
+
+def _colunas_insercao(conn: sqlite3.Connection) -> list[str]:
+    return [
+        coluna
+        for coluna in get_table_columns(conn, "professores")
+        if coluna != "id" and not coluna.startswith("ano_")
+    ]
+
+
+def inserir_professores_em_lote(payloads: list[dict[str, object]]) -> list[str]:
+    """Grava vários cadastros novos; devolve, por payload, "inserido", "duplicado" ou o erro.
+
+    No SQLite o lote é uma única transação (uma linha com erro não desfaz as
+    outras); no Firestore cada cadastro continua com seu próprio batch, por
+    causa do índice de CPF. A versão do registro muda uma vez por lote e o
+    índice de busca se reconstrói na próxima consulta.
+    """
+    resultados: list[str] = []
+    try:
+        if USE_FIREBASE:
+            for payload in payloads:
+                try:
+                    resultados.append("inserido" if _inserir_professor(payload) else "erro ao inserir")
+                except CpfDuplicado:
+                    resultados.append("duplicado")
+                except Exception as e:
+                    resultados.append(f"erro ao inserir ({e})")
+            return resultados
+
+        with get_connection() as conn:
+            colunas = _colunas_insercao(conn)
+            sql = (
+                f"INSERT INTO professores ({', '.join(colunas)}) "
+                f"VALUES ({', '.join('?' for _ in colunas)})"
+            )
+            for payload in payloads:
+                try:
+                    conn.execute(sql, [payload.get(coluna, "") for coluna in colunas])
+                    resultados.append("inserido")
+                except sqlite3.IntegrityError as e:
+                    duplicado = "professores.cpf" in str(e)
+                    resultados.append("duplicado" if duplicado else f"erro ao inserir ({e})")
+        return resultados
+    finally:
+        if "inserido" in resultados:
+            marcar_registro_alterado()
+
+
+def atualizar_professores_importados(itens: list[tuple[int, dict[str, object]]]) -> list[str]:
+    """Aplica alterações importadas a cadastros existentes; "atualizado" ou o erro, por item.
+
+    Cada item traz só os campos a mudar (``validacao.alteracoes_importacao``).
+    """
+    resultados: list[str] = []
+    try:
+        for professor_id, alteracoes in itens:
+            try:
+                atualizado = _atualizar_professor(professor_id, alteracoes)
+                resultados.append("atualizado" if atualizado else "erro ao atualizar")
+            except Exception as e:
+                resultados.append(f"erro ao atualizar ({e})")
+        return resultados
+    finally:
+        if "atualizado" in resultados:
+            marcar_registro_alterado()
+
+
+def hashes_importacao(cpfs: list[str]) -> dict[str, tuple[int, str]]:
+    """CPF -> (id, hash da linha importada) dos CPFs já cadastrados, numa consulta por lote."""
+    if USE_FIREBASE:
+        return db_hashes_importacao(cpfs)
+    conhecidos: dict[str, tuple[int, str]] = {}
+    with get_connection() as conn:
+        for fatia in _fatias(list(dict.fromkeys(cpfs)), _IDS_POR_COMANDO_SQLITE):
+            for linha in conn.execute(
+                f"SELECT id, cpf, hash_importacao FROM professores WHERE cpf IN ({', '.join('?' for _ in fatia)})",
+                fatia,
+            ):
+                conhecidos[linha["cpf"]] = (linha["id"], linha["hash_importacao"] or "")
+    return conhecidos
+
+
+def chave_importacao(hash_arquivo: str, atualizar_alterados: bool) -> str:
+    """O registro de uma importação vale para o arquivo e o modo em que foi importado.
+
+    Assim o mesmo arquivo pode voltar com "atualizar os cadastros" marcado.
+    """
+    return f"{hash_arquivo}-atualizar" if atualizar_alterados else hash_arquivo
+
+
+def buscar_importacao(hash_arquivo: str) -> dict[str, object] | None:
+    if USE_FIREBASE:
+        return db_get_importacao(hash_arquivo)
+    with get_connection() as conn:
+        linha = conn.execute("SELECT * FROM importacoes WHERE hash_arquivo = ?", (hash_arquivo,)).fetchone()
+    return dict(linha) if linha else None
+
+
+def registrar_importacao(hash_arquivo: str, dados: dict[str, object]) -> None:
+    if USE_FIREBASE:
+        db_registrar_importacao(hash_arquivo, dados)
+        return
+    colunas = ["hash_arquivo"] + list(dados)
+    with get_connection() as conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO importacoes ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})",
+            [hash_arquivo] + list(dados.values()),
+        )
+
+
+def _repassar_cpf_duplicado(erro: sqlite3.IntegrityError, payload: dict[str, object]) -> None:
+    # a restrição UNIQUE de professores.cpf garante a unicidade no SQLite
+    if "professores.cpf" in str(erro):
+        raise CpfDuplicado(str(payload.get("cpf", ""))) from erro
+
+
+def atualizar_professor(
+    professor_id: int, payload: dict[str, object], anterior: dict[str, object] | None = None
+) -> bool:
+    """``anterior`` é o registro já lido pela rota (evita nova leitura no Firestore)."""
+    atualizado = False
+    try:
+        atualizado = _atualizar_professor(professor_id, payload, anterior)
+        return atualizado
+    finally:
+        versao = marcar_registro_alterado()
+        if atualizado:
+            indice_busca.adicionar({**payload, "id": professor_id}, versao, versao_anterior(versao))
+
+
+def _atualizar_professor(
+    professor_id: int, payload: dict[str, object], anterior: dict[str, object] | None = None
+) -> bool:
+    if USE_FIREBASE:
+        return db_update_professor(professor_id, payload, anterior)
+
+    with get_connection() as conn:
+        colunas = [c for c in _colunas_professor(conn, payload) if c not in ("criado_em", "atualizado_em")]
+        if not colunas:
+            return False
+        payload["atualizado_em"] = carimbo_revisao()
+        colunas.append("atualizado_em")
+        try:
+            conn.execute(
+                f"UPDATE professores SET {', '.join(f'{c} = ?' for c in colunas)} WHERE id = ?",
+                [payload[c] for c in colunas] + [int(professor_id)],
+            )
+        except sqlite3.IntegrityError as e:
+            _repassar_cpf_duplicado(e, payload)
+            raise
+    return True
+
+
+def excluir_professor(professor_id: int, anterior: dict[str, object] | None = None) -> bool:
+    if USE_FIREBASE:
+        excluido = db_delete_professor(professor_id, anterior)
+    else:
+        with get_connection() as conn:
+            conn.execute("DELETE FROM professores WHERE id = ?", (int(professor_id),))
+        excluido = True
+    versao = marcar_registro_alterado()
+    if excluido:
+        indice_busca.remover(professor_id, versao, versao_anterior(versao))
+    return excluido
+
+
+# Parâmetros por comando no SQLite (o limite antigo do SQLite é 999).
+_IDS_POR_COMANDO_SQLITE = 500
+
+
+def _fatias(ids: list[int], tamanho: int):
+    for inicio in range(0, len(ids), tamanho):
+        yield ids[inicio:inicio + tamanho]
+
+
+def atualizar_professores_em_lote(ids: list[int], campos: dict[str, str]) -> dict[int, str]:
+    """Aplica ``campos`` (já validados) a todos os ``ids``; devolve id -> resultado.
+
+    No SQLite é uma única transação; no Firestore, WriteBatches por fatia.
+    """
+    ids = list(dict.fromkeys(int(i) for i in ids))
+    if not ids:
+        return {}
+    if USE_FIREBASE:
+        resultado = db_update_professores_em_lote(ids, dict(campos))
+    else:
+        colunas = list(campos) + ["atualizado_em"]
+        valores = [campos[c] for c in campos] + [carimbo_revisao()]
+        existentes: set[int] = set()
+        with get_connection() as conn:
+            for fatia in _fatias(ids, _IDS_POR_COMANDO_SQLITE):
+                marcadores = ", ".join("?" for _ in fatia)
+                existentes.update(
+                    linha[0]
+                    for linha in conn.execute(f"SELECT id FROM professores WHERE id IN ({marcadores})", fatia)
+                )
+                conn.execute(
+                    f"UPDATE professores SET {', '.join(f'{c} = ?' for c in colunas)} WHERE id IN ({marcadores})",
+                    valores + fatia,
+                )
+        resultado = {i: "atualizado" if i in existentes else "nao_encontrado" for i in ids}
+    versao = marcar_registro_alterado()
+    alterados = {i: campos for i, situacao in resultado.items() if situacao == "atualizado"}
+    if alterados:
+        indice_busca.aplicar_lote(alterados, [], versao, versao_anterior(versao))
+    return resultado
+
+
+def excluir_professores_em_lote(ids: list[int]) -> dict[int, str]:
+    """Exclui todos os ``ids``; devolve id -> resultado (ver ``atualizar_professores_em_lote``)."""
+    ids = list(dict.fromkeys(int(i) for i in ids))
+    if not ids:
+        return {}
+    if USE_FIREBASE:
+        resultado = db_delete_professores_em_lote(ids)
+    else:
+        existentes: set[int] = set()
+        with get_connection() as conn:
+            for fatia in _fatias(ids, _IDS_POR_COMANDO_SQLITE):
+                marcadores = ", ".join("?" for _ in fatia)
+                existentes.update(
+                    linha[0]
+                    for linha in conn.execute(f"SELECT id FROM professores WHERE id IN ({marcadores})", fatia)
+                )
+                conn.execute(f"DELETE FROM professores WHERE id IN ({marcadores})", fatia)
+        resultado = {i: "excluido" if i in existentes else "nao_encontrado" for i in ids}
+    versao = marcar_registro_alterado()
+    removidos = [i for i, situacao in resultado.items() if situacao == "excluido"]
+    if removidos:
+        indice_busca.aplicar_lote({}, removidos, versao, versao_anterior(versao))
+    return resultado
+
+
+def professores_rateio() -> list[dict[str, object]]:
+    if USE_FIREBASE:
+        return db_professores_rateio()
+    with get_connection() as conn:
+        linhas = conn.execute(
+            """
+            SELECT id, nome, cpf, escola, cargo, situacao_servidor, quantidade_meses_trabalhados
+            FROM professores
+            ORDER BY id
+            """
+        ).fetchall()
+    return [dict(linha) for linha in linhas]
+
+
+def totais_rateio() -> tuple[int, int]:
+    """(quantidade de cadastros, soma dos meses trabalhados), agregados no banco."""
+    if USE_FIREBASE:
+        return db_totais_rateio()
+    with get_connection() as conn:
+        quantidade, soma = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(quantidade_meses_trabalhados), 0) FROM professores"
+        ).fetchone()
+    return int(quantidade), int(soma)
+
+
+def _faixa_meses(valor: str) -> tuple[int, str]:
+    """Chave de ordenação e rótulo da faixa de 12 meses de ``valor``."""
+    try:
+        meses = int(valor)
+    except (TypeError, ValueError):
+        return 10**6, VALOR_NAO_INFORMADO
+    if meses < 1:
+        return 0, "0"
+    inicio = (meses - 1) // 12 * 12 + 1
+    return inicio, f"{inicio}–{inicio + 11}"
+
+
+def resumo_estatisticas() -> dict[str, object]:
+    """Totais por escola, cargo e situação e histograma de meses.
+
+    Lê os contadores pré-calculados (``_meta/stats`` no Firestore, tabela
+    ``estatisticas`` no SQLite); não percorre ``professores``.
+    """
+    contagens: dict[str, dict[str, int]] = {dimensao: {} for dimensao in DIMENSOES_ESTATISTICAS}
+    if USE_FIREBASE:
+        bruto = db_get_estatisticas()
+        total = int(bruto.get("total") or 0)
+        for dimensao in DIMENSOES_ESTATISTICAS:
+            for valor, quantidade in (bruto.get(dimensao) or {}).items():
+                if int(quantidade or 0) > 0:
+                    contagens[dimensao][valor] = int(quantidade)
+    else:
+        total = 0
+        with get_connection() as conn:
+            linhas = conn.execute(
+                "SELECT dimensao, valor, total FROM estatisticas WHERE total > 0"
+            ).fetchall()
+        for linha in linhas:
+            if linha["dimensao"] == "total":
+                total = int(linha["total"])
+            elif linha["dimensao"] in contagens:
+                contagens[linha["dimensao"]][linha["valor"]] = int(linha["total"])
+
+    resumo: dict[str, object] = {"total": total}
+    for dimensao in ("escola", "cargo", "situacao_servidor"):
+        resumo[dimensao] = [
+            {"valor": valor, "total": quantidade}
+            for valor, quantidade in sorted(
+                contagens[dimensao].items(), key=lambda item: (-item[1], item[0])
+            )
+        ]
+
+    faixas: dict[tuple[int, str], int] = {}
+    for valor, quantidade in contagens["meses"].items():
+        faixa = _faixa_meses(valor)
+        faixas[faixa] = faixas.get(faixa, 0) + quantidade
+    resumo["meses"] = [
+        {"faixa": rotulo, "total": quantidade}
+        for (_, rotulo), quantidade in sorted(faixas.items())
+    ]
+    return resumo
+
+
+def reconstruir_estatisticas() -> None:
+    """Recalcula os contadores do painel a partir de ``professores`` (corrige desvios)."""
+    if USE_FIREBASE:
+        db_reconstruir_estatisticas()
+    else:
+        with get_connection() as conn:
+            reconstruir_estatisticas_sqlite(conn)
+    marcar_registro_alterado()
+
+
+indice_busca = IndiceBusca()
+_lock_indice_busca = threading.Lock()
+_indice_busca_reconstruido_em = 0.0
+
+
+def _indice_busca_desatualizado(versao: str) -> bool:
+    # No Firestore, gravações de outras instâncias não mudam o arquivo de
+    # versão local: o índice também é refeito ao passar de HTTP_CACHE_TTL.
+    if indice_busca.versao != versao:
+        return True
+    return HTTP_CACHE_TTL > 0 and time.monotonic() - _indice_busca_reconstruido_em >= HTTP_CACHE_TTL
+
+
+def indice_busca_atualizado() -> IndiceBusca:
+    """Índice de busca na versão atual do registro, reconstruído se preciso."""
+    global _indice_busca_reconstruido_em
+    versao, _ = _versao_colecao("professores")
+    if _indice_busca_desatualizado(versao):
+        with _lock_indice_busca:
+            versao, _ = _versao_colecao("professores")
+            if _indice_busca_desatualizado(versao):
+                indice_busca.reconstruir(listar_professores(), versao)
+                _indice_busca_reconstruido_em = time.monotonic()
+    return indice_busca
+
+
+def exportar_professores() -> list[dict[str, object]]:
+    if USE_FIREBASE:
+        return db_export_professores()
+    with get_connection() as conn:
+        colunas = ", ".join(EXPORT_COLUMNS)
+        linhas = conn.execute(f"SELECT {colunas} FROM professores ORDER BY id").fetchall()
+    return [dict(linha) for linha in linhas]
+
+
+def arquivo_exportacao(extensao: str, versao: str, gerar) -> Path:
+    """Retorna o arquivo de exportação da versão, gerando-o só se ainda não existir.
+
+    ``gerar`` recebe o caminho temporário onde deve escrever o arquivo.
+    Exportações de versões anteriores são removidas ao gerar uma nova.
+    """
+    pasta = get_data_dir() / "exportacoes"
+    pasta.mkdir(parents=True, exist_ok=True)
+    destino = pasta / f"cadastros-{versao}.{extensao}"
+    if destino.exists():
+        return destino
+
+    temporario = pasta / f".{destino.name}.{secrets.token_hex(4)}.tmp"
+    gerar(temporario)
+    os.replace(temporario, destino)
+    for antigo in pasta.glob(f"cadastros-*.{extensao}"):
+        if antigo != destino:
+            try:
+                antigo.unlink()
+            except OSError:
+                pass
+    return destino
+
+
+def _endpoint_da_requisicao(environ: dict[str, object]) -> str:
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(environ).match()
+        return endpoint
+    except Exception:
+        return "sem_rota"
+
+
+# Compressão gzip/brotli de HTML, CSV e JSON (o perfilador, instalado por fora,
+# inclui o custo dela). COMPRESSAO_NIVEL vale para gzip (1-9);
+# COMPRESSAO_NIVEL_BROTLI para brotli (0-11).
+if os.environ.get("COMPRESSAO_HABILITADA", "1") == "1":
+    app.wsgi_app = MiddlewareCompressao(
+        app.wsgi_app,
+        minimo_bytes=int(os.environ.get("COMPRESSAO_MIN_BYTES", "1024") or 0),
+        nivel_gzip=int(os.environ.get("COMPRESSAO_NIVEL", "6") or 6),
+        nivel_brotli=int(os.environ.get("COMPRESSAO_NIVEL_BROTLI", "4") or 4),
+    )
+
+
+# Perfilamento de requisições: exige PERFIL_HABILITADO=1 e PERFIL_SEGREDO; a
+# requisição perfilada envia o segredo no cabeçalho X-Perfil. Desligado, o
+# middleware nem é instalado.
+PERFIL_SEGREDO = os.environ.get("PERFIL_SEGREDO", "")
+if os.environ.get("PERFIL_HABILITADO", "0") == "1" and PERFIL_SEGREDO:
+    app.wsgi_app = MiddlewarePerfil(
+        app.wsgi_app,
+        segredo=PERFIL_SEGREDO,
+        diretorio=lambda: get_data_dir() / "profiles",
+        resolver_endpoint=_endpoint_da_requisicao,
+        iniciar_contagem=iniciar_contagem_chamadas,
+        encerrar_contagem=encerrar_contagem_chamadas,
+        max_perfis=int(os.environ.get("PERFIL_MAX_ARQUIVOS", "200") or 200),
+        ttl_horas=float(os.environ.get("PERFIL_TTL_HORAS", "24") or 24),
+    )
 
 
 # Initialize DB only if not using Firestore and not in read-only environment
@@ -593,28 +1607,37 @@ if not USE_FIREBASE:
         pass
 
 
+@app.errorhandler(ErroBackend)
+def erro_backend(erro: ErroBackend) -> tuple[Response | str, int]:
+    """Modo estrito (DB_MODO_ESTRITO=1): o banco falhou; não mostrar registro vazio."""
+    logger.error("requisição interrompida por falha no backend", extra={"operacao": erro.operacao})
+    if request.path.startswith("/api/"):
+        return jsonify({"erro": "Banco de dados indisponível no momento."}), 503
+    return render_template("erro.html", mensagem="Banco de dados indisponível no momento. Tente novamente em instantes."), 503
+
+
 @app.route("/")
-def index() -> str:
-    if USE_FIREBASE:
-        professores = db_list_professores()
-        rascunhos = db_list_rascunhos()
-    else:
-        with get_connection() as conn:
-            professores = conn.execute(
-                """
-                SELECT id, nome, cpf, escola, cargo, situacao_servidor, telefone, email, criado_em
-                FROM professores
-                ORDER BY id DESC
-                """
-            ).fetchall()
-            rascunhos = conn.execute(
-                """
-                SELECT id, nome_referencia, cpf, atualizado_em, criado_em
-                FROM rascunhos_professores
-                ORDER BY datetime(atualizado_em) DESC, id DESC
-                """
-            ).fetchall()
-    return render_template("index.html", professores=professores, rascunhos=rascunhos)
+def index() -> Response:
+    pagina_rascunhos = max(1, request.args.get("pagina_rascunhos", 1, type=int) or 1)
+    versao, alterado_em = versao_registro("professores", "rascunhos")
+    etag = f"index-{pagina_rascunhos}-{versao}"
+    nao_modificada = resposta_nao_modificada(etag)
+    if nao_modificada:
+        return nao_modificada
+
+    professores, (rascunhos, mais_rascunhos) = em_paralelo(
+        listar_professores, lambda: listar_rascunhos(pagina_rascunhos)
+    )
+    resposta = make_response(
+        render_template(
+            "index.html",
+            professores=professores,
+            rascunhos=rascunhos,
+            pagina_rascunhos=pagina_rascunhos,
+            mais_rascunhos=mais_rascunhos,
+        )
+    )
+    return resposta_com_versao(resposta, etag, alterado_em)
 
 
 @app.route("/cadastro", methods=["GET", "POST"])
@@ -634,18 +1657,24 @@ def cadastro() -> str:
             return redirect(url_for("cadastro", rascunho_id=rascunho_salvo_id))
 
         erros, meses_calculados = validar_dados(dados)
-        cpf_limpo = dados.get("cpf", "")
         if meses_calculados is not None:
             dados["quantidade_meses_trabalhados"] = str(meses_calculados)
 
-        if not erros:
-            existente = db_find_professor_by_cpf(cpf_limpo)
-            if existente:
-                erros.append("Já existe um cadastro com este CPF.")
-
         if meses_calculados is None and not erros:
             erros.append("Não foi possível calcular a quantidade de meses trabalhados.")
 
+        if not erros:
+            # insere via camada de dados; o CPF repetido é recusado na própria gravação
+            payload = dict(dados)
+            payload["telefone"] = only_digits(payload.get("telefone", ""))
+            payload["quantidade_meses_trabalhados"] = int(meses_calculados or 0)
+            payload["aceitou_declaracao"] = 1
+            payload["criado_em"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            try:
+                inserir_professor(payload)
+            except CpfDuplicado as e:
+                erros.append(str(e))
+
         if erros:
             for erro in erros:
                 flash(erro, "erro")
@@ -658,17 +1687,9 @@ def cadastro() -> str:
                 rascunho_atualizado_em=None,
             )
 
-        # insere via camada de dados
-        payload = dict(dados)
-        payload["telefone"] = only_digits(payload.get("telefone", ""))
-        payload["quantidade_meses_trabalhados"] = int(meses_calculados or 0)
-        payload["aceitou_declaracao"] = 1
-        payload["criado_em"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        db_insert_professor(payload)
-
         flash("Cadastro realizado com sucesso.", "sucesso")
         if rascunho_id is not None:
-            db_remover_rascunho(rascunho_id)
+            remover_rascunho(rascunho_id)
         return redirect(url_for("index"))
 
     rascunho_id = request.args.get("rascunho_id", type=int)
@@ -703,14 +1724,7 @@ def cadastro() -> str:
 
 @app.route("/editar/<int:professor_id>", methods=["GET", "POST"])
 def editar(professor_id: int) -> str:
-    if USE_FIREBASE:
-        professor = db_get_professor(professor_id)
-    else:
-        with get_connection() as conn:
-            professor = conn.execute(
-                "SELECT * FROM professores WHERE id = ?", (professor_id,)
-            ).fetchone()
-
+    professor = buscar_professor(professor_id)
     if not professor:
         flash("Cadastro não encontrado.", "erro")
         return redirect(url_for("index"))
@@ -729,14 +1743,21 @@ def editar(professor_id: int) -> str:
         if meses_calculados is not None:
             dados["quantidade_meses_trabalhados"] = str(meses_calculados)
 
-        if not erros:
-            existente = db_find_professor_by_cpf(cpf_limpo)
-            if existente and int(existente.get("id", 0)) != int(professor_id):
-                erros.append("Já existe um cadastro com este CPF.")
-
         if meses_calculados is None and not erros:
             erros.append("Não foi possível calcular a quantidade de meses trabalhados.")
 
+        if not erros:
+            payload = dict(dados)
+            payload["telefone"] = only_digits(payload.get("telefone", ""))
+            payload["quantidade_meses_trabalhados"] = int(meses_calculados or 0)
+            payload["aceitou_declaracao"] = 1
+            # o registro deixa de ser igual à linha importada
+            payload["hash_importacao"] = ""
+            try:
+                atualizar_professor(professor_id, payload, anterior=professor)
+            except CpfDuplicado as e:
+                erros.append(str(e))
+
         if erros:
             for erro in erros:
                 flash(erro, "erro")
@@ -747,12 +1768,6 @@ def editar(professor_id: int) -> str:
                 professor_id=professor_id,
             )
 
-        payload = dict(dados)
-        payload["telefone"] = only_digits(payload.get("telefone", ""))
-        payload["quantidade_meses_trabalhados"] = int(meses_calculados or 0)
-        payload["aceitou_declaracao"] = 1
-        db_update_professor(professor_id, payload)
-
         flash("Cadastro atualizado com sucesso.", "sucesso")
         return redirect(url_for("index"))
 
@@ -772,55 +1787,276 @@ def editar(professor_id: int) -> str:
 
 @app.route("/deletar/<int:professor_id>", methods=["POST"])
 def deletar(professor_id: int) -> str:
-    existente = db_get_professor(professor_id)
+    existente = buscar_professor(professor_id)
     if not existente:
         flash("Cadastro não encontrado.", "erro")
         return redirect(url_for("index"))
-    db_delete_professor(professor_id)
+    excluir_professor(professor_id, anterior=existente)
 
     flash("Cadastro excluído com sucesso.", "sucesso")
     return redirect(url_for("index"))
 
 
+@app.route("/rascunho/autosave", methods=["POST"])
+def autosave_rascunho() -> tuple[Response, int]:
+    corpo = request.get_json(silent=True) or {}
+    campos = corpo.get("campos")
+    if not isinstance(campos, dict):
+        return jsonify({"erro": "Envie os campos alterados em 'campos'."}), 400
+    try:
+        rascunho_id = int(corpo.get("rascunho_id") or 0) or None
+    except (TypeError, ValueError):
+        return jsonify({"erro": "rascunho_id inválido."}), 400
+
+    campos = normalizar_campos_autosave(campos)
+    if not campos:
+        return jsonify({"rascunho_id": rascunho_id, "pendente": False}), 200
+
+    if rascunho_id is None:
+        # rascunho novo: precisa existir já para o cliente receber o id
+        rascunho_id = gravar_campos_rascunho(None, campos)
+        if not rascunho_id:
+            return jsonify({"erro": "Não foi possível salvar o rascunho."}), 503
+        return jsonify({"rascunho_id": rascunho_id, "pendente": False}), 201
+
+    try:
+        gravado = autosave_rascunhos.agendar(rascunho_id, campos)
+    except RascunhoNaoEncontrado:
+        # concluído em cadastro ou excluído: o cliente para de enviar
+        return jsonify({"erro": "Este rascunho já foi concluído ou excluído.", "removido": True}), 410
+    return jsonify({"rascunho_id": rascunho_id, "pendente": not gravado}), 200
+
+
 @app.route("/rascunho/<int:rascunho_id>/deletar", methods=["POST"])
 def deletar_rascunho(rascunho_id: int) -> str:
-    existente = db_carregar_rascunho(rascunho_id)
+    existente = carregar_rascunho_cadastro(rascunho_id)
     if not existente:
         flash("Rascunho não encontrado.", "erro")
         return redirect(url_for("index"))
-    db_remover_rascunho(rascunho_id)
+    remover_rascunho(rascunho_id)
 
     flash("Rascunho excluído com sucesso.", "sucesso")
     return redirect(url_for("index"))
 
 
-@app.route("/healthz")
-def healthz() -> tuple[str, int]:
-    return "ok", 200
+@app.route("/api/busca")
+def api_busca() -> Response:
+    por_pagina = min(max(request.args.get("por_pagina", 20, type=int) or 20, 1), 200)
+    pagina = max(request.args.get("pagina", 1, type=int) or 1, 1)
+    escola = request.args.get("escola", "").strip()
+    situacao = request.args.get("situacao_servidor", "").strip()
 
+    total, itens = indice_busca_atualizado().buscar(
+        request.args.get("q", ""),
+        escola=normalizar_escola(escola) if escola else "",
+        situacao_servidor=normalizar_situacao_servidor(situacao) if situacao else "",
+        pagina=pagina,
+        por_pagina=por_pagina,
+    )
+    for item in itens:
+        item["url_editar"] = url_for("editar", professor_id=item["id"])
+    return jsonify({"total": total, "pagina": pagina, "por_pagina": por_pagina, "itens": itens})
 
-@app.route("/exportar-csv")
-def exportar_csv() -> Response:
-    registros = db_export_professores()
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(EXPORT_COLUMNS)
+def _ids_do_lote(corpo: dict[str, object]) -> list[int]:
+    """Ids de uma operação em lote: lista explícita ou filtro da busca.
 
-    for r in registros:
-        writer.writerow([r[coluna] for coluna in r.keys()])
+    Levanta ValueError se nenhum dos dois vier (nunca "todos" por omissão).
+    """
+    if corpo.get("ids") is not None:
+        ids = corpo["ids"]
+        if not isinstance(ids, list):
+            raise ValueError("'ids' deve ser uma lista.")
+        try:
+            return [int(i) for i in ids]
+        except (TypeError, ValueError):
+            raise ValueError("'ids' deve conter apenas números.") from None
+    filtro = corpo.get("filtro")
+    if not isinstance(filtro, dict):
+        raise ValueError("Informe 'ids' ou 'filtro'.")
+    consulta = str(filtro.get("q") or "").strip()
+    escola = str(filtro.get("escola") or "").strip()
+    situacao = str(filtro.get("situacao_servidor") or "").strip()
+    if not (consulta or escola or situacao):
+        raise ValueError("O filtro precisa de ao menos um critério (q, escola ou situacao_servidor).")
+    return indice_busca_atualizado().ids(
+        consulta,
+        escola=normalizar_escola(escola) if escola else "",
+        situacao_servidor=normalizar_situacao_servidor(situacao) if situacao else "",
+    )
 
-    nome_arquivo = f"cadastros-fundef-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={nome_arquivo}"},
+
+def _relatorio_lote(resultado: dict[int, str]) -> dict[str, object]:
+    resumo: dict[str, int] = {}
+    for situacao in resultado.values():
+        resumo[situacao] = resumo.get(situacao, 0) + 1
+    return {
+        "total": len(resultado),
+        "resumo": resumo,
+        "resultados": [{"id": i, "resultado": situacao} for i, situacao in resultado.items()],
+    }
+
+
+@app.route("/api/professores/editar-em-lote", methods=["POST"])
+def api_editar_em_lote() -> tuple[Response, int]:
+    corpo = request.get_json(silent=True) or {}
+    campos = corpo.get("campos")
+    if not isinstance(campos, dict):
+        return jsonify({"erro": "Envie os campos a alterar em 'campos'."}), 400
+    campos, erros = validar_edicao_em_lote(campos)
+    if erros:
+        return jsonify({"erro": " ".join(erros)}), 400
+    try:
+        ids = _ids_do_lote(corpo)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    resultado = atualizar_professores_em_lote(ids, {**campos, "hash_importacao": ""})
+    return jsonify(_relatorio_lote(resultado)), 200
+
+
+@app.route("/api/professores/excluir-em-lote", methods=["POST"])
+def api_excluir_em_lote() -> tuple[Response, int]:
+    corpo = request.get_json(silent=True) or {}
+    try:
+        ids = _ids_do_lote(corpo)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    resultado = excluir_professores_em_lote(ids)
+    return jsonify(_relatorio_lote(resultado)), 200
+
+
+@app.route("/painel")
+def painel() -> Response:
+    versao, alterado_em = versao_registro()
+    etag = f"painel-{versao}"
+    nao_modificada = resposta_nao_modificada(etag)
+    if nao_modificada:
+        return nao_modificada
+
+    resumo = resumo_estatisticas()
+    maior_faixa = max((faixa["total"] for faixa in resumo["meses"]), default=0)
+    resposta = make_response(
+        render_template("painel.html", resumo=resumo, maior_faixa=maior_faixa)
     )
+    return resposta_com_versao(resposta, etag, alterado_em)
 
 
-@app.route("/exportar-excel")
-def exportar_excel() -> Response:
-    registros = db_export_professores()
+@app.route("/api/painel")
+def api_painel() -> Response:
+    versao, alterado_em = versao_registro()
+    etag = f"api-painel-{versao}"
+    nao_modificada = resposta_nao_modificada(etag)
+    if nao_modificada:
+        return nao_modificada
+    return resposta_com_versao(jsonify(resumo_estatisticas()), etag, alterado_em)
+
+
+@app.route("/healthz")
+def healthz():
+    # liveness: responde 200 mesmo com o disjuntor aberto (o processo está de pé)
+    dados = {"status": "ok", "backend": "firestore" if USE_FIREBASE else "sqlite"}
+    if USE_FIREBASE:
+        dados["disjuntor"] = situacao_disjuntor()
+    return jsonify(dados), 200
+
+
+# A sonda de latência vai ao backend no máximo uma vez a cada PRONTIDAO_TTL_S;
+# as verificações do balanceador no intervalo recebem a última amostra.
+PRONTIDAO_TTL_S = float(os.environ.get("PRONTIDAO_TTL_S", "15") or 15)
+_amostra_latencia: dict[str, object] = {"ok": False, "latencia_ms": None, "erro": None, "medida_em": None}
+_medida_latencia_em = 0.0
+_lock_amostra_latencia = threading.Lock()
+
+
+def _sondar_sqlite() -> float:
+    inicio = time.perf_counter()
+    conn = get_connection()
+    try:
+        conn.execute("SELECT 1 FROM professores LIMIT 1").fetchall()
+    finally:
+        conn.close()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def amostra_latencia_backend() -> dict[str, object]:
+    global _medida_latencia_em
+    if time.monotonic() - _medida_latencia_em < PRONTIDAO_TTL_S:
+        return dict(_amostra_latencia)
+    # outra requisição já está medindo: usa a amostra anterior (só a primeira espera)
+    if not _lock_amostra_latencia.acquire(blocking=_medida_latencia_em == 0.0):
+        return dict(_amostra_latencia)
+    try:
+        if time.monotonic() - _medida_latencia_em >= PRONTIDAO_TTL_S:
+            try:
+                latencia_ms = sondar_firestore() if USE_FIREBASE else _sondar_sqlite()
+                _amostra_latencia.update(ok=True, latencia_ms=round(latencia_ms, 2), erro=None)
+            except Exception as e:
+                _amostra_latencia.update(ok=False, latencia_ms=None, erro=f"{type(e).__name__}: {e}")
+            _amostra_latencia["medida_em"] = datetime.now().isoformat(timespec="seconds")
+            _medida_latencia_em = time.monotonic()
+        return dict(_amostra_latencia)
+    finally:
+        _lock_amostra_latencia.release()
+
+
+def _estado_sqlite() -> dict[str, object]:
+    db_path = get_data_dir() / DATABASE_PATH.name
+    wal = db_path.with_name(db_path.name + "-wal")
+    return {
+        "arquivo": db_path.name,
+        "tamanho_bytes": db_path.stat().st_size if db_path.exists() else None,
+        "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+        "conexoes_criadas": _conexoes_sqlite_criadas,
+    }
+
+
+def _estado_consultas_paralelas() -> dict[str, object]:
+    with _lock_tarefas_consultas:
+        tarefas = dict(_tarefas_consultas)
+    return {
+        "maximo": CONSULTAS_PARALELAS,
+        "em_execucao": tarefas["iniciadas"] - tarefas["concluidas"],
+        "fila": tarefas["enviadas"] - tarefas["iniciadas"],
+        "concluidas": tarefas["concluidas"],
+    }
+
+
+@app.route("/readyz")
+def readyz():
+    """Prontidão: 503 enquanto a camada de dados não puder atender."""
+    amostra = amostra_latencia_backend()
+    dados: dict[str, object] = {
+        "backend": "firestore" if USE_FIREBASE else "sqlite",
+        "latencia": amostra,
+        "consultas_paralelas": _estado_consultas_paralelas(),
+    }
+    pronto = bool(amostra["ok"])
+    if USE_FIREBASE:
+        firebase = estado_firebase()
+        disjuntor = situacao_disjuntor()
+        dados["firebase"] = firebase
+        dados["disjuntor"] = disjuntor
+        pronto = pronto and firebase["inicializado"] and disjuntor["estado"] != "aberto"
+    else:
+        dados["sqlite"] = _estado_sqlite()
+    dados["status"] = "pronto" if pronto else "indisponivel"
+    resposta = jsonify(dados)
+    resposta.headers["Cache-Control"] = "no-store"
+    return resposta, 200 if pronto else 503
+
+
+def _gerar_csv(destino: Path) -> None:
+    registros = exportar_professores()
+    with open(destino, "w", newline="", encoding="utf-8") as output:
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_COLUMNS)
+
+        for r in registros:
+            writer.writerow([r.get(coluna, "") for coluna in EXPORT_COLUMNS])
+
+
+def _gerar_excel(destino: Path) -> None:
+    registros = exportar_professores()
 
     workbook = Workbook()
     sheet = workbook.active
@@ -828,20 +2064,266 @@ def exportar_excel() -> Response:
     sheet.append(EXPORT_COLUMNS)
 
     for registro in registros:
-        sheet.append([registro[coluna] for coluna in EXPORT_COLUMNS])
+        sheet.append([registro.get(coluna, "") for coluna in EXPORT_COLUMNS])
+
+    workbook.save(destino)
+
+
+def _responder_exportacao(extensao: str, mimetype: str, gerar) -> Response:
+    versao, alterado_em = versao_registro()
+    etag = f"exportar-{extensao}-{versao}"
+    nao_modificada = resposta_nao_modificada(etag)
+    if nao_modificada:
+        return nao_modificada
+
+    caminho = arquivo_exportacao(extensao, versao, gerar)
+    nome_arquivo = f"cadastros-fundef-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{extensao}"
+    resposta = send_file(
+        caminho,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=nome_arquivo,
+        etag=False,
+        conditional=False,
+    )
+    return resposta_com_versao(resposta, etag, alterado_em)
+
 
-    output = io.BytesIO()
-    workbook.save(output)
-    output.seek(0)
+@app.route("/exportar-csv")
+def exportar_csv() -> Response:
+    return _responder_exportacao("csv", "text/csv", _gerar_csv)
 
-    nome_arquivo = f"cadastros-fundef-{datetime.now().strftime('%Y%m%d-%H%M%S')}.xlsx"
-    return Response(
-        output.getvalue(),
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={nome_arquivo}"},
+
+@app.route("/exportar-excel")
+def exportar_excel() -> Response:
+    return _responder_exportacao(
+        "xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        _gerar_excel,
     )
 
 
+IMPORTACAO_LOTE = int(os.environ.get("IMPORTACAO_LOTE", "1000") or 1000)
+ERROS_EXIBIDOS_IMPORTACAO = 10
+# Validação em processos: o primeiro lote de cada importação é validado na
+# própria thread (arquivos de um lote só não criam o pool); os seguintes vão
+# para um pool único do processo, criado sob demanda. 1 desliga.
+IMPORTACAO_PROCESSOS = int(os.environ.get("IMPORTACAO_PROCESSOS", "0") or 0) or min(4, os.cpu_count() or 1)
+_pool_importacao: ProcessPoolExecutor | None = None
+_lock_pool_importacao = threading.Lock()
+
+
+def _obter_pool_importacao() -> ProcessPoolExecutor | None:
+    global _pool_importacao
+    if IMPORTACAO_PROCESSOS <= 1:
+        return None
+    if _pool_importacao is None:
+        with _lock_pool_importacao:
+            if _pool_importacao is None:
+                # spawn: um fork herdaria as threads do servidor e do cliente do Firestore
+                _pool_importacao = ProcessPoolExecutor(
+                    IMPORTACAO_PROCESSOS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool_importacao
+
+
+def _descartar_pool_importacao() -> None:
+    global _pool_importacao
+    with _lock_pool_importacao:
+        pool, _pool_importacao = _pool_importacao, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_descartar_pool_importacao)
+
+
+class ImportacaoInterrompida(Exception):
+    """Falha depois de lotes já gravados; ``resumo`` conta o que foi gravado."""
+
+    def __init__(self, resumo: dict[str, int], causa: Exception) -> None:
+        super().__init__(str(causa))
+        self.resumo = resumo
+
+
+class ResultadoLinha(NamedTuple):
+    linha: int
+    bruto: dict[str, str]
+    # "novo", "alterado", "inalterado", "duplicado" ou "erro"
+    situacao: str
+    mensagem: str = ""
+    payload: dict[str, object] | None = None
+    professor_id: int | None = None
+
+
+def classificar_lotes(
+    linhas: Iterable[tuple[int, dict[str, str]]], atualizar_alterados: bool = False
+) -> Iterator[list[ResultadoLinha]]:
+    """Classifica as linhas lidas da planilha, em lotes de IMPORTACAO_LOTE, sem gravar.
+
+    Linhas iguais (mesmo hash) à que originou o cadastro com o mesmo CPF são
+    "inalterado" antes da validação; as que mudaram são "alterado" se
+    ``atualizar_alterados``, senão "duplicado". Só o lote atual e os CPFs já
+    vistos ficam em memória. A partir do segundo lote a validação roda em
+    IMPORTACAO_PROCESSOS processos enquanto o lote atual é gravado.
+    """
+    lotes = preparar_em_processos(
+        em_lotes(linhas, IMPORTACAO_LOTE), _obter_pool_importacao, IMPORTACAO_LOTE, 2 * IMPORTACAO_PROCESSOS
+    )
+    try:
+        yield from _classificar_lotes(lotes, atualizar_alterados)
+    except BrokenProcessPool:
+        # um processo morreu: a próxima importação cria outro pool
+        _descartar_pool_importacao()
+        raise
+    finally:
+        lotes.close()
+
+
+def _classificar_lotes(
+    lotes: Iterator[tuple[Lote, Preparados | None]],
+    atualizar_alterados: bool,
+) -> Iterator[list[ResultadoLinha]]:
+    # CPF -> linha em que apareceu primeiro (repetidos entre lotes)
+    cpfs_vistos: dict[str, int] = {}
+
+    for lote, preparados in lotes:
+        cpfs = [only_digits(bruto.get("cpf", "")) for _, bruto in lote]
+        conhecidos = hashes_importacao([cpf for cpf in cpfs if cpf])
+        resultados: list[ResultadoLinha] = []
+        # preparados (hash, payload, erro) vêm dos processos; em série, só o hash
+        # é calculado antes, e a validação fica para as linhas pendentes
+        if preparados is not None:
+            hashes = [hash_bruto for hash_bruto, _, _ in preparados]
+        else:
+            hashes = [hash_linha(bruto) for _, bruto in lote]
+
+        # linhas idênticas à já gravada: nem validação nem escrita
+        pendentes: list[tuple[int, dict[str, str], str]] = []
+        posicoes: list[int] = []
+        for posicao, ((row_idx, bruto), cpf, hash_bruto) in enumerate(zip(lote, cpfs, hashes)):
+            conhecido = conhecidos.get(cpf)
+            if conhecido is not None and conhecido[1] == hash_bruto and cpf not in cpfs_vistos:
+                cpfs_vistos[cpf] = row_idx
+                resultados.append(ResultadoLinha(row_idx, bruto, "inalterado", professor_id=conhecido[0]))
+                continue
+            pendentes.append((row_idx, bruto, hash_bruto))
+            posicoes.append(posicao)
+
+        if preparados is not None:
+            validados = [preparados[posicao][1:] for posicao in posicoes]
+        else:
+            validados = validar_lote(bruto for _, bruto, _ in pendentes)
+        # CPFs repetidos dentro do lote, em uma passada vetorizada, só entre as
+        # linhas válidas: uma linha recusada não conta como primeira ocorrência
+        validas = [posicao for posicao, (_, erro) in enumerate(validados) if not erro]
+        lote_cpf = validar_cpfs_lote([validados[posicao][0]["cpf"] for posicao in validas])
+        primeira_valida = {
+            posicao: validas[primeira] if primeira is not None else None
+            for posicao, primeira in zip(validas, lote_cpf.duplicado_de)
+        }
+        criado_em = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        for posicao, ((row_idx, bruto, hash_bruto), (payload, erro)) in enumerate(zip(pendentes, validados)):
+            if erro:
+                resultados.append(ResultadoLinha(row_idx, bruto, "erro", erro))
+                continue
+
+            primeira = primeira_valida[posicao]
+            linha_original = pendentes[primeira][0] if primeira is not None else cpfs_vistos.get(payload["cpf"])
+            if linha_original is not None:
+                resultados.append(ResultadoLinha(
+                    row_idx, bruto, "erro", f"CPF repetido no arquivo (já informado na linha {linha_original})"
+                ))
+                continue
+            cpfs_vistos[payload["cpf"]] = row_idx
+
+            payload["hash_importacao"] = hash_bruto
+            conhecido = conhecidos.get(payload["cpf"])
+            if conhecido is None:
+                payload["criado_em"] = criado_em
+                resultados.append(ResultadoLinha(row_idx, bruto, "novo", payload=payload))
+            elif atualizar_alterados:
+                resultados.append(ResultadoLinha(row_idx, bruto, "alterado", payload=payload, professor_id=conhecido[0]))
+            else:
+                # CPF já cadastrado pula a linha, não é erro
+                resultados.append(ResultadoLinha(row_idx, bruto, "duplicado", "CPF já cadastrado", professor_id=conhecido[0]))
+
+        resultados.sort(key=lambda resultado: resultado.linha)
+        yield resultados
+
+
+def importar_linhas(
+    linhas: Iterable[tuple[int, dict[str, str]]], atualizar_alterados: bool = False
+) -> tuple[dict[str, int], list[str]]:
+    """Grava as linhas classificadas por ``classificar_lotes``, um lote por vez.
+
+    Retorna as contagens e as primeiras mensagens de erro. Uma falha depois de
+    algum lote gravado vira ``ImportacaoInterrompida``.
+    """
+    resumo = dict.fromkeys(("linhas", "inseridos", "atualizados", "inalterados", "duplicados", "erros"), 0)
+    erros: list[str] = []
+
+    def registrar_erro(mensagem: str) -> None:
+        resumo["erros"] += 1
+        if len(erros) < ERROS_EXIBIDOS_IMPORTACAO:
+            erros.append(mensagem)
+
+    try:
+        for lote in classificar_lotes(linhas, atualizar_alterados):
+            resumo["linhas"] += len(lote)
+            novos: list[ResultadoLinha] = []
+            alterados: list[ResultadoLinha] = []
+            for resultado in lote:
+                if resultado.situacao == "erro":
+                    registrar_erro(f"Linha {resultado.linha}: {resultado.mensagem}")
+                elif resultado.situacao == "inalterado":
+                    resumo["inalterados"] += 1
+                elif resultado.situacao == "duplicado":
+                    resumo["duplicados"] += 1
+                elif resultado.situacao == "novo":
+                    novos.append(resultado)
+                else:
+                    alterados.append(resultado)
+
+            gravacoes = zip(
+                novos + alterados,
+                inserir_professores_em_lote([resultado.payload for resultado in novos])
+                + atualizar_professores_importados([
+                    (resultado.professor_id, {
+                        **alteracoes_importacao(resultado.bruto, resultado.payload),
+                        "hash_importacao": resultado.payload["hash_importacao"],
+                    })
+                    for resultado in alterados
+                ]),
+            )
+            for resultado, gravacao in gravacoes:
+                if gravacao == "inserido":
+                    resumo["inseridos"] += 1
+                elif gravacao == "atualizado":
+                    resumo["atualizados"] += 1
+                elif gravacao == "duplicado":
+                    resumo["duplicados"] += 1
+                else:
+                    registrar_erro(f"Linha {resultado.linha}: {gravacao}")
+    except Exception as e:
+        # lotes anteriores já foram gravados: quem chama precisa saber quantos
+        if resumo["inseridos"] or resumo["atualizados"]:
+            raise ImportacaoInterrompida(resumo, e) from e
+        raise
+
+    return resumo, erros
+
+
+def _leitor_da_planilha(nome_arquivo: str, codificacao: str | None = None):
+    nome_arquivo = nome_arquivo.lower()
+    if nome_arquivo.endswith(EXTENSOES_CSV):
+        return partial(linhas_csv, codificacao=codificacao)
+    if nome_arquivo.endswith(EXTENSOES_EXCEL):
+        return linhas_excel
+    return None
+
+
 @app.route("/importar-excel", methods=["GET", "POST"])
 def importar_excel() -> str:
     if request.method == "GET":
@@ -858,158 +2340,205 @@ def importar_excel() -> str:
         return render_template("import.html")
 
     # validar extensão
-    if not file.filename.lower().endswith((".xlsx", ".xls")):
-        flash("O arquivo deve ser .xlsx ou .xls", "erro")
+    if _leitor_da_planilha(file.filename) is None:
+        flash("O arquivo deve ser .xlsx, .xls ou .csv", "erro")
         return render_template("import.html")
 
-    try:
-        from openpyxl import load_workbook
-
-        # carregar workbook
-        workbook = load_workbook(file)
-        sheet = workbook.active
-
-        if not sheet:
-            flash("Arquivo Excel vazio.", "erro")
-            return render_template("import.html")
-
-        # ler cabeçalhos
-        headers = []
-        for cell in sheet[1]:
-            headers.append(cell.value)
-
-        if not headers:
-            flash("Arquivo não contém cabeçalhos.", "erro")
-            return render_template("import.html")
-
-        # processar linhas
-        inseridos = 0
-        duplicados = 0
-        erros: list[str] = []
-
-        for row_idx, row in enumerate(sheet.iter_rows(values_only=True, min_row=2), start=2):
-            # converter linha em dict
-            linha_dict = {headers[i]: row[i] for i in range(len(headers)) if i < len(row)}
-
-            # pular linhas vazias
-            if not linha_dict.get("nome"):
-                continue
+    # o mesmo arquivo já importado no mesmo modo: recusa sem ler nenhuma linha,
+    # a não ser que o usuário peça para reimportar (ex.: cadastros excluídos)
+    atualizar_alterados = request.form.get("atualizar_alterados") == "on"
+    analise = analisar_arquivo(file.stream)
+    chave = chave_importacao(analise.hash, atualizar_alterados)
+    anterior = buscar_importacao(chave)
+    if anterior and request.form.get("reimportar") != "on":
+        flash(
+            f"Este arquivo já foi importado em {anterior.get('criado_em')} "
+            f"({anterior.get('inseridos', 0)} inseridos). Nada foi alterado; marque "
+            "\"Importar de novo\" para processá-lo mesmo assim.",
+            "aviso",
+        )
+        return render_template("import.html")
 
-            # normalizar keys para lowercase
-            linha_dict = {k.strip().lower() if isinstance(k, str) else k: v for k, v in linha_dict.items()}
+    ler_linhas = _leitor_da_planilha(file.filename, analise.codificacao)
+    try:
+        resumo, erros = importar_linhas(ler_linhas(file.stream), atualizar_alterados=atualizar_alterados)
+    except ImportacaoInterrompida as e:
+        flash(
+            f"Erro ao processar arquivo depois de {e.resumo['linhas']} linhas: {e}. "
+            f"Antes do erro, {e.resumo['inseridos']} cadastros foram inseridos e "
+            f"{e.resumo['atualizados']} atualizados; reenviando o arquivo corrigido, "
+            "essas linhas são reconhecidas e ignoradas.",
+            "erro",
+        )
+        return render_template("import.html")
+    except Exception as e:
+        flash(f"Erro ao processar arquivo: {str(e)}", "erro")
+        return render_template("import.html")
 
-            # preparar payload (mapear colunas para fields do formulário)
-            payload = {}
-            for coluna, valor in linha_dict.items():
-                # mapeia nome/nome_completo -> nome, cpf/CPF -> cpf, etc.
-                coluna_limpa = coluna.strip().lower() if isinstance(coluna, str) else coluna
-                valor_limpo = str(valor).strip() if valor else ""
-
-                if coluna_limpa in ("nome", "nome_completo"):
-                    payload["nome"] = valor_limpo
-                elif coluna_limpa in ("cpf",):
-                    payload["cpf"] = valor_limpo
-                elif coluna_limpa in ("rg",):
-                    payload["rg"] = valor_limpo
-                elif coluna_limpa in ("matricula",):
-                    payload["matricula"] = valor_limpo
-                elif coluna_limpa in ("escola", "local de trabalho"):
-                    payload["escola"] = valor_limpo
-                elif coluna_limpa in ("cargo",):
-                    payload["cargo"] = valor_limpo
-                elif coluna_limpa in ("situacao_servidor", "situação do servidor"):
-                    payload["situacao_servidor"] = valor_limpo
-                elif coluna_limpa in ("data_admissao", "data de admissão"):
-                    payload["data_admissao"] = valor_limpo
-                elif coluna_limpa in ("telefone",):
-                    payload["telefone"] = valor_limpo
-                elif coluna_limpa in ("email", "e-mail"):
-                    payload["email"] = valor_limpo
-                elif coluna_limpa in ("endereco", "endereço"):
-                    payload["endereco"] = valor_limpo
-                elif coluna_limpa in ("banco",):
-                    payload["banco"] = valor_limpo
-                elif coluna_limpa in ("agencia", "agência"):
-                    payload["agencia"] = valor_limpo
-                elif coluna_limpa in ("conta",):
-                    payload["conta"] = valor_limpo
-                elif coluna_limpa in ("tipo_conta", "tipo de conta"):
-                    payload["tipo_conta"] = valor_limpo
-                elif coluna_limpa in ("data_inicio_fundef", "data inicial do fundef"):
-                    payload["data_inicio_fundef"] = valor_limpo
-                elif coluna_limpa in ("data_fim_fundef", "data final do fundef"):
-                    payload["data_fim_fundef"] = valor_limpo
-                elif coluna_limpa in ("carga_horaria",):
-                    payload["carga_horaria"] = valor_limpo
-                elif coluna_limpa in ("quantidade_meses_trabalhados",):
-                    payload["quantidade_meses_trabalhados"] = valor_limpo
-                elif coluna_limpa in ("aceitou_declaracao",):
-                    payload["aceitou_declaracao"] = valor_limpo
-
-            # validar dados obrigatórios
-            campos_obrigatorios = ["nome", "cpf", "escola", "cargo"]
-            faltam = [c for c in campos_obrigatorios if not payload.get(c)]
-            if faltam:
-                erros.append(f"Linha {row_idx}: faltam campos {', '.join(faltam)}")
-                continue
+    # só importações concluídas: um arquivo que falhou no meio pode ser reenviado
+    registrar_importacao(
+        chave,
+        {"nome_arquivo": file.filename, "criado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **resumo},
+    )
 
-            # validar CPF
-            cpf_val = payload.get("cpf", "")
-            if not cpf_valido(cpf_val):
-                erros.append(f"Linha {row_idx}: CPF inválido ({cpf_val})")
-                continue
+    # relatório final
+    mensagem = f"Importação concluída: {resumo['inseridos']} inseridos"
+    if resumo["atualizados"]:
+        mensagem += f", {resumo['atualizados']} atualizados"
+    mensagem += f", {resumo['inalterados']} sem alteração, {resumo['duplicados']} duplicados ignorados."
+    flash(mensagem, "sucesso")
+    for erro in erros:
+        flash(erro, "aviso")
+    if resumo["erros"] > len(erros):
+        flash(f"... e mais {resumo['erros'] - len(erros)} erros.", "aviso")
 
-            # verificar duplicado
-            cpf_limpo = only_digits(cpf_val)
-            existente = db_find_professor_by_cpf(cpf_limpo)
-            if existente:
-                duplicados += 1
-                continue  # pula linha, não erro
-
-            # preparar campos numerados/normalizados
-            payload["cpf"] = cpf_limpo
-            payload["escola"] = normalizar_escola(payload.get("escola", ""))
-            payload["situacao_servidor"] = normalizar_situacao_servidor(
-                payload.get("situacao_servidor", "Ativo")
-            )
-            payload["telefone"] = only_digits(payload.get("telefone", ""))
-            payload["carga_horaria"] = str(CARGA_HORARIA_SEMANAL_FIXA)
+    return redirect(url_for("index"))
 
-            # tentar calcular meses se datas existem
-            meses = tentar_calcular_meses_validos(payload)
-            if meses:
-                payload["quantidade_meses_trabalhados"] = meses
-            else:
-                payload["quantidade_meses_trabalhados"] = 1
 
-            payload["aceitou_declaracao"] = 1
-            payload["criado_em"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+SITUACOES_IMPORTACAO = {
+    "novo": "Nova",
+    "alterado": "Atualizaria o cadastro",
+    "inalterado": "Sem alteração",
+    "duplicado": "Já cadastrado",
+    "erro": "Erro",
+}
+PREVIA_TTL_HORAS = 24
+_RE_TOKEN_PREVIA = re.compile(r"[0-9A-Za-z_-]{16,64}")
 
-            # inserir
-            try:
-                db_insert_professor(payload)
-                inseridos += 1
-            except Exception as e:
-                erros.append(f"Linha {row_idx}: erro ao inserir ({str(e)})")
 
-        # relatório final
-        flash(f"Importação concluída: {inseridos} inseridos, {duplicados} duplicados ignorados.", "sucesso")
-        if erros:
-            for erro in erros[:10]:  # mostrar até 10 erros
-                flash(erro, "aviso")
-            if len(erros) > 10:
-                flash(f"... e mais {len(erros) - 10} erros.", "aviso")
+def _pasta_previas() -> Path:
+    pasta = get_data_dir() / "previas_importacao"
+    pasta.mkdir(parents=True, exist_ok=True)
+    return pasta
 
-        return redirect(url_for("index"))
 
+def _limpar_previas_antigas(pasta: Path) -> None:
+    limite = time.time() - PREVIA_TTL_HORAS * 3600
+    for antigo in [*pasta.glob("*.csv"), *pasta.glob(".*.upload"), *pasta.glob(".*.tmp")]:
+        try:
+            if antigo.stat().st_mtime < limite:
+                antigo.unlink()
+        except OSError:
+            pass
+
+
+def previa_em_partes(planilha: Path, ler_linhas, atualizar_alterados: bool, token: str) -> Iterator[Markup]:
+    """Valida a planilha inteira sem gravar, devolvendo um fragmento HTML por lote.
+
+    As linhas com erro vão para ``<token>.csv`` (colunas do arquivo + linha e
+    erro), oferecido para download no último fragmento. ``planilha`` é uma
+    cópia do upload (o Flask fecha o original ao fim da view, antes de a
+    resposta terminar de sair) e é apagada no fim.
+    """
+    pasta = planilha.parent
+    destino = pasta / f"{token}.csv"
+    temporario = pasta / f".{token}.tmp"
+    fragmento_lote = app.jinja_env.get_template("previa_lote.html")
+    contagens = dict.fromkeys(SITUACOES_IMPORTACAO, 0)
+    total = 0
+    falha = ""
+    escritor: csv.DictWriter | None = None
+    try:
+        with open(planilha, "rb") as entrada, open(temporario, "w", newline="", encoding="utf-8-sig") as saida:
+            for lote in classificar_lotes(ler_linhas(entrada), atualizar_alterados):
+                parciais = dict.fromkeys(SITUACOES_IMPORTACAO, 0)
+                for resultado in lote:
+                    parciais[resultado.situacao] += 1
+                    if resultado.situacao != "erro":
+                        continue
+                    if escritor is None:
+                        escritor = csv.DictWriter(
+                            saida, ["linha", "erro", *resultado.bruto], delimiter=";", extrasaction="ignore"
+                        )
+                        escritor.writeheader()
+                    escritor.writerow({**resultado.bruto, "linha": resultado.linha, "erro": resultado.mensagem})
+                for situacao, quantidade in parciais.items():
+                    contagens[situacao] += quantidade
+                total += len(lote)
+                yield Markup(fragmento_lote.render(
+                    primeira=lote[0].linha,
+                    ultima=lote[-1].linha,
+                    contagens=parciais,
+                    destaques=[r for r in lote if r.situacao not in ("novo", "inalterado")],
+                    rotulos=SITUACOES_IMPORTACAO,
+                ))
+        if escritor is not None:
+            os.replace(temporario, destino)
     except Exception as e:
-        flash(f"Erro ao processar arquivo: {str(e)}", "erro")
+        logger.exception("falha na pré-validação da importação")
+        falha = str(e)
+    finally:
+        # também quando o cliente desiste no meio (GeneratorExit)
+        planilha.unlink(missing_ok=True)
+        temporario.unlink(missing_ok=True)
+    yield Markup(app.jinja_env.get_template("previa_resumo.html").render(
+        total=total,
+        contagens=contagens,
+        falha=falha,
+        url_erros=url_for("erros_previa_importacao", token=token) if escritor is not None else "",
+    ))
+
+
+@app.route("/importar-excel/previa", methods=["POST"])
+def previa_importacao() -> Response | str:
+    file = request.files.get("file")
+    if not file or file.filename == "":
+        flash("Arquivo não selecionado.", "erro")
+        return render_template("import.html")
+    if _leitor_da_planilha(file.filename) is None:
+        flash("O arquivo deve ser .xlsx, .xls ou .csv", "erro")
         return render_template("import.html")
 
+    analise = analisar_arquivo(file.stream)
+    ler_linhas = _leitor_da_planilha(file.filename, analise.codificacao)
+    anterior = buscar_importacao(chave_importacao(analise.hash, request.form.get("atualizar_alterados") == "on"))
+    token = secrets.token_urlsafe(16)
+    pasta = _pasta_previas()
+    _limpar_previas_antigas(pasta)
+    planilha = pasta / f".{token}.upload"
+    file.save(planilha)
+    partes = previa_em_partes(planilha, ler_linhas, request.form.get("atualizar_alterados") == "on", token)
+    resposta = Response(
+        stream_template("import_previa.html", partes=partes, nome_arquivo=file.filename, anterior=anterior),
+        mimetype="text/html",
+    )
+    resposta.headers["Cache-Control"] = "no-store"
+    # proxies (nginx) entregam cada lote assim que sai, sem acumular
+    resposta.headers["X-Accel-Buffering"] = "no"
+
+    @resposta.call_on_close
+    def _descartar_upload() -> None:
+        # cliente desistiu antes do fim: não deixa a cópia do upload para trás
+        partes.close()
+        planilha.unlink(missing_ok=True)
+
+    return resposta
+
+
+@app.route("/importar-excel/previa/<token>.csv")
+def erros_previa_importacao(token: str) -> Response:
+    caminho = _pasta_previas() / f"{token}.csv"
+    if not _RE_TOKEN_PREVIA.fullmatch(token) or not caminho.is_file():
+        abort(404)
+    return send_file(
+        caminho,
+        mimetype="text/csv",
+        as_attachment=True,
+        download_name="erros-importacao.csv",
+        etag=False,
+        conditional=False,
+    )
+
 
 @app.route("/rateio", methods=["GET", "POST"])
-def rateio() -> str:
-    professores = db_professores_rateio()
+def rateio() -> Response:
+    if request.method == "GET":
+        versao, alterado_em = versao_registro()
+        etag = f"rateio-{versao}"
+        nao_modificada = resposta_nao_modificada(etag)
+        if nao_modificada:
+            return nao_modificada
+        quantidade_professores, soma_meses = totais_rateio()
 
     dados_form = {
         "valor_total": VALOR_PADRAO_PRECATORIO,
@@ -1022,6 +2551,9 @@ def rateio() -> str:
             "valor_total": request.form.get("valor_total", "").strip(),
         }
         erros: list[str] = []
+        professores = professores_rateio()
+        quantidade_professores = len(professores)
+        soma_meses = sum(int(p["quantidade_meses_trabalhados"] or 0) for p in professores)
 
         if not professores:
             erros.append("Não há cadastros para calcular o rateio.")
@@ -1041,7 +2573,8 @@ def rateio() -> str:
                 dados_form=dados_form,
                 resultado_rateio=resultado_rateio,
                 resumo_rateio=resumo_rateio,
-                quantidade_professores=len(professores),
+                quantidade_professores=quantidade_professores,
+                soma_meses=soma_meses,
             )
 
         valor_disponivel_rateio = valor_total.quantize(
@@ -1078,7 +2611,8 @@ def rateio() -> str:
                 dados_form=dados_form,
                 resultado_rateio=resultado_rateio,
                 resumo_rateio=resumo_rateio,
-                quantidade_professores=len(professores),
+                quantidade_professores=quantidade_professores,
+                soma_meses=soma_meses,
             )
 
         resultado_rateio = []
@@ -1093,20 +2627,26 @@ def rateio() -> str:
         soma_pesos = sum(pesos)
         resumo_rateio = {
             "criterio_texto": "Meses trabalhados",
-            "quantidade_professores": len(professores),
+            "quantidade_professores": quantidade_professores,
             "valor_total": valor_total,
             "valor_disponivel_rateio": valor_disponivel_rateio,
             "soma_pesos": soma_pesos,
         }
         flash("Rateio calculado com sucesso.", "sucesso")
 
-    return render_template(
-        "rateio.html",
-        dados_form=dados_form,
-        resultado_rateio=resultado_rateio,
-        resumo_rateio=resumo_rateio,
-        quantidade_professores=len(professores),
+    resposta = make_response(
+        render_template(
+            "rateio.html",
+            dados_form=dados_form,
+            resultado_rateio=resultado_rateio,
+            resumo_rateio=resumo_rateio,
+            quantidade_professores=quantidade_professores,
+            soma_meses=soma_meses,
+        )
     )
+    if request.method == "GET":
+        return resposta_com_versao(resposta, etag, alterado_em)
+    return resposta
 
 
 if __name__ == "__main__":
@@ -0,0 +1 @@
+"""Benchmarks da aplicação (executar a partir da raiz: ``python -m benchmarks.<nome>``)."""
@@ -0,0 +1,81 @@
+"""Benchmark da busca no índice em memória.
+
+Monta o índice com N professores sintéticos e mede a latência de consultas
+típicas (prefixo de nome, prefixo de CPF, filtros e combinações).
+
+Uso: python -m benchmarks.bench_busca [--registros 50000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.sinteticos import gerar_professor  # noqa: E402
+from busca import IndiceBusca  # noqa: E402
+from validacao import normalizar_dados_formulario  # noqa: E402
+
+CONSULTAS = [
+    {"consulta": "maria"},
+    {"consulta": "jo si"},
+    {"consulta": "conceicao ara"},
+    {"consulta": "sa"},
+    {"consulta": "123"},
+    {"consulta": "10001"},
+    {"consulta": "", "escola": "Seduc"},
+    {"consulta": "ana", "situacao_servidor": "Aposentado"},
+    {"consulta": "", "escola": "Escola", "situacao_servidor": "Ativo", "pagina": 50},
+    {"consulta": ""},
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registros", type=int, default=50_000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(31)
+    registros = []
+    for indice in range(args.registros):
+        registro = normalizar_dados_formulario(gerar_professor(rng, indice))
+        registro["id"] = indice + 1
+        registros.append(registro)
+
+    indice = IndiceBusca()
+    inicio = time.perf_counter()
+    indice.reconstruir(registros, "1-bench")
+    construcao = time.perf_counter() - inicio
+
+    resultados = {}
+    for parametros in CONSULTAS:
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            total, _ = indice.buscar(**parametros)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        tempos.sort()
+        chave = json.dumps(parametros, ensure_ascii=False)
+        resultados[chave] = {
+            "total": total,
+            "p50_ms": round(statistics.median(tempos), 3),
+            "p95_ms": round(tempos[int(len(tempos) * 0.95) - 1], 3),
+        }
+
+    print(
+        json.dumps(
+            {"registros": args.registros, "construcao_s": round(construcao, 3), "consultas": resultados},
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
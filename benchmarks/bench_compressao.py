@@ -0,0 +1,102 @@
+"""Benchmark da compressão de respostas: bytes economizados e CPU por requisição.
+
+Popula um SQLite temporário com professores sintéticos e pede ``GET /``,
+``POST /rateio`` e ``GET /exportar-csv`` sem compressão (``identity``), com
+gzip em alguns níveis e, se o pacote ``brotli`` estiver instalado, com
+brotli. Para cada caso informa o tamanho transferido, a razão sobre o
+original e o tempo de CPU médio por requisição (``time.process_time``); a
+diferença para ``identity`` é o custo da compressão.
+
+Uso: python -m benchmarks.bench_compressao [--professores 2000] [--repeticoes 20]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["USE_FIREBASE"] = "0"
+os.environ["COMPRESSAO_HABILITADA"] = "1"
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bench-compressao-"))
+
+import app as aplicacao  # noqa: E402
+from benchmarks.sinteticos import gerar_registros  # noqa: E402
+from compressao import MiddlewareCompressao  # noqa: E402
+from estaticos import brotli  # noqa: E402
+
+ROTAS = {
+    "index": ("GET", "/", None),
+    "rateio_post": ("POST", "/rateio", {"valor_total": "1500000,00"}),
+    "exportar_csv": ("GET", "/exportar-csv", None),
+}
+
+
+def _popular(quantidade: int) -> None:
+    registros = gerar_registros(quantidade)
+    with aplicacao.get_connection() as conn:
+        colunas = aplicacao._colunas_professor(conn, registros[0]) + ["id"]
+        conn.executemany(
+            f"INSERT INTO professores ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})",
+            [[registro.get(coluna) for coluna in colunas] for registro in registros],
+        )
+    aplicacao.marcar_registro_alterado()
+
+
+def _medir(cliente, metodo: str, rota: str, dados, codificacao: str, repeticoes: int) -> dict[str, float]:
+    cabecalhos = {"Accept-Encoding": codificacao}
+    tamanho = 0
+    inicio = time.process_time()
+    for _ in range(repeticoes):
+        resposta = cliente.open(rota, method=metodo, data=dados, headers=cabecalhos)
+        assert resposta.status_code == 200, (rota, resposta.status_code)
+        recebida = resposta.headers.get("Content-Encoding", "identity")
+        assert recebida == codificacao, (rota, recebida)
+        tamanho = len(resposta.get_data())
+    return {"bytes": tamanho, "cpu_ms": round((time.process_time() - inicio) * 1000 / repeticoes, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--professores", type=int, default=2000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--niveis-gzip", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--niveis-brotli", type=int, nargs="+", default=[4, 11])
+    args = parser.parse_args()
+
+    _popular(args.professores)
+    middleware = aplicacao.app.wsgi_app
+    assert isinstance(middleware, MiddlewareCompressao)
+    cliente = aplicacao.app.test_client()
+
+    casos = [("identity", None)] + [("gzip", nivel) for nivel in args.niveis_gzip]
+    if brotli is not None:
+        casos += [("br", nivel) for nivel in args.niveis_brotli]
+
+    resultado: dict[str, object] = {"professores": args.professores, "brotli": brotli is not None, "rotas": {}}
+    for nome, (metodo, rota, dados) in ROTAS.items():
+        _medir(cliente, metodo, rota, dados, "identity", 1)  # aquece cache de exportação e templates
+        medidas: dict[str, dict[str, float]] = {}
+        for codificacao, nivel in casos:
+            if codificacao == "gzip":
+                middleware.nivel_gzip = nivel
+            elif codificacao == "br":
+                middleware.nivel_brotli = nivel
+            chave = codificacao if nivel is None else f"{codificacao}-{nivel}"
+            medidas[chave] = _medir(cliente, metodo, rota, dados, codificacao, args.repeticoes)
+        original = medidas["identity"]
+        for chave, medida in medidas.items():
+            medida["razao"] = round(medida["bytes"] / original["bytes"], 3)
+            medida["cpu_extra_ms"] = round(medida["cpu_ms"] - original["cpu_ms"], 2)
+        resultado["rotas"][nome] = medidas
+
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
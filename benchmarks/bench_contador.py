@@ -0,0 +1,104 @@
+"""Benchmark de contenção na emissão de ids contra um Firestore falso.
+
+Várias threads chamam ``db_layer._next_id("professor")`` ao mesmo tempo,
+como cadastros simultâneos e importações. O fake limita as escritas
+sustentadas por documento (``--escritas-por-doc``, ~1/s no Firestore) e
+aborta transações em conflito, que o ``transactional`` repete até desistir.
+Compara um único documento (``CONTADOR_SHARDS=1``, o esquema anterior) com
+contadores distribuídos em ``--shards`` documentos e mede vazão, latência,
+conflitos, ids que caíram no fallback de timestamp e ids repetidos.
+
+Uso: python -m benchmarks.bench_contador [--threads 16] [--shards 8] [--duracao 5]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["USE_FIREBASE"] = "1"
+
+import db_layer  # noqa: E402
+from logs import configurar_logs  # noqa: E402
+from benchmarks.firestore_fake import FirestoreFake, instalar  # noqa: E402
+
+
+def _cenario(args, shards: int) -> dict[str, object]:
+    fake = FirestoreFake(latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms, semente=41)
+    fake.escritas_por_doc_s = args.escritas_por_doc
+    instalar(fake)
+    db_layer.CONTADOR_SHARDS = shards
+    db_layer._contadores.clear()
+    db_layer._next_id("professor")  # cria a configuração do contador fora da medição
+
+    tempos: list[float] = []
+    ids: list[int] = []
+    lock = threading.Lock()
+    fim = time.monotonic() + args.duracao
+
+    def trabalhar() -> None:
+        while time.monotonic() < fim:
+            inicio = time.perf_counter()
+            novo_id = db_layer._next_id("professor")
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            with lock:
+                tempos.append(duracao_ms)
+                ids.append(novo_id)
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(args.threads)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    decorrido = time.perf_counter() - inicio
+
+    emitidos = [i for i in ids if i]
+    tempos.sort()
+    return {
+        "shards": shards,
+        "ids_por_s": round(len(emitidos) / decorrido, 1),
+        "p50_ms": round(statistics.median(tempos), 1),
+        "p95_ms": round(tempos[max(int(len(tempos) * 0.95) - 1, 0)], 1),
+        "conflitos": fake.conflitos,
+        "fallback_timestamp": len(ids) - len(emitidos),
+        "repetidos": len(emitidos) - len(set(emitidos)),
+        "emitidos_segundo_shards": db_layer.ids_emitidos("professor"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--duracao", type=float, default=5.0)
+    parser.add_argument("--escritas-por-doc", type=float, default=1.0)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    configurar_logs()
+
+    print(
+        json.dumps(
+            {
+                "threads": args.threads,
+                "duracao_s": args.duracao,
+                "escritas_por_doc_s": args.escritas_por_doc,
+                "latencia_ms": args.latencia_ms,
+                "documento_unico": _cenario(args, 1),
+                "distribuido": _cenario(args, args.shards),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
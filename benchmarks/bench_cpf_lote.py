@@ -0,0 +1,74 @@
+"""Benchmark da validação/deduplicação de CPFs em lote.
+
+Compara ``cpf_valido`` chamado linha a linha (com um ``set`` para achar
+repetidos) com ``validar_cpfs_lote`` (NumPy).
+
+Uso: python -m benchmarks.bench_cpf_lote [--cpfs 50000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.sinteticos import gerar_cpf  # noqa: E402
+from validacao import cpf_valido, np, only_digits, validar_cpfs_lote  # noqa: E402
+
+
+def _escalar(cpfs: list[str]) -> int:
+    vistos: set[str] = set()
+    repetidos = 0
+    for cpf in cpfs:
+        if cpf_valido(cpf):
+            limpo = only_digits(cpf)
+            if limpo in vistos:
+                repetidos += 1
+            vistos.add(limpo)
+    return repetidos
+
+
+def _medir(funcao, cpfs, repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(cpfs)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cpfs", type=int, default=50_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(2006)
+    cpfs = [gerar_cpf(rng) for _ in range(args.cpfs)]
+    # ~2% repetidos e ~3% com dígito verificador errado, metade com máscara
+    cpfs += rng.sample(cpfs, args.cpfs // 50)
+    cpfs = [c[:-1] + "0" if rng.random() < 0.03 else c for c in cpfs]
+    cpfs = [f"{c[:3]}.{c[3:6]}.{c[6:9]}-{c[9:]}" if i % 2 else c for i, c in enumerate(cpfs)]
+
+    escalar = _medir(_escalar, cpfs, args.repeticoes)
+    lote = _medir(validar_cpfs_lote, cpfs, args.repeticoes)
+    print(
+        json.dumps(
+            {
+                "cpfs": len(cpfs),
+                "numpy": np is not None,
+                "escalar_s": round(escalar, 4),
+                "lote_s": round(lote, 4),
+                "ganho": round(escalar / lote, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark da leitura das planilhas de importação: CSV em fluxo x Excel.
+
+Gera o mesmo conjunto de linhas como CSV (Latin-1, separado por ``;``, como
+sai dos sistemas de RH) e como .xlsx, e mede só a leitura e o mapeamento de
+cabeçalhos (``importacao.linhas_csv`` e ``importacao.linhas_excel``), sem
+validação nem gravação. Com ``--memoria``, mede também o pico de memória
+de cada leitura.
+
+Uso: python -m benchmarks.bench_importacao [--linhas 20000] [--memoria]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from openpyxl import Workbook  # noqa: E402
+
+from benchmarks.sinteticos import gerar_linhas  # noqa: E402
+from importacao import linhas_csv, linhas_excel  # noqa: E402
+
+
+def _gerar_arquivos(quantidade: int) -> tuple[bytes, bytes]:
+    linhas = gerar_linhas(quantidade)
+    cabecalhos = list(linhas[0])
+
+    texto = io.StringIO()
+    escritor = csv.writer(texto, delimiter=";")
+    escritor.writerow(cabecalhos)
+    escritor.writerows([linha[c] for c in cabecalhos] for linha in linhas)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(cabecalhos)
+    for linha in linhas:
+        sheet.append([linha[c] for c in cabecalhos])
+    planilha = io.BytesIO()
+    workbook.save(planilha)
+    return texto.getvalue().encode("latin-1"), planilha.getvalue()
+
+
+def _medir(leitor, conteudo: bytes, memoria: bool) -> dict[str, object]:
+    inicio = time.perf_counter()
+    lidas = sum(1 for _ in leitor(io.BytesIO(conteudo)))
+    decorrido = time.perf_counter() - inicio
+    resultado: dict[str, object] = {
+        "linhas": lidas,
+        "segundos": round(decorrido, 3),
+        "linhas_por_min": round(lidas / decorrido * 60),
+    }
+    if memoria:
+        # passada separada: o tracemalloc deixa a leitura bem mais lenta
+        tracemalloc.start()
+        for _ in leitor(io.BytesIO(conteudo)):
+            pass
+        resultado["pico_memoria_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+    return resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=20_000)
+    parser.add_argument("--memoria", action="store_true")
+    args = parser.parse_args()
+
+    conteudo_csv, conteudo_excel = _gerar_arquivos(args.linhas)
+    print(
+        json.dumps(
+            {
+                "bytes_csv": len(conteudo_csv),
+                "bytes_excel": len(conteudo_excel),
+                "csv": _medir(linhas_csv, conteudo_csv, args.memoria),
+                "excel": _medir(linhas_excel, conteudo_excel, args.memoria),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark da página inicial contra um Firestore falso com latência.
+
+Mede p50/p95 de ``GET /`` com as consultas de professores e rascunhos em
+sequência (CONSULTAS_PARALELAS=1, comportamento anterior) e em paralelo.
+Cada RPC do fake dorme ``--latencia-ms`` (+ jitter), simulando a ida ao
+Firestore; o ETag não é enviado, então toda requisição consulta o banco.
+
+Uso: python -m benchmarks.bench_index [--latencia-ms 40] [--requisicoes 100]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["USE_FIREBASE"] = "1"
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bench-index-"))
+
+import app as aplicacao  # noqa: E402
+from benchmarks.firestore_fake import FirestoreFake, instalar  # noqa: E402
+from benchmarks.sinteticos import gerar_rascunhos, gerar_registros  # noqa: E402
+
+
+def _medir(cliente, requisicoes: int) -> dict[str, float]:
+    tempos = []
+    for _ in range(requisicoes):
+        inicio = time.perf_counter()
+        resposta = cliente.get("/")
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        assert resposta.status_code == 200, resposta.status_code
+    tempos.sort()
+    return {
+        "p50_ms": round(statistics.median(tempos), 1),
+        "p95_ms": round(tempos[int(len(tempos) * 0.95) - 1], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--professores", type=int, default=500)
+    parser.add_argument("--rascunhos", type=int, default=100)
+    parser.add_argument("--latencia-ms", type=float, default=40.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--requisicoes", type=int, default=100)
+    args = parser.parse_args()
+
+    fake = FirestoreFake(latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms, semente=34)
+    fake.carregar("professores", ((r["id"], r) for r in gerar_registros(args.professores)))
+    fake.carregar("rascunhos_professores", ((r["id"], r) for r in gerar_rascunhos(args.rascunhos)))
+    instalar(fake)
+
+    cliente = aplicacao.app.test_client()
+    cliente.get("/")  # aquece templates e o pool de threads
+
+    paralelas = aplicacao.CONSULTAS_PARALELAS
+    aplicacao.CONSULTAS_PARALELAS = 1
+    sequencial = _medir(cliente, args.requisicoes)
+    aplicacao.CONSULTAS_PARALELAS = max(paralelas, 2)
+    paralelo = _medir(cliente, args.requisicoes)
+
+    print(
+        json.dumps(
+            {
+                "professores": args.professores,
+                "rascunhos": args.rascunhos,
+                "latencia_ms": args.latencia_ms,
+                "jitter_ms": args.jitter_ms,
+                "sequencial": sequencial,
+                "paralelo": paralelo,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
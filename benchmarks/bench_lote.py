@@ -0,0 +1,87 @@
+"""Benchmark da edição e exclusão em lote contra um Firestore falso.
+
+Compara o caminho da tela de edição, repetido professor a professor
+(``get_professor`` + ``update_professor``, um batch por registro), com
+``update_professores_em_lote`` e ``delete_professores_em_lote`` (uma leitura
+``get_all`` e um WriteBatch por fatia de ids). Cada RPC custa
+``--latencia-ms``.
+
+Uso: python -m benchmarks.bench_lote [--registros 2000] [--individuais 100]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["USE_FIREBASE"] = "1"
+
+import db_layer  # noqa: E402
+from benchmarks.firestore_fake import FirestoreFake, instalar  # noqa: E402
+from benchmarks.sinteticos import gerar_registros  # noqa: E402
+from logs import configurar_logs  # noqa: E402
+
+
+def _preparar(args) -> tuple[FirestoreFake, list[int]]:
+    fake = FirestoreFake(latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms, semente=46)
+    instalar(fake)
+    registros = gerar_registros(args.registros)
+    fake.carregar("professores", ((r["id"], r) for r in registros))
+    fake.carregar("cpf_index", ((r["cpf"], {"professor_id": r["id"]}) for r in registros))
+    fake.carregar("_meta", [("cpf_index", {"completo": True})])
+    db_layer.reconstruir_estatisticas()
+    return fake, [int(r["id"]) for r in registros]
+
+
+def _medir(fake: FirestoreFake, quantidade: int, funcao) -> dict[str, object]:
+    rpcs = fake.rpcs
+    inicio = time.perf_counter()
+    funcao()
+    decorrido = time.perf_counter() - inicio
+    return {
+        "registros": quantidade,
+        "segundos": round(decorrido, 3),
+        "registros_por_s": round(quantidade / decorrido, 1),
+        "rpcs": fake.rpcs - rpcs,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registros", type=int, default=2000)
+    parser.add_argument("--individuais", type=int, default=100)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    configurar_logs("WARNING")
+
+    fake, ids = _preparar(args)
+    campos = {"escola": "Seduc", "situacao_servidor": "Aposentado"}
+
+    def individual() -> None:
+        for professor_id in ids[:args.individuais]:
+            anterior = db_layer.get_professor(professor_id)
+            db_layer.update_professor(professor_id, dict(campos), anterior)
+
+    resultado = {
+        "latencia_ms": args.latencia_ms,
+        "edicao_individual": _medir(fake, args.individuais, individual),
+        "edicao_em_lote": _medir(fake, len(ids), lambda: db_layer.update_professores_em_lote(ids, campos)),
+        "exclusao_em_lote": _medir(fake, len(ids), lambda: db_layer.delete_professores_em_lote(ids)),
+    }
+    estatisticas = db_layer.get_estatisticas()
+    resultado["consistente"] = (
+        estatisticas.get("total") == 0
+        and not fake._colecoes.get("professores")
+        and not fake._colecoes.get("cpf_index")
+    )
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Microbenchmark do pipeline de validação de importação.
+
+Compara a validação linha a linha como era feita em ``importar_excel``
+(regex compilada a cada chamada, CPF fatiado várias vezes) com
+``validacao.validar_lote``.
+
+Uso: python -m benchmarks.bench_validacao [--linhas 100000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.sinteticos import gerar_linhas  # noqa: E402
+from validacao import validar_lote  # noqa: E402
+
+
+def _legado_only_digits(value: str) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def _legado_cpf_valido(cpf: str) -> bool:
+    cpf = _legado_only_digits(cpf)
+    if len(cpf) != 11:
+        return False
+    if cpf == cpf[0] * 11:
+        return False
+    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
+    if (soma * 10 % 11) % 10 != int(cpf[9]):
+        return False
+    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
+    return (soma * 10 % 11) % 10 == int(cpf[10])
+
+
+def _legado_meses(dados: dict[str, str]) -> int | None:
+    try:
+        inicio = datetime.strptime(dados.get("data_inicio_fundef", ""), "%Y-%m-%d").date()
+        fim = datetime.strptime(dados.get("data_fim_fundef", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+    if inicio > fim:
+        return None
+    return (fim.year - inicio.year) * 12 + (fim.month - inicio.month) + 1
+
+
+def _legado_linha(payload: dict[str, str]):
+    faltam = [c for c in ["nome", "cpf", "escola", "cargo"] if not payload.get(c)]
+    if faltam:
+        return None, "faltam"
+    if not _legado_cpf_valido(payload["cpf"]):
+        return None, "cpf"
+    saida = dict(payload)
+    saida["cpf"] = _legado_only_digits(payload["cpf"])
+    saida["telefone"] = _legado_only_digits(payload.get("telefone", ""))
+    saida["quantidade_meses_trabalhados"] = _legado_meses(payload) or 1
+    return saida, None
+
+
+def _medir(funcao, linhas, repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(linhas)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.linhas)
+    legado = _medir(lambda ls: [_legado_linha(l) for l in ls], linhas, args.repeticoes)
+    atual = _medir(validar_lote, linhas, args.repeticoes)
+
+    resultado = {
+        "linhas": args.linhas,
+        "legado_s": round(legado, 4),
+        "validar_lote_s": round(atual, 4),
+        "linhas_por_s": round(args.linhas / atual),
+        "ganho": round(legado / atual, 2),
+    }
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
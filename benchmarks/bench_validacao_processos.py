@@ -0,0 +1,78 @@
+"""Benchmark da validação da importação em processos.
+
+Passa as mesmas linhas por ``importacao.preparar_em_processos`` em série e
+com pools de 2, 4... processos (até ``--processos``), medindo só o hash e a
+validação (``preparar_lote_importacao``), sem banco. O ganho fica abaixo do
+número de núcleos: cada linha ainda é serializada (pickle) na ida e na volta
+pelo processo principal. Num host com um núcleo só, o pool só acrescenta
+custo.
+
+Uso: python -m benchmarks.bench_validacao_processos [--linhas 100000] [--processos 4]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.sinteticos import gerar_linhas  # noqa: E402
+from importacao import em_lotes, preparar_em_processos  # noqa: E402
+from validacao import preparar_lote_importacao  # noqa: E402
+
+
+def _medir(linhas, lote: int, processos: int) -> dict[str, object]:
+    executor = None
+
+    def obter_executor():
+        nonlocal executor
+        if processos > 1:
+            executor = ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("spawn"))
+        return executor
+
+    inicio = time.perf_counter()
+    validadas = 0
+    try:
+        lotes = em_lotes(enumerate(linhas, start=2), lote)
+        for atual, preparados in preparar_em_processos(lotes, obter_executor, 0, 2 * processos):
+            if preparados is None:
+                preparados = preparar_lote_importacao([bruto for _, bruto in atual])
+            validadas += len(preparados)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    decorrido = time.perf_counter() - inicio
+    return {
+        "processos": processos,
+        "segundos": round(decorrido, 3),
+        "linhas_por_s": round(validadas / decorrido),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--processos", type=int, default=4)
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.linhas)
+    medidas = [_medir(linhas, args.lote, 1)]
+    processos = 2
+    while processos <= args.processos:
+        medidas.append(_medir(linhas, args.lote, processos))
+        processos *= 2
+    serial = medidas[0]["segundos"]
+    for medida in medidas:
+        medida["ganho"] = round(serial / medida["segundos"], 2)
+    print(json.dumps({"linhas": args.linhas, "nucleos": os.cpu_count(), "medidas": medidas}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
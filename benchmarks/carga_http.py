@@ -0,0 +1,107 @@
+"""Teste de carga HTTP: requisições por segundo e latência por rota.
+
+Abre ``--concorrencia`` conexões keep-alive contra um servidor já em
+execução e, durante ``--duracao`` segundos, cada uma faz GETs em sequência
+alternando entre as rotas informadas. Não envia ``If-None-Match``: toda
+resposta é gerada por completo.
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:app        # em outro terminal
+    python -m benchmarks.carga_http --url http://127.0.0.1:8000 --rotas / /rateio
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def _percentil(tempos: list[float], fracao: float) -> float:
+    if not tempos:
+        return 0.0
+    return tempos[max(int(len(tempos) * fracao) - 1, 0)]
+
+
+def executar_carga(
+    url: str, rotas: list[str], concorrencia: int, duracao: float
+) -> dict[str, object]:
+    """Dispara a carga e devolve o resumo (reutilizado por outros benchmarks)."""
+    destino = urlsplit(url)
+    prefixo = destino.path.rstrip("/")
+    fim = time.perf_counter() + duracao
+    tempos: dict[str, list[float]] = {rota: [] for rota in rotas}
+    erros: dict[str, int] = {rota: 0 for rota in rotas}
+    lock = threading.Lock()
+
+    def trabalhador(deslocamento: int) -> None:
+        conexao = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=30)
+        locais: dict[str, list[float]] = {rota: [] for rota in rotas}
+        falhas: dict[str, int] = {rota: 0 for rota in rotas}
+        indice = deslocamento
+        while time.perf_counter() < fim:
+            rota = rotas[indice % len(rotas)]
+            indice += 1
+            inicio = time.perf_counter()
+            try:
+                conexao.request("GET", prefixo + rota)
+                resposta = conexao.getresponse()
+                resposta.read()
+                if resposta.status >= 400:
+                    falhas[rota] += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                falhas[rota] += 1
+                conexao.close()
+                conexao = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=30)
+                continue
+            locais[rota].append((time.perf_counter() - inicio) * 1000)
+        conexao.close()
+        with lock:
+            for rota in rotas:
+                tempos[rota].extend(locais[rota])
+                erros[rota] += falhas[rota]
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    decorrido = time.perf_counter() - inicio
+
+    resumo: dict[str, object] = {
+        "url": url,
+        "concorrencia": concorrencia,
+        "duracao_s": round(decorrido, 1),
+        "req_s": round(sum(len(t) for t in tempos.values()) / decorrido, 1),
+        "rotas": {},
+    }
+    for rota, lista in tempos.items():
+        lista.sort()
+        resumo["rotas"][rota] = {
+            "requisicoes": len(lista),
+            "erros": erros[rota],
+            "req_s": round(len(lista) / decorrido, 1),
+            "p50_ms": round(statistics.median(lista), 1) if lista else 0.0,
+            "p95_ms": round(_percentil(lista, 0.95), 1),
+        }
+    return resumo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rotas", nargs="+", default=["/", "/rateio"])
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--duracao", type=float, default=20.0)
+    args = parser.parse_args()
+
+    print(json.dumps(executar_carga(args.url, args.rotas, args.concorrencia, args.duracao), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""Firestore falso, em memória, com latência injetada em cada RPC.
+
+Implementa apenas a parte da API usada por ``db_layer`` (coleções,
+documentos, consultas com where/order_by/offset/limit/select, agregações
+count/sum, WriteBatch, transações otimistas com ``transactional`` e
+``Increment``). Cada chamada que no SDK real seria uma ida ao servidor
+(``get``, ``stream``, ``set``, ``update``, ``delete``, ``commit``) dorme ``latencia_ms`` (mais um ``jitter_ms``
+aleatório) fora de qualquer lock, de modo que chamadas concorrentes se
+sobrepõem como no Firestore de verdade. Os argumentos ``timeout``/``retry``
+do SDK são aceitos e ignorados; ``taxa_falhas`` e ``fora_do_ar`` simulam
+indisponibilidade (``ServiceUnavailable``) e ``escritas_por_doc_s`` impõe o
+limite de escritas sustentadas por documento.
+
+Uso:
+    from benchmarks.firestore_fake import FirestoreFake, instalar
+    fake = FirestoreFake(latencia_ms=40)
+    instalar(fake)          # db_layer passa a usar o fake
+"""
+from __future__ import annotations
+
+import copy
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Iterable
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+
+class NotFound(Exception):
+    """Mesmo nome da exceção do google.api_core (``db_layer`` compara pelo nome)."""
+
+
+class AlreadyExists(Exception):
+    """``create`` de um documento que já existe."""
+
+
+class Aborted(Exception):
+    """Transação em conflito com outra escrita (o SDK repete a transação)."""
+
+
+class ServiceUnavailable(Exception):
+    """Falha transitória injetada (``taxa_falhas`` ou ``fora_do_ar``)."""
+
+
+class Increment:
+    def __init__(self, valor: int | float) -> None:
+        self.valor = valor
+
+
+def _aplicar_valor(atual: Any, novo: Any) -> Any:
+    if isinstance(novo, Increment):
+        return (atual if isinstance(atual, (int, float)) else 0) + novo.valor
+    return copy.deepcopy(novo)
+
+
+def _mesclar(destino: dict[str, Any], dados: dict[str, Any]) -> None:
+    for chave, valor in dados.items():
+        if isinstance(valor, dict) and isinstance(destino.get(chave), dict):
+            _mesclar(destino[chave], valor)
+        elif isinstance(valor, dict):
+            destino[chave] = {}
+            _mesclar(destino[chave], valor)
+        else:
+            destino[chave] = _aplicar_valor(destino.get(chave), valor)
+
+
+def _resolver_campo(dados: dict[str, Any], caminho: str) -> Any:
+    atual: Any = dados
+    for parte in caminho.split("."):
+        if not isinstance(atual, dict) or parte not in atual:
+            return None
+        atual = atual[parte]
+    return atual
+
+
+_OPERADORES = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+}
+
+
+class Snapshot:
+    def __init__(self, referencia: "DocumentoFake", dados: dict[str, Any] | None, versao: int = 0) -> None:
+        self.reference = referencia
+        self.id = referencia.id
+        self._dados = dados
+        self._versao = versao
+
+    @property
+    def exists(self) -> bool:
+        return self._dados is not None
+
+    def to_dict(self) -> dict[str, Any] | None:
+        return copy.deepcopy(self._dados) if self._dados is not None else None
+
+    def get(self, campo: str, padrao: Any = None) -> Any:
+        valor = _resolver_campo(self._dados or {}, campo)
+        return padrao if valor is None else valor
+
+
+class DocumentoFake:
+    def __init__(self, banco: "FirestoreFake", colecao: str, doc_id: str) -> None:
+        self._banco = banco
+        self._colecao = colecao
+        self.id = doc_id
+
+    def collection(self, nome: str) -> "ColecaoFake":
+        return ColecaoFake(self._banco, f"{self._colecao}/{self.id}/{nome}")
+
+    def get(self, transaction: Any = None, **opcoes: Any) -> Snapshot:
+        self._banco._esperar()
+        snapshot = self._banco._ler(self._colecao, self.id, self)
+        if transaction is not None:
+            transaction._registrar_leitura(self, snapshot._versao)
+        return snapshot
+
+    def set(self, dados: dict[str, Any], merge: bool = False, **opcoes: Any) -> None:
+        self._banco._esperar()
+        self._banco._aplicar([("set", self, dados, merge)])
+
+    def update(self, dados: dict[str, Any], **opcoes: Any) -> None:
+        self._banco._esperar()
+        self._banco._aplicar([("update", self, dados, False)])
+
+    def delete(self, **opcoes: Any) -> None:
+        self._banco._esperar()
+        self._banco._aplicar([("delete", self, None, False)])
+
+
+class ResultadoAgregacao(SimpleNamespace):
+    pass
+
+
+class AgregacaoFake:
+    def __init__(self, consulta: "ConsultaFake") -> None:
+        self._consulta = consulta
+        self._agregacoes: list[tuple[str, str | None, str]] = []
+
+    def count(self, alias: str | None = None) -> "AgregacaoFake":
+        self._agregacoes.append(("count", None, alias or "count"))
+        return self
+
+    def sum(self, campo: str, alias: str | None = None) -> "AgregacaoFake":
+        self._agregacoes.append(("sum", campo, alias or "sum"))
+        return self
+
+    def get(self, **opcoes: Any) -> list[list[ResultadoAgregacao]]:
+        self._consulta._banco._esperar()
+        linhas = [dados for _, dados in self._consulta._executar()]
+        resultados = []
+        for tipo, campo, alias in self._agregacoes:
+            if tipo == "count":
+                valor: Any = len(linhas)
+            else:
+                valor = sum(
+                    v for v in (_resolver_campo(d, campo) for d in linhas)
+                    if isinstance(v, (int, float)) and not isinstance(v, bool)
+                )
+            resultados.append(ResultadoAgregacao(alias=alias, value=valor))
+        return [resultados]
+
+
+class ConsultaFake:
+    def __init__(self, banco: "FirestoreFake", colecao: str) -> None:
+        self._banco = banco
+        self._colecao = colecao
+        self._filtros: list[tuple[str, str, Any]] = []
+        self._ordem: list[tuple[str, str]] = []
+        self._deslocamento = 0
+        self._limite: int | None = None
+        self._campos: list[str] | None = None
+
+    def _copiar(self, **mudancas: Any) -> "ConsultaFake":
+        nova = copy.copy(self)
+        nova._filtros = list(self._filtros)
+        nova._ordem = list(self._ordem)
+        for chave, valor in mudancas.items():
+            setattr(nova, chave, valor)
+        return nova
+
+    def where(self, campo: str, operador: str, valor: Any) -> "ConsultaFake":
+        return self._copiar(_filtros=self._filtros + [(campo, operador, valor)])
+
+    def order_by(self, campo: str, direction: str | None = None) -> "ConsultaFake":
+        return self._copiar(_ordem=self._ordem + [(campo, direction or ASCENDING)])
+
+    def offset(self, quantidade: int) -> "ConsultaFake":
+        return self._copiar(_deslocamento=quantidade)
+
+    def limit(self, quantidade: int) -> "ConsultaFake":
+        return self._copiar(_limite=quantidade)
+
+    def select(self, campos: Iterable[str]) -> "ConsultaFake":
+        return self._copiar(_campos=list(campos))
+
+    def count(self, alias: str | None = None) -> AgregacaoFake:
+        return AgregacaoFake(self).count(alias)
+
+    def sum(self, campo: str, alias: str | None = None) -> AgregacaoFake:
+        return AgregacaoFake(self).sum(campo, alias)
+
+    def _executar(self) -> list[tuple[str, dict[str, Any]]]:
+        with self._banco._lock:
+            documentos = [
+                (doc_id, copy.deepcopy(dados))
+                for doc_id, dados in self._banco._colecoes.get(self._colecao, {}).items()
+            ]
+        for campo, operador, valor in self._filtros:
+            documentos = [
+                (doc_id, dados) for doc_id, dados in documentos
+                if _OPERADORES[operador](_resolver_campo(dados, campo), valor)
+            ]
+        for campo, direcao in reversed(self._ordem):
+            # como no Firestore, documentos sem o campo de ordenação ficam de fora
+            documentos = [(i, d) for i, d in documentos if _resolver_campo(d, campo) is not None]
+            documentos.sort(key=lambda item: _resolver_campo(item[1], campo), reverse=direcao == DESCENDING)
+        documentos = documentos[self._deslocamento:]
+        if self._limite is not None:
+            documentos = documentos[: self._limite]
+        if self._campos is not None:
+            documentos = [
+                (doc_id, {c: dados[c] for c in self._campos if c in dados}) for doc_id, dados in documentos
+            ]
+        return documentos
+
+    def stream(self, transaction: Any = None, **opcoes: Any):
+        self._banco._esperar()
+        for doc_id, dados in self._executar():
+            yield Snapshot(DocumentoFake(self._banco, self._colecao, doc_id), dados)
+
+    def get(self, transaction: Any = None, **opcoes: Any) -> list[Snapshot]:
+        return list(self.stream())
+
+
+class ColecaoFake(ConsultaFake):
+    def document(self, doc_id: str | None = None) -> DocumentoFake:
+        if doc_id is None:
+            doc_id = "%020x" % random.getrandbits(80)
+        return DocumentoFake(self._banco, self._colecao, str(doc_id))
+
+
+class BatchFake:
+    def __init__(self, banco: "FirestoreFake") -> None:
+        self._banco = banco
+        self._operacoes: list[tuple[str, DocumentoFake, Any, bool]] = []
+
+    def create(self, referencia: DocumentoFake, dados: dict[str, Any]) -> None:
+        self._operacoes.append(("create", referencia, dados, False))
+
+    def set(self, referencia: DocumentoFake, dados: dict[str, Any], merge: bool = False) -> None:
+        self._operacoes.append(("set", referencia, dados, merge))
+
+    def update(self, referencia: DocumentoFake, dados: dict[str, Any]) -> None:
+        self._operacoes.append(("update", referencia, dados, False))
+
+    def delete(self, referencia: DocumentoFake) -> None:
+        self._operacoes.append(("delete", referencia, None, False))
+
+    def commit(self, **opcoes: Any) -> None:
+        self._banco._esperar()
+        self._banco._aplicar(self._operacoes)
+        self._operacoes = []
+
+
+class TransacaoFake(BatchFake):
+    """Transação otimista: o ``commit`` falha com ``Aborted`` se algum
+    documento lido foi alterado por outra escrita desde a leitura."""
+
+    def __init__(self, banco: "FirestoreFake", max_attempts: int = 5) -> None:
+        super().__init__(banco)
+        self.max_attempts = max_attempts
+        self._leituras: dict[tuple[str, str], int] = {}
+
+    def _registrar_leitura(self, referencia: DocumentoFake, versao: int) -> None:
+        self._leituras.setdefault((referencia._colecao, referencia.id), versao)
+
+    def _recomecar(self) -> None:
+        self._operacoes = []
+        self._leituras = {}
+
+    def commit(self, **opcoes: Any) -> None:
+        self._banco._esperar()
+        self._banco._aplicar(self._operacoes, self._leituras)
+        self._recomecar()
+
+
+def transactional(funcao):
+    """Como ``google.cloud.firestore.transactional``: repete em conflito."""
+
+    def executar(transacao: TransacaoFake, *args: Any, **kwargs: Any) -> Any:
+        espera_max = 1.0
+        for tentativa in range(transacao.max_attempts):
+            if tentativa:
+                # mesmo backoff do SDK: aleatório até 1 s, dobrando até 30 s
+                time.sleep(random.uniform(0, espera_max))
+                espera_max = min(espera_max * 2, 30.0)
+            transacao._recomecar()
+            resultado = funcao(transacao, *args, **kwargs)
+            try:
+                transacao.commit()
+            except Aborted:
+                with transacao._banco._lock:
+                    transacao._banco.conflitos += 1
+                continue
+            return resultado
+        raise ValueError(f"Failed to commit transaction in {transacao.max_attempts} attempts.")
+
+    return executar
+
+
+class FirestoreFake:
+    def __init__(self, latencia_ms: float = 0.0, jitter_ms: float = 0.0, semente: int | None = None) -> None:
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.rpcs = 0
+        self.conflitos = 0
+        # escritas sustentadas por documento (0 = sem limite); acima disso as
+        # escritas no mesmo documento entram em fila, como no Firestore
+        self.escritas_por_doc_s = 0.0
+        self._proxima_escrita: dict[tuple[str, str], float] = {}
+        self._versoes: dict[tuple[str, str], int] = {}
+        self._pendentes: dict[tuple[str, str], int] = {}
+        # injeção de falhas: fração aleatória de RPCs, ou todas
+        self.taxa_falhas = 0.0
+        self.fora_do_ar = False
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+        self._colecoes: dict[str, dict[str, dict[str, Any]]] = {}
+
+    def _esperar(self) -> None:
+        with self._lock:
+            self.rpcs += 1
+            atraso = self.latencia_ms + (self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+            falhar = self.fora_do_ar or (self.taxa_falhas > 0 and self._rng.random() < self.taxa_falhas)
+        if falhar:
+            raise ServiceUnavailable("503 falha injetada")
+        if atraso > 0:
+            time.sleep(atraso / 1000)
+
+    def _ler(self, colecao: str, doc_id: str, referencia: DocumentoFake) -> Snapshot:
+        with self._lock:
+            dados = self._colecoes.get(colecao, {}).get(doc_id)
+            versao = self._versoes.get((colecao, doc_id), 0)
+            return Snapshot(referencia, copy.deepcopy(dados) if dados is not None else None, versao)
+
+    def _reservar_escritas(self, operacoes: list[tuple[str, DocumentoFake, Any, bool]]) -> None:
+        if not self.escritas_por_doc_s or not operacoes:
+            return
+        intervalo = 1 / self.escritas_por_doc_s
+        with self._lock:
+            agora = time.monotonic()
+            espera = 0.0
+            for _, ref, _, _ in operacoes:
+                chave = (ref._colecao, ref.id)
+                vez = max(agora, self._proxima_escrita.get(chave, 0.0))
+                self._proxima_escrita[chave] = vez + intervalo
+                espera = max(espera, vez - agora)
+        if espera > 0:
+            time.sleep(espera)
+
+    def _verificar_leituras(self, leituras: dict[tuple[str, str], int] | None, pendentes: bool = False) -> None:
+        for chave, versao in (leituras or {}).items():
+            if self._versoes.get(chave, 0) != versao or (pendentes and self._pendentes.get(chave)):
+                raise Aborted(f"Transaction conflict on {chave[0]}/{chave[1]}")
+
+    def _aplicar(
+        self,
+        operacoes: list[tuple[str, DocumentoFake, Any, bool]],
+        leituras: dict[tuple[str, str], int] | None = None,
+    ) -> None:
+        chaves = {(ref._colecao, ref.id) for _, ref, _, _ in operacoes}
+        with self._lock:
+            # uma escrita ainda na fila vai mudar o documento lido: aborta já
+            self._verificar_leituras(leituras, pendentes=True)
+            for chave in chaves:
+                self._pendentes[chave] = self._pendentes.get(chave, 0) + 1
+        try:
+            self._reservar_escritas(operacoes)
+        finally:
+            with self._lock:
+                for chave in chaves:
+                    self._pendentes[chave] -= 1
+        with self._lock:
+            self._verificar_leituras(leituras)
+            for tipo, ref, _, _ in operacoes:
+                if tipo == "update" and ref.id not in self._colecoes.get(ref._colecao, {}):
+                    raise NotFound(f"No document to update: {ref._colecao}/{ref.id}")
+                if tipo == "create" and ref.id in self._colecoes.get(ref._colecao, {}):
+                    raise AlreadyExists(f"Document already exists: {ref._colecao}/{ref.id}")
+            for tipo, ref, dados, merge in operacoes:
+                self._versoes[(ref._colecao, ref.id)] = self._versoes.get((ref._colecao, ref.id), 0) + 1
+                documentos = self._colecoes.setdefault(ref._colecao, {})
+                if tipo == "delete":
+                    documentos.pop(ref.id, None)
+                elif tipo in ("set", "create") and not merge:
+                    documentos[ref.id] = {}
+                    _mesclar(documentos[ref.id], dados)
+                elif tipo == "set":
+                    _mesclar(documentos.setdefault(ref.id, {}), dados)
+                else:
+                    atual = documentos[ref.id]
+                    for caminho, valor in dados.items():
+                        *pais, folha = caminho.split(".")
+                        destino = atual
+                        for parte in pais:
+                            if not isinstance(destino.get(parte), dict):
+                                destino[parte] = {}
+                            destino = destino[parte]
+                        destino[folha] = _aplicar_valor(destino.get(folha), valor)
+
+    def collection(self, nome: str) -> ColecaoFake:
+        return ColecaoFake(self, nome)
+
+    def get_all(self, referencias: Iterable[DocumentoFake], transaction: Any = None, **opcoes: Any):
+        """Vários documentos numa única chamada; ausentes vêm com ``exists`` falso."""
+        self._esperar()
+        for referencia in referencias:
+            snapshot = self._ler(referencia._colecao, referencia.id, referencia)
+            if transaction is not None:
+                transaction._registrar_leitura(referencia, snapshot._versao)
+            yield snapshot
+
+    def batch(self) -> BatchFake:
+        return BatchFake(self)
+
+    def transaction(self, max_attempts: int = 5) -> TransacaoFake:
+        return TransacaoFake(self, max_attempts)
+
+    def carregar(self, colecao: str, documentos: Iterable[tuple[str, dict[str, Any]]]) -> None:
+        """Popula uma coleção sem latência (preparação do benchmark)."""
+        with self._lock:
+            destino = self._colecoes.setdefault(colecao, {})
+            for doc_id, dados in documentos:
+                destino[str(doc_id)] = copy.deepcopy(dados)
+
+
+# substitui o módulo ``firebase_admin.firestore`` nas referências de db_layer
+modulo_firestore = SimpleNamespace(
+    Query=SimpleNamespace(ASCENDING=ASCENDING, DESCENDING=DESCENDING),
+    Increment=Increment,
+    transactional=transactional,
+)
+
+
+def instalar(fake: FirestoreFake) -> None:
+    """Faz ``db_layer`` usar ``fake`` como cliente Firestore já inicializado."""
+    import db_layer
+
+    db_layer._db_instance = fake
+    db_layer._fs = modulo_firestore
+    db_layer._firebase_ready = True
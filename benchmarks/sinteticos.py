@@ -0,0 +1,96 @@
+"""Geração de dados sintéticos (CPFs válidos, professores e rascunhos)."""
+from __future__ import annotations
+
+import random
+from datetime import date, timedelta
+
+NOMES = ("Ana", "José", "Maria", "João", "Antônio", "Francisca", "Luís", "Conceição", "Cícero")
+SOBRENOMES = ("Silva", "Souza", "Oliveira", "Araújo", "Gonçalves", "Ferreira", "Lima", "Sá")
+CARGOS = ("Professor(a)", "Coordenador(a)", "Diretor(a)", "Auxiliar de classe")
+SITUACOES = ("ativo", "Aposentado", "Falecido", "sem vinculo")
+
+
+def gerar_cpf(rng: random.Random) -> str:
+    digitos = [rng.randrange(10) for _ in range(9)]
+    if len(set(digitos)) == 1:
+        digitos[0] = (digitos[0] + 1) % 10
+    for pesos in (range(10, 1, -1), range(11, 1, -1)):
+        soma = sum(d * p for d, p in zip(digitos, pesos))
+        digitos.append((soma * 10 % 11) % 10)
+    return "".join(map(str, digitos))
+
+
+def gerar_professor(rng: random.Random, indice: int) -> dict[str, str]:
+    inicio = date(1997, 1, 1) + timedelta(days=rng.randrange(0, 3000))
+    fim = inicio + timedelta(days=rng.randrange(30, 3600))
+    fim = min(fim, date(2006, 12, 31))
+    cpf = gerar_cpf(rng)
+    return {
+        "nome": f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)} {indice}",
+        "cpf": f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}" if indice % 2 else cpf,
+        "rg": str(rng.randrange(1_000_000, 9_999_999)),
+        "matricula": str(100_000 + indice),
+        "escola": rng.choice(("escola", "Escola", "seduc")),
+        "cargo": rng.choice(CARGOS),
+        "situacao_servidor": rng.choice(SITUACOES),
+        "data_admissao": "1990-03-01",
+        "telefone": f"(87) 9{rng.randrange(1000, 9999)}-{rng.randrange(1000, 9999)}",
+        "email": f"prof{indice}@exemplo.com",
+        "endereco": f"Rua {rng.choice(SOBRENOMES)}, {rng.randrange(1, 999)}",
+        "banco": "001",
+        "agencia": str(rng.randrange(1000, 9999)),
+        "conta": str(rng.randrange(10000, 99999)),
+        "tipo_conta": "corrente",
+        "data_inicio_fundef": inicio.isoformat(),
+        "data_fim_fundef": fim.isoformat(),
+        "carga_horaria": "20",
+        "aceitou_declaracao": "on",
+    }
+
+
+def gerar_linhas(quantidade: int, semente: int = 1997, proporcao_invalidos: float = 0.05) -> list[dict[str, str]]:
+    """Linhas no formato de importação; uma fração recebe CPF inválido."""
+    rng = random.Random(semente)
+    linhas = []
+    for indice in range(quantidade):
+        linha = gerar_professor(rng, indice)
+        if rng.random() < proporcao_invalidos:
+            linha["cpf"] = linha["cpf"][:-1] + str((int(linha["cpf"][-1]) + 1) % 10)
+        linhas.append(linha)
+    return linhas
+
+
+def gerar_registros(quantidade: int, semente: int = 1997) -> list[dict[str, object]]:
+    """Professores como ficam gravados no banco (normalizados, com id e meses)."""
+    from validacao import normalizar_dados_formulario, tentar_calcular_meses_validos
+
+    rng = random.Random(semente)
+    registros = []
+    for indice in range(quantidade):
+        registro: dict[str, object] = normalizar_dados_formulario(gerar_professor(rng, indice))
+        registro["id"] = indice + 1
+        registro["quantidade_meses_trabalhados"] = tentar_calcular_meses_validos(registro) or 1
+        registro["aceitou_declaracao"] = 1
+        registro["criado_em"] = "2024-01-01 00:00:00"
+        registros.append(registro)
+    return registros
+
+
+def gerar_rascunhos(quantidade: int, semente: int = 2006) -> list[dict[str, object]]:
+    """Rascunhos no formato do Firestore (metadados + ``dados`` aninhados)."""
+    rng = random.Random(semente)
+    rascunhos = []
+    for indice in range(quantidade):
+        dados = gerar_professor(rng, indice)
+        carimbo = f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d} 12:00:00"
+        rascunhos.append(
+            {
+                "id": indice + 1,
+                "nome_referencia": dados["nome"],
+                "cpf": dados["cpf"],
+                "dados": dados,
+                "criado_em": carimbo,
+                "atualizado_em": carimbo,
+            }
+        )
+    return rascunhos
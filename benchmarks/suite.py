@@ -0,0 +1,277 @@
+"""Suíte de benchmarks das rotas principais, com resultados em JSON.
+
+Popula um banco novo (SQLite em diretório temporário ou o Firestore falso
+de ``firestore_fake``) com professores e rascunhos sintéticos de CPF válido
+e mede, pelo test client do Flask:
+
+- ``GET /`` (index), ``POST /cadastro``, ``GET``/``POST /editar/<id>``;
+- ``POST /rateio``;
+- ``/exportar-csv`` e ``/exportar-excel`` a frio (arquivo regerado a cada vez);
+- ``POST /importar-excel`` com uma planilha de CPFs novos.
+
+Em seguida sobe um servidor HTTP local com threads e roda a carga
+concorrente de ``carga_http`` nas rotas de leitura. O JSON gravado (por
+padrão em ``benchmarks/resultados/<commit>-<backend>.json``) pode ser
+comparado com o de outro commit via ``--comparar``.
+
+Uso:
+    python -m benchmarks.suite [--backend sqlite|firestore] [--professores 2000]
+    python -m benchmarks.suite --comparar benchmarks/resultados/abc1234-sqlite.json
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from benchmarks.sinteticos import gerar_professor, gerar_rascunhos, gerar_registros  # noqa: E402
+
+ROTAS_HTTP = ["/", "/rateio", "/painel", "/api/busca?q=maria"]
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def _resumir(tempos: list[float]) -> dict[str, float]:
+    tempos = sorted(tempos)
+    return {
+        "n": len(tempos),
+        "media_ms": round(statistics.fmean(tempos), 2),
+        "p50_ms": round(statistics.median(tempos), 2),
+        "p95_ms": round(tempos[max(int(len(tempos) * 0.95) - 1, 0)], 2),
+    }
+
+
+def _popular_sqlite(aplicacao, registros, rascunhos) -> None:
+    with aplicacao.get_connection() as conn:
+        colunas = aplicacao._colunas_professor(conn, registros[0]) + ["id"]
+        conn.executemany(
+            f"INSERT OR IGNORE INTO professores ({', '.join(colunas)}) "
+            f"VALUES ({', '.join('?' for _ in colunas)})",
+            [[registro.get(coluna) for coluna in colunas] for registro in registros],
+        )
+        conn.executemany(
+            "INSERT INTO rascunhos_professores (id, nome_referencia, cpf, dados_json, criado_em, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (r["id"], r["nome_referencia"], r["cpf"], json.dumps(r["dados"], ensure_ascii=False),
+                 r["criado_em"], r["atualizado_em"])
+                for r in rascunhos
+            ],
+        )
+
+
+def _popular_firestore(fake, registros, rascunhos) -> None:
+    import db_layer
+
+    fake.carregar("professores", ((r["id"], r) for r in registros))
+    fake.carregar("rascunhos_professores", ((r["id"], r) for r in rascunhos))
+    fake.carregar("cpf_index", ((r["cpf"], {"professor_id": r["id"]}) for r in registros))
+    fake.carregar("_meta", [
+        ("counters", {"last_professor_id": len(registros), "last_rascunho_id": len(rascunhos)}),
+        ("cpf_index", {"completo": True}),
+    ])
+    db_layer.reconstruir_estatisticas()
+
+
+def _planilha_importacao(rng: random.Random, inicio: int, quantidade: int) -> bytes:
+    from openpyxl import Workbook
+
+    linhas = [gerar_professor(rng, inicio + i) for i in range(quantidade)]
+    workbook = Workbook()
+    sheet = workbook.active
+    cabecalhos = list(linhas[0].keys())
+    sheet.append(cabecalhos)
+    for linha in linhas:
+        sheet.append([linha[c] for c in cabecalhos])
+    saida = io.BytesIO()
+    workbook.save(saida)
+    return saida.getvalue()
+
+
+def _medir_rotas(aplicacao, args, total_professores: int) -> dict[str, dict[str, float]]:
+    cliente = aplicacao.app.test_client()
+    rng = random.Random(36)
+    proximo_indice = total_professores + 1_000_000
+    tempos: dict[str, list[float]] = {}
+
+    def medir(nome: str, fazer, preparar=None, esperado: int = 200) -> None:
+        for _ in range(args.repeticoes):
+            contexto = preparar() if preparar else None
+            inicio = time.perf_counter()
+            resposta = fazer(contexto)
+            tempos.setdefault(nome, []).append((time.perf_counter() - inicio) * 1000)
+            if resposta.status_code != esperado:
+                raise RuntimeError(f"{nome}: status {resposta.status_code} (esperado {esperado})")
+
+    cliente.get("/")  # aquece templates, conexões e o índice de busca
+
+    medir("index", lambda _: cliente.get("/"))
+
+    def novo_professor():
+        nonlocal proximo_indice
+        proximo_indice += 1
+        return gerar_professor(rng, proximo_indice)
+
+    # cadastros e edições válidos redirecionam; 200 significaria erro de validação
+    medir("cadastro_post", lambda dados: cliente.post("/cadastro", data=dados), novo_professor, 302)
+
+    ids = [int(p["id"]) for p in aplicacao.listar_professores()[: args.repeticoes]]
+    alvos = iter(ids * 2)
+    medir("editar_get", lambda _: cliente.get(f"/editar/{next(alvos)}"))
+
+    def dados_edicao():
+        professor_id = next(alvos)
+        # só os campos do formulário: id, criado_em etc. iriam para o documento como texto
+        professor = aplicacao.buscar_professor(professor_id)
+        dados = {campo: str(professor.get(campo) or "") for campo in aplicacao.FORM_FIELDS}
+        dados["endereco"] = f"Rua Editada, {rng.randrange(1, 999)}"
+        dados["aceitou_declaracao"] = "on"
+        return professor_id, dados
+
+    medir("editar_post", lambda ctx: cliente.post(f"/editar/{ctx[0]}", data=ctx[1]), dados_edicao, 302)
+    medir("rateio_post", lambda _: cliente.post("/rateio", data={"valor_total": "1500000,00"}))
+
+    for rota, nome in (("/exportar-csv", "exportar_csv"), ("/exportar-excel", "exportar_excel")):
+        # a frio: cada iteração encontra o registro alterado e regera o arquivo
+        medir(nome, lambda _, rota=rota: cliente.get(rota), lambda: aplicacao.marcar_registro_alterado())
+
+    def planilha():
+        nonlocal proximo_indice
+        conteudo = _planilha_importacao(rng, proximo_indice, args.linhas_importacao)
+        proximo_indice += args.linhas_importacao
+        return conteudo
+
+    medir(
+        "importar_excel",
+        lambda conteudo: cliente.post(
+            "/importar-excel",
+            data={"file": (io.BytesIO(conteudo), "importacao.xlsx")},
+            content_type="multipart/form-data",
+        ),
+        planilha,
+        302,
+    )
+    return {nome: _resumir(lista) for nome, lista in tempos.items()}
+
+
+def _medir_http(aplicacao, args) -> dict[str, object]:
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    from benchmarks.carga_http import executar_carga
+
+    class SemLog(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs) -> None:
+            pass
+
+    servidor = make_server("127.0.0.1", 0, aplicacao.app, threaded=True, request_handler=SemLog)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    try:
+        return executar_carga(
+            f"http://127.0.0.1:{servidor.server_port}", ROTAS_HTTP, args.concorrencia, args.duracao_http
+        )
+    finally:
+        servidor.shutdown()
+
+
+def _comparar(atual: dict, anterior: dict) -> dict[str, dict[str, float]]:
+    comparacao = {}
+    for nome, metricas in atual["rotas"].items():
+        base = anterior.get("rotas", {}).get(nome)
+        if base and base.get("p50_ms"):
+            comparacao[nome] = {
+                "p50_antes_ms": base["p50_ms"],
+                "p50_agora_ms": metricas["p50_ms"],
+                "razao": round(metricas["p50_ms"] / base["p50_ms"], 3),
+            }
+    if atual.get("http") and anterior.get("http", {}).get("req_s"):
+        comparacao["http_req_s"] = {
+            "antes": anterior["http"]["req_s"],
+            "agora": atual["http"]["req_s"],
+            "razao": round(atual["http"]["req_s"] / anterior["http"]["req_s"], 3),
+        }
+    return comparacao
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("sqlite", "firestore"), default="sqlite")
+    parser.add_argument("--professores", type=int, default=2000)
+    parser.add_argument("--rascunhos", type=int, default=200)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--linhas-importacao", type=int, default=100)
+    parser.add_argument("--latencia-ms", type=float, default=20.0, help="só no backend firestore")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--duracao-http", type=float, default=10.0, help="0 pula a carga HTTP")
+    parser.add_argument("--saida", type=Path, default=None)
+    parser.add_argument("--comparar", type=Path, default=None, help="JSON de outra execução")
+    args = parser.parse_args()
+
+    # o backend é decidido na importação de db_layer/app
+    os.environ["USE_FIREBASE"] = "1" if args.backend == "firestore" else "0"
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-suite-")
+    import app as aplicacao
+
+    registros = gerar_registros(args.professores)
+    rascunhos = gerar_rascunhos(args.rascunhos)
+    if args.backend == "firestore":
+        from benchmarks.firestore_fake import FirestoreFake, instalar
+
+        fake = FirestoreFake(semente=36)
+        instalar(fake)
+        _popular_firestore(fake, registros, rascunhos)
+        fake.latencia_ms = args.latencia_ms
+    else:
+        _popular_sqlite(aplicacao, registros, rascunhos)
+    aplicacao.marcar_registro_alterado()
+    aplicacao.marcar_registro_alterado("rascunhos")
+
+    resultado = {
+        "meta": {
+            "commit": _commit_atual(),
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "professores": args.professores,
+            "rascunhos": args.rascunhos,
+            "repeticoes": args.repeticoes,
+            "linhas_importacao": args.linhas_importacao,
+            "latencia_ms": args.latencia_ms if args.backend == "firestore" else 0,
+        },
+        "rotas": _medir_rotas(aplicacao, args, args.professores),
+        "http": _medir_http(aplicacao, args) if args.duracao_http > 0 else None,
+    }
+    if args.comparar:
+        resultado["comparacao"] = _comparar(resultado, json.loads(args.comparar.read_text(encoding="utf-8")))
+
+    saida = args.saida or RAIZ / "benchmarks" / "resultados" / f"{resultado['meta']['commit']}-{args.backend}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    print(f"Resultados gravados em {saida}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Índice invertido em memória para a busca no registro de professores.
+
+Os termos do nome são normalizados (minúsculas, sem acentos) e guardados num
+vocabulário ordenado; a busca por prefixo é um intervalo ``bisect`` nesse
+vocabulário. CPF e matrícula ficam em listas ordenadas de ``(valor, id)``,
+também consultadas por prefixo. Escola e situação do servidor são filtros
+exatos. O índice é montado a partir do registro completo e atualizado a cada
+escrita feita pela aplicação.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Iterable
+
+CAMPOS_RESULTADO = ("id", "nome", "cpf", "matricula", "escola", "cargo", "situacao_servidor")
+
+_RE_TERMOS = re.compile(r"[0-9a-z]+")
+_RE_MASCARA_NUMERICA = re.compile(r"[0-9][0-9.\-/]*")
+# acima disso, percorrer a lista ordenada de ids sai mais barato que ordenar o resultado
+_LIMITE_ORDENACAO = 2000
+
+
+def dobrar_acentos(texto: str) -> str:
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def termos_nome(texto: str) -> list[str]:
+    return _RE_TERMOS.findall(dobrar_acentos(texto))
+
+
+def _intervalo_prefixo(ordenados: list, prefixo: str) -> tuple[int, int]:
+    inicio = bisect_left(ordenados, (prefixo,))
+    fim = bisect_left(ordenados, (prefixo + "\uffff",))
+    return inicio, fim
+
+
+class IndiceBusca:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.versao: str | None = None
+        self._registros: dict[int, dict[str, Any]] = {}
+        self._ids_ordenados: list[int] = []
+        self._vocabulario: list[tuple[str]] = []
+        self._postagens: dict[str, set[int]] = {}
+        self._cpfs: list[tuple[str, int]] = []
+        self._matriculas: list[tuple[str, int]] = []
+        self._por_escola: dict[str, set[int]] = {}
+        self._por_situacao: dict[str, set[int]] = {}
+
+    @property
+    def construido(self) -> bool:
+        return self.versao is not None
+
+    def reconstruir(self, registros: Iterable[dict[str, Any]], versao: str) -> None:
+        novo = IndiceBusca()
+        vocabulario: set[str] = set()
+        cpfs: list[tuple[str, int]] = []
+        matriculas: list[tuple[str, int]] = []
+        for registro in registros:
+            compacto = novo._compactar(registro)
+            if compacto is None:
+                continue
+            professor_id = compacto["id"]
+            novo._registros[professor_id] = compacto
+            for termo in compacto["_termos"]:
+                vocabulario.add(termo)
+                novo._postagens.setdefault(termo, set()).add(professor_id)
+            if compacto["cpf"]:
+                cpfs.append((compacto["cpf"], professor_id))
+            if compacto["_matricula"]:
+                matriculas.append((compacto["_matricula"], professor_id))
+            novo._por_escola.setdefault(compacto["escola"], set()).add(professor_id)
+            novo._por_situacao.setdefault(compacto["situacao_servidor"], set()).add(professor_id)
+        novo._vocabulario = sorted((termo,) for termo in vocabulario)
+        novo._cpfs = sorted(cpfs)
+        novo._matriculas = sorted(matriculas)
+        novo._ids_ordenados = sorted(novo._registros, reverse=True)
+
+        with self._lock:
+            self.__dict__.update({k: v for k, v in novo.__dict__.items() if k != "_lock"})
+            self.versao = versao
+
+    @staticmethod
+    def _compactar(registro: dict[str, Any]) -> dict[str, Any] | None:
+        try:
+            professor_id = int(registro.get("id"))
+        except (TypeError, ValueError):
+            return None
+        compacto = {campo: str(registro.get(campo) or "") for campo in CAMPOS_RESULTADO}
+        compacto["id"] = professor_id
+        compacto["cpf"] = re.sub(r"[^0-9]", "", compacto["cpf"])
+        compacto["_matricula"] = dobrar_acentos(compacto["matricula"]).strip()
+        compacto["_termos"] = tuple(dict.fromkeys(termos_nome(compacto["nome"])))
+        return compacto
+
+    def adicionar(self, registro: dict[str, Any], versao: str, versao_anterior: str) -> None:
+        """Insere ou substitui um registro (``registro`` deve ter ``id``).
+
+        Só é aplicado se o índice estiver exatamente em ``versao_anterior``;
+        caso contrário houve outra escrita no meio e o índice fica
+        desatualizado até a próxima reconstrução.
+        """
+        with self._lock:
+            if self.versao != versao_anterior:
+                return
+            compacto = self._compactar(registro)
+            if compacto is None:
+                return
+            self._adicionar_sem_lock(compacto)
+            self.versao = versao
+
+    def aplicar_lote(
+        self,
+        alterados: dict[int, dict[str, Any]],
+        removidos: Iterable[int],
+        versao: str,
+        versao_anterior: str,
+    ) -> None:
+        """Edição/exclusão em lote numa única versão.
+
+        ``alterados`` mapeia id -> campos que mudaram; o restante do registro
+        vem do próprio índice. Mesma regra de versão de ``adicionar``.
+        """
+        with self._lock:
+            if self.versao != versao_anterior:
+                return
+            for professor_id in removidos:
+                self._remover_sem_lock(int(professor_id))
+            for professor_id, campos in alterados.items():
+                atual = self._registros.get(int(professor_id))
+                if atual is None:
+                    continue
+                compacto = self._compactar({**atual, **campos})
+                if compacto is not None:
+                    self._adicionar_sem_lock(compacto)
+            self.versao = versao
+
+    def _adicionar_sem_lock(self, compacto: dict[str, Any]) -> None:
+        professor_id = compacto["id"]
+        self._remover_sem_lock(professor_id)
+        self._registros[professor_id] = compacto
+        for termo in compacto["_termos"]:
+            postagem = self._postagens.get(termo)
+            if postagem is None:
+                postagem = self._postagens[termo] = set()
+                insort(self._vocabulario, (termo,))
+            postagem.add(professor_id)
+        if compacto["cpf"]:
+            insort(self._cpfs, (compacto["cpf"], professor_id))
+        if compacto["_matricula"]:
+            insort(self._matriculas, (compacto["_matricula"], professor_id))
+        self._por_escola.setdefault(compacto["escola"], set()).add(professor_id)
+        self._por_situacao.setdefault(compacto["situacao_servidor"], set()).add(professor_id)
+        posicao = bisect_left(self._ids_ordenados, -professor_id, key=lambda i: -i)
+        self._ids_ordenados.insert(posicao, professor_id)
+
+    def remover(self, professor_id: int, versao: str, versao_anterior: str) -> None:
+        with self._lock:
+            if self.versao != versao_anterior:
+                return
+            self._remover_sem_lock(int(professor_id))
+            self.versao = versao
+
+    def _remover_sem_lock(self, professor_id: int) -> None:
+        compacto = self._registros.pop(professor_id, None)
+        if compacto is None:
+            return
+        for termo in compacto["_termos"]:
+            postagem = self._postagens.get(termo)
+            if postagem is not None:
+                postagem.discard(professor_id)
+                if not postagem:
+                    del self._postagens[termo]
+                    posicao = bisect_left(self._vocabulario, (termo,))
+                    del self._vocabulario[posicao]
+        for lista, valor in ((self._cpfs, compacto["cpf"]), (self._matriculas, compacto["_matricula"])):
+            if valor:
+                posicao = bisect_left(lista, (valor, professor_id))
+                if posicao < len(lista) and lista[posicao] == (valor, professor_id):
+                    del lista[posicao]
+        self._por_escola.get(compacto["escola"], set()).discard(professor_id)
+        self._por_situacao.get(compacto["situacao_servidor"], set()).discard(professor_id)
+        posicao = bisect_left(self._ids_ordenados, -professor_id, key=lambda i: -i)
+        if posicao < len(self._ids_ordenados) and self._ids_ordenados[posicao] == professor_id:
+            del self._ids_ordenados[posicao]
+
+    def _ids_por_termo(self, termo: str) -> set[int]:
+        ids: set[int] = set()
+        if _RE_MASCARA_NUMERICA.fullmatch(termo):
+            digitos = re.sub(r"[^0-9]", "", termo)
+            inicio, fim = _intervalo_prefixo(self._cpfs, digitos)
+            ids.update(i for _, i in self._cpfs[inicio:fim])
+            inicio, fim = _intervalo_prefixo(self._matriculas, termo)
+            ids.update(i for _, i in self._matriculas[inicio:fim])
+            return ids
+        for parte in termos_nome(termo):
+            inicio, fim = _intervalo_prefixo(self._vocabulario, parte)
+            encontrados: set[int] = set()
+            for (palavra,) in self._vocabulario[inicio:fim]:
+                encontrados |= self._postagens[palavra]
+            ids = encontrados if not ids else ids & encontrados
+            if not ids:
+                break
+        inicio, fim = _intervalo_prefixo(self._matriculas, termo)
+        ids.update(i for _, i in self._matriculas[inicio:fim])
+        return ids
+
+    def buscar(
+        self,
+        consulta: str = "",
+        escola: str = "",
+        situacao_servidor: str = "",
+        pagina: int = 1,
+        por_pagina: int = 20,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """Retorna (total de resultados, registros da página), mais recentes primeiro.
+
+        Cada termo da consulta precisa casar (E lógico): termos numéricos
+        casam por prefixo de CPF ou matrícula; os demais, por prefixo de
+        qualquer palavra do nome.
+        """
+        with self._lock:
+            candidatos = self._candidatos(consulta, escola, situacao_servidor)
+            if candidatos is not None and not candidatos:
+                return 0, []
+
+            inicio = (max(1, pagina) - 1) * por_pagina
+            if candidatos is None:
+                total = len(self._ids_ordenados)
+                pagina_ids = self._ids_ordenados[inicio:inicio + por_pagina]
+            elif len(candidatos) <= _LIMITE_ORDENACAO:
+                total = len(candidatos)
+                pagina_ids = sorted(candidatos, reverse=True)[inicio:inicio + por_pagina]
+            else:
+                total = len(candidatos)
+                pagina_ids = []
+                vistos = 0
+                for professor_id in self._ids_ordenados:
+                    if professor_id in candidatos:
+                        if vistos >= inicio:
+                            pagina_ids.append(professor_id)
+                            if len(pagina_ids) == por_pagina:
+                                break
+                        vistos += 1
+
+            itens = []
+            for professor_id in pagina_ids:
+                compacto = self._registros[professor_id]
+                itens.append({campo: compacto[campo] for campo in CAMPOS_RESULTADO})
+            return total, itens
+
+    def ids(self, consulta: str = "", escola: str = "", situacao_servidor: str = "") -> list[int]:
+        """Todos os ids que casam com a busca (mesmas regras de ``buscar``)."""
+        with self._lock:
+            candidatos = self._candidatos(consulta, escola, situacao_servidor)
+            if candidatos is None:
+                return list(self._ids_ordenados)
+            return sorted(candidatos, reverse=True)
+
+    def _candidatos(self, consulta: str, escola: str, situacao_servidor: str) -> set[int] | None:
+        """Ids que casam com os termos e filtros; None se não houver critério."""
+        candidatos: set[int] | None = None
+        for termo in dobrar_acentos(consulta).split():
+            ids = self._ids_por_termo(termo)
+            candidatos = ids if candidatos is None else candidatos & ids
+            if not candidatos:
+                return set()
+        for filtros, valor in ((self._por_escola, escola), (self._por_situacao, situacao_servidor)):
+            if valor:
+                ids = filtros.get(valor, set())
+                candidatos = set(ids) if candidatos is None else candidatos & ids
+        return candidatos
@@ -0,0 +1,185 @@
+"""Compressão gzip/brotli das respostas, negociada pelo Accept-Encoding.
+
+``MiddlewareCompressao`` envolve a aplicação WSGI. A resposta é comprimida
+quando o cliente aceita gzip ou brotli, o tipo é texto (HTML, CSV, JSON...)
+e o corpo tem pelo menos ``minimo_bytes``. Respostas em streaming (sem
+``Content-Length``) são comprimidas pedaço a pedaço, com um flush a cada
+pedaço, para o cliente continuar recebendo os dados à medida que são
+gerados. ``text/event-stream``, respostas já codificadas, ``HEAD``, 204,
+206 e 304 passam sem alteração.
+
+Brotli depende do pacote opcional ``brotli``; sem ele só há gzip.
+"""
+from __future__ import annotations
+
+import zlib
+from typing import Any, Callable, Iterable, Iterator
+
+from estaticos import brotli, codificacoes_aceitas
+
+TIPOS_COMPRIMIVEIS = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+TIPOS_SEM_COMPRESSAO = ("text/event-stream",)
+
+
+class _CompressorGzip:
+    def __init__(self, nivel: int) -> None:
+        # wbits=31: formato gzip (cabeçalho e CRC), não zlib puro
+        self._zlib = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._zlib.compress(dados)
+
+    def descarregar(self) -> bytes:
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self) -> bytes:
+        return self._zlib.flush()
+
+
+class _CompressorBrotli:
+    def __init__(self, nivel: int) -> None:
+        self._brotli = brotli.Compressor(quality=nivel)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._brotli.process(dados)
+
+    def descarregar(self) -> bytes:
+        return self._brotli.flush()
+
+    def finalizar(self) -> bytes:
+        return self._brotli.finish()
+
+
+def _cabecalho(cabecalhos: list[tuple[str, str]], nome: str) -> str | None:
+    nome = nome.lower()
+    for chave, valor in cabecalhos:
+        if chave.lower() == nome:
+            return valor
+    return None
+
+
+class MiddlewareCompressao:
+    def __init__(
+        self,
+        aplicacao_wsgi: Callable,
+        minimo_bytes: int = 1024,
+        nivel_gzip: int = 6,
+        nivel_brotli: int = 4,
+    ) -> None:
+        self.aplicacao_wsgi = aplicacao_wsgi
+        self.minimo_bytes = minimo_bytes
+        self.nivel_gzip = nivel_gzip
+        self.nivel_brotli = nivel_brotli
+
+    def __call__(self, environ: dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        codificacao = self._negociar(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        if codificacao is None or environ.get("REQUEST_METHOD") == "HEAD":
+            return self.aplicacao_wsgi(environ, start_response)
+        return self._responder(environ, start_response, codificacao)
+
+    def _negociar(self, accept_encoding: str) -> str | None:
+        aceitas = codificacoes_aceitas(accept_encoding)
+        disponiveis = ["br", "gzip"] if brotli is not None else ["gzip"]
+        # maior qualidade vence; no empate, brotli (mais compacto)
+        melhor = max(disponiveis, key=lambda c: aceitas.get(c, aceitas.get("*", 0.0)))
+        return melhor if aceitas.get(melhor, aceitas.get("*", 0.0)) > 0 else None
+
+    def _compressor(self, codificacao: str):
+        if codificacao == "br":
+            return _CompressorBrotli(self.nivel_brotli)
+        return _CompressorGzip(self.nivel_gzip)
+
+    def _deve_comprimir(self, status: str, cabecalhos: list[tuple[str, str]], tamanho: int, terminou: bool) -> bool:
+        codigo = int(status.split(None, 1)[0])
+        if codigo < 200 or codigo in (204, 206, 304):
+            return False
+        if _cabecalho(cabecalhos, "Content-Encoding"):
+            return False
+        if "no-transform" in (_cabecalho(cabecalhos, "Cache-Control") or ""):
+            return False
+        tipo = (_cabecalho(cabecalhos, "Content-Type") or "").split(";", 1)[0].strip().lower()
+        if not tipo.startswith(TIPOS_COMPRIMIVEIS) or tipo in TIPOS_SEM_COMPRESSAO:
+            return False
+        comprimento = _cabecalho(cabecalhos, "Content-Length")
+        if comprimento is not None and comprimento.isdigit():
+            return int(comprimento) >= self.minimo_bytes
+        # streaming: decide pelo que já chegou (ou pelo corpo inteiro, se acabou)
+        return tamanho >= self.minimo_bytes or not terminou
+
+    @staticmethod
+    def _cabecalhos_comprimidos(cabecalhos: list[tuple[str, str]], codificacao: str) -> list[tuple[str, str]]:
+        novos: list[tuple[str, str]] = []
+        vary = None
+        for chave, valor in cabecalhos:
+            nome = chave.lower()
+            if nome in ("content-length", "accept-ranges"):
+                continue
+            if nome == "vary":
+                vary = valor
+                continue
+            if nome == "etag" and not valor.startswith("W/"):
+                # outra representação: o ETag forte deixaria de valer
+                valor = f"W/{valor}"
+            novos.append((chave, valor))
+        if vary is None:
+            vary = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower() and vary.strip() != "*":
+            vary = f"{vary}, Accept-Encoding"
+        novos.append(("Vary", vary))
+        novos.append(("Content-Encoding", codificacao))
+        return novos
+
+    def _responder(self, environ: dict[str, Any], start_response: Callable, codificacao: str) -> Iterator[bytes]:
+        inicio: dict[str, Any] = {}
+        pendente: list[bytes] = []
+
+        def capturar_inicio(status, cabecalhos, exc_info=None):
+            inicio.update(status=status, cabecalhos=list(cabecalhos), exc_info=exc_info)
+            return pendente.append  # write() do WSGI, ainda usado por alguns frameworks
+
+        iteravel = self.aplicacao_wsgi(environ, capturar_inicio)
+        try:
+            corpo = iter(iteravel)
+            # acumula até saber se vale comprimir: mínimo atingido ou corpo no fim
+            tamanho = sum(len(parte) for parte in pendente)
+            terminou = False
+            while tamanho < self.minimo_bytes or not inicio:
+                try:
+                    parte = next(corpo)
+                except StopIteration:
+                    terminou = True
+                    break
+                pendente.append(parte)
+                tamanho += len(parte)
+
+            status, cabecalhos = inicio["status"], inicio["cabecalhos"]
+            if not self._deve_comprimir(status, cabecalhos, tamanho, terminou):
+                start_response(status, cabecalhos, inicio["exc_info"])
+                yield from pendente
+                yield from corpo
+                return
+
+            streaming = _cabecalho(cabecalhos, "Content-Length") is None
+            start_response(status, self._cabecalhos_comprimidos(cabecalhos, codificacao), inicio["exc_info"])
+            compressor = self._compressor(codificacao)
+            saida = compressor.comprimir(b"".join(pendente))
+            if streaming and not terminou:
+                saida += compressor.descarregar()
+            if saida:
+                yield saida
+            for parte in corpo:
+                saida = compressor.comprimir(parte)
+                if streaming:
+                    saida += compressor.descarregar()
+                if saida:
+                    yield saida
+            yield compressor.finalizar()
+        finally:
+            if hasattr(iteravel, "close"):
+                iteravel.close()
@@ -1,27 +1,286 @@
 from __future__ import annotations
 
 import os
+import copy
 import json
+import logging
+import random
 import time
 import tempfile
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
 from datetime import datetime
+from functools import wraps
 from typing import Any
 
 # NUNCA FALHA - proteção máxima contra exceções no import
 
 USE_FIREBASE = os.environ.get("USE_FIREBASE", "1") == "1"
 
+logger = logging.getLogger("fundef.db")
+
+# Com DB_MODO_ESTRITO=1 falhas do Firestore viram ErroBackend em vez de
+# resultados vazios ([], None, 0), que fariam uma queda parecer registro vazio.
+DB_MODO_ESTRITO = os.environ.get("DB_MODO_ESTRITO", "0") == "1"
+# operações mais lentas que isso são registradas como aviso
+LOG_LENTO_MS = float(os.environ.get("LOG_LENTO_MS", "500") or 500)
+
+class ErroBackend(RuntimeError):
+    """Falha do Firestore repassada no modo estrito."""
+
+    def __init__(self, operacao: str, causa: object) -> None:
+        super().__init__(f"{operacao}: {causa}")
+        self.operacao = operacao
+
+class CircuitoAberto(ErroBackend):
+    """Chamada recusada sem ir ao Firestore: o disjuntor está aberto."""
+
+    def __init__(self) -> None:
+        super().__init__("firestore", "disjuntor aberto")
+
+class CpfDuplicado(ValueError):
+    """Inclusão ou edição recusada: o CPF já pertence a outro cadastro."""
+
+    def __init__(self, cpf: str) -> None:
+        super().__init__("Já existe um cadastro com este CPF.")
+        self.cpf = cpf
+
+class RascunhoNaoEncontrado(LookupError):
+    """Autosave de um rascunho que já foi concluído ou excluído: não é recriado."""
+
+    def __init__(self, rascunho_id: int) -> None:
+        super().__init__(f"Rascunho {rascunho_id} não existe mais.")
+        self.rascunho_id = rascunho_id
+
+# marcado por _falha durante uma leitura com cache (ver _ler_com_cache)
+_falha_ocorrida: ContextVar[bool | None] = ContextVar("_falha_ocorrida", default=None)
+
+def _falha(operacao: str, erro: Exception) -> None:
+    """Registra a falha de ``operacao``; no modo estrito a repassa como ErroBackend."""
+    if _falha_ocorrida.get() is not None:
+        _falha_ocorrida.set(True)
+    if isinstance(erro, CircuitoAberto):
+        logger.warning("chamada recusada: disjuntor aberto", extra={"operacao": operacao})
+    else:
+        logger.error(
+            "falha no backend", exc_info=erro, extra={"operacao": operacao, "erro": type(erro).__name__}
+        )
+    if DB_MODO_ESTRITO:
+        raise ErroBackend(operacao, erro) from erro
+
+# Resiliência das chamadas ao Firestore:
+# - cada RPC tem prazo (DB_TIMEOUT_S) dentro de um prazo total por operação;
+# - leituras com falha transitória são repetidas com backoff exponencial, até
+#   DB_TENTATIVAS, desde que haja saldo no orçamento global de retentativas
+#   (evita multiplicar a carga sobre um backend que já está mal);
+# - após DB_DISJUNTOR_FALHAS falhas transitórias seguidas o disjuntor abre e as
+#   chamadas falham na hora por DB_DISJUNTOR_ABERTO_S segundos; depois, uma
+#   chamada de teste decide se fecha de novo.
+DB_TIMEOUT_S = float(os.environ.get("DB_TIMEOUT_S", "5") or 5)
+DB_PRAZO_OPERACAO_S = float(os.environ.get("DB_PRAZO_OPERACAO_S", "10") or 10)
+DB_TENTATIVAS = int(os.environ.get("DB_TENTATIVAS", "3") or 1)
+DB_DISJUNTOR_FALHAS = int(os.environ.get("DB_DISJUNTOR_FALHAS", "5") or 5)
+DB_DISJUNTOR_ABERTO_S = float(os.environ.get("DB_DISJUNTOR_ABERTO_S", "30") or 30)
+# cópia local do último resultado de cada leitura, servida se o backend falhar
+DB_CACHE_LEITURA = os.environ.get("DB_CACHE_LEITURA", "0") == "1"
+DB_CACHE_MAX_IDADE_S = float(os.environ.get("DB_CACHE_MAX_IDADE_S", "300") or 300)
+DB_CACHE_ENTRADAS = 256
+
+# nomes das exceções do google.api_core/grpc que indicam falha passageira
+_ERROS_TRANSITORIOS = frozenset({
+    "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+    "ResourceExhausted", "Aborted", "GatewayTimeout", "RetryError", "Unknown",
+})
+
+def _transitorio(exc: Exception) -> bool:
+    return type(exc).__name__ in _ERROS_TRANSITORIOS or isinstance(exc, (ConnectionError, TimeoutError))
+
+class Disjuntor:
+    """Circuit breaker: fechado -> aberto (falhas seguidas) -> meio-aberto (uma chamada de teste)."""
+
+    def __init__(self, limite_falhas: int, intervalo_aberto_s: float) -> None:
+        self.limite_falhas = limite_falhas
+        self.intervalo_aberto_s = intervalo_aberto_s
+        self.estado = "fechado"
+        self.falhas_seguidas = 0
+        self.aberturas = 0
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    def permitir(self) -> None:
+        with self._lock:
+            if self.estado == "fechado":
+                return
+            if self.estado == "aberto" and time.monotonic() - self._aberto_em >= self.intervalo_aberto_s:
+                self.estado = "meio_aberto"
+                self._teste_em_andamento = False
+            if self.estado == "meio_aberto" and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return
+        raise CircuitoAberto()
+
+    def sucesso(self) -> None:
+        with self._lock:
+            self.falhas_seguidas = 0
+            if self.estado != "fechado":
+                logger.info("disjuntor fechado: Firestore respondeu")
+                self.estado = "fechado"
+                self._teste_em_andamento = False
+
+    def falha(self) -> None:
+        with self._lock:
+            self.falhas_seguidas += 1
+            if self.estado == "meio_aberto" or self.falhas_seguidas >= self.limite_falhas:
+                if self.estado != "aberto":
+                    self.aberturas += 1
+                    logger.warning(
+                        "disjuntor aberto", extra={"erro": f"{self.falhas_seguidas} falhas seguidas"}
+                    )
+                self.estado = "aberto"
+                self._aberto_em = time.monotonic()
+                self._teste_em_andamento = False
+
+    def situacao(self) -> dict[str, Any]:
+        with self._lock:
+            situacao: dict[str, Any] = {
+                "estado": self.estado,
+                "falhas_seguidas": self.falhas_seguidas,
+                "aberturas": self.aberturas,
+            }
+            if self.estado == "aberto":
+                restante = self.intervalo_aberto_s - (time.monotonic() - self._aberto_em)
+                situacao["reabre_em_s"] = round(max(restante, 0.0), 1)
+            return situacao
+
+class OrcamentoRetentativas:
+    """Saldo de retentativas: cada chamada bem-sucedida rende ``proporcao`` de ficha."""
+
+    def __init__(self, proporcao: float = 0.1, maximo: float = 10.0) -> None:
+        self.proporcao = proporcao
+        self.maximo = maximo
+        self.fichas = maximo
+        self._lock = threading.Lock()
+
+    def depositar(self) -> None:
+        with self._lock:
+            self.fichas = min(self.maximo, self.fichas + self.proporcao)
+
+    def retirar(self) -> bool:
+        with self._lock:
+            if self.fichas >= 1:
+                self.fichas -= 1
+                return True
+            return False
+
+disjuntor = Disjuntor(DB_DISJUNTOR_FALHAS, DB_DISJUNTOR_ABERTO_S)
+orcamento_retentativas = OrcamentoRetentativas()
+
+def situacao_disjuntor() -> dict[str, Any]:
+    return {**disjuntor.situacao(), "saldo_retentativas": round(orcamento_retentativas.fichas, 1)}
+
+def _rpc(chamada, leitura: bool = True):
+    """Executa ``chamada(opcoes)`` com prazo, disjuntor e (em leituras) retentativas.
+
+    ``opcoes`` são os argumentos ``timeout``/``retry`` repassados ao SDK;
+    ``retry=None`` desliga as retentativas internas do SDK em favor destas.
+    Escritas não são repetidas (incrementos não são idempotentes).
+    """
+    limite = time.monotonic() + DB_PRAZO_OPERACAO_S
+    tentativa = 0
+    while True:
+        disjuntor.permitir()
+        restante = limite - time.monotonic()
+        try:
+            resultado = chamada({"timeout": max(min(DB_TIMEOUT_S, restante), 0.1), "retry": None})
+        except Exception as e:
+            if not _transitorio(e):
+                # o Firestore respondeu (ex.: NotFound): o backend está de pé
+                disjuntor.sucesso()
+                raise
+            disjuntor.falha()
+            tentativa += 1
+            espera = random.uniform(0, min(2.0, 0.1 * 2 ** tentativa))
+            if (
+                not leitura
+                or tentativa >= DB_TENTATIVAS
+                or time.monotonic() + espera >= limite
+                or not orcamento_retentativas.retirar()
+            ):
+                raise
+            logger.info("repetindo leitura", extra={"erro": type(e).__name__})
+            time.sleep(espera)
+            continue
+        disjuntor.sucesso()
+        if tentativa == 0:
+            orcamento_retentativas.depositar()
+        return resultado
+
+_cache_leituras: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+_lock_cache_leituras = threading.Lock()
+
+def _ler_com_cache(nome: str, funcao, args: tuple, kwargs: dict[str, Any]):
+    """Leitura que guarda o último resultado bom e o serve se o backend falhar."""
+    try:
+        chave = (nome, args, tuple(sorted(kwargs.items())))
+        hash(chave)
+    except TypeError:
+        return funcao(*args, **kwargs)
+
+    token = _falha_ocorrida.set(False)
+    erro: ErroBackend | None = None
+    resultado = None
+    try:
+        resultado = funcao(*args, **kwargs)
+    except ErroBackend as e:  # modo estrito
+        erro = e
+    finally:
+        falhou = erro is not None or bool(_falha_ocorrida.get())
+        _falha_ocorrida.reset(token)
+
+    with _lock_cache_leituras:
+        if not falhou:
+            _cache_leituras[chave] = (time.monotonic(), copy.deepcopy(resultado))
+            _cache_leituras.move_to_end(chave)
+            while len(_cache_leituras) > DB_CACHE_ENTRADAS:
+                _cache_leituras.popitem(last=False)
+            return resultado
+        guardado = _cache_leituras.get(chave)
+    if guardado and time.monotonic() - guardado[0] <= DB_CACHE_MAX_IDADE_S:
+        logger.warning("servindo leitura do cache local", extra={"operacao": nome})
+        return copy.deepcopy(guardado[1])
+    if erro is not None:
+        raise erro
+    return resultado
+
 # Estado global - inicialização lazy
 _firebase_ready = False
 _db_instance = None
 _fs = None  # firestore module
+_lock_firebase = threading.Lock()
+_proxima_inicializacao = 0.0
+INTERVALO_NOVA_INICIALIZACAO_S = 30.0
 
 def ensure_firebase():
     """Inicializa Firebase se necessário - NUNCA lança exceção."""
-    global _firebase_ready, _db_instance, _fs
-    
     if _firebase_ready or not USE_FIREBASE:
         return _firebase_ready
+    global _proxima_inicializacao
+    # consultas em paralelo podem chegar aqui juntas; só uma inicializa
+    with _lock_firebase:
+        if _firebase_ready:
+            return True
+        # sem credenciais, não refaz a inicialização inteira a cada chamada
+        if time.monotonic() < _proxima_inicializacao:
+            return False
+        pronto = _inicializar_firebase()
+        if not pronto:
+            _proxima_inicializacao = time.monotonic() + INTERVALO_NOVA_INICIALIZACAO_S
+        return pronto
+
+def _inicializar_firebase():
+    global _firebase_ready, _db_instance, _fs
     
     try:
         import firebase_admin
@@ -46,15 +305,15 @@ def ensure_firebase():
                     temp_path = f.name
                 
                 cred = credentials.Certificate(temp_path)
-                print(f"[Firebase] Credenciais carregadas de env var")
+                logger.info("Firebase: credenciais carregadas de variável de ambiente")
             except Exception as e:
-                print(f"[Firebase WARN] Erro ao carregar credenciais env: {e}")
+                logger.warning("Firebase: erro ao carregar credenciais da variável de ambiente", exc_info=e)
         
         # Se não conseguiu credenciais, tenta ADC
         if not cred:
             try:
                 cred = credentials.ApplicationDefaultCredentials()
-                print("[Firebase] Usando Application Default Credentials")
+                logger.info("Firebase: usando Application Default Credentials")
             except:
                 pass
         
@@ -64,79 +323,262 @@ def ensure_firebase():
                 firebase_admin.initialize_app(cred)
                 _db_instance = firestore.client()
                 _firebase_ready = True
-                print("[Firebase] ✓ Inicializado com sucesso")
+                logger.info("Firebase inicializado")
             except Exception as e:
-                print(f"[Firebase WARN] Erro ao inicializar app: {e}")
+                logger.error("Firebase: erro ao inicializar app", exc_info=e)
                 _firebase_ready = False
         else:
-            print("[Firebase WARN] Nenhuma credencial disponível")
+            logger.error("Firebase: nenhuma credencial disponível")
             _firebase_ready = False
     
     except Exception as e:
-        print(f"[Firebase WARN] Erro geral: {e}")
+        logger.error("Firebase: erro na inicialização", exc_info=e)
         _firebase_ready = False
     
     return _firebase_ready
 
+def preparar_firebase() -> bool:
+    """Importa o SDK e carrega as credenciais no processo mestre (preload).
+
+    Não faz nenhuma chamada ao Firestore: canais gRPC abertos antes do fork
+    não podem ser usados pelos workers. Cada worker chama
+    ``reiniciar_cliente_apos_fork`` logo após o fork.
+    """
+    return ensure_firebase()
+
+def reiniciar_cliente_apos_fork() -> None:
+    """Cria um cliente Firestore novo (canais gRPC próprios) no worker."""
+    global _db_instance, _lock_firebase
+    _lock_firebase = threading.Lock()
+    if not _firebase_ready:
+        return
+    try:
+        import firebase_admin
+        from google.cloud import firestore as gcloud_firestore
+
+        app = firebase_admin.get_app()
+        _db_instance = gcloud_firestore.Client(
+            project=app.project_id, credentials=app.credential.get_credential()
+        )
+    except Exception as e:
+        logger.error("Firebase: erro ao recriar cliente após fork", exc_info=e)
+
+def estado_firebase() -> dict[str, Any]:
+    return {"inicializado": _firebase_ready, "cliente": _db_instance is not None}
+
+def sondar_firestore() -> float:
+    """Lê um documento pequeno e devolve a latência da ida e volta, em ms.
+
+    Falhas (inclusive disjuntor aberto) são repassadas ao chamador. Uma
+    única tentativa: a sonda mede o backend, não as retentativas.
+    """
+    if not ensure_firebase():
+        raise RuntimeError("Firebase não está disponível")
+    ref = db.collection("_meta").document("counters")
+    inicio = time.perf_counter()
+    _rpc(lambda op: ref.get(**op), leitura=False)
+    return (time.perf_counter() - inicio) * 1000
+
 class DBProxy:
-    """Proxy que acessa Firestore ou retorna None se indisponível."""
+    """Proxy que acessa Firestore ou falha se indisponível."""
     def __call__(self, *args, **kwargs):
         return self
-    
-    def collection(self, *args, **kwargs):
+
+    @staticmethod
+    def _cliente():
+        # caminho rápido: cliente pronto, sem passar pelo lock de ensure_firebase
+        if _firebase_ready and _db_instance is not None:
+            return _db_instance
         if ensure_firebase() and _db_instance:
-            return _db_instance.collection(*args, **kwargs)
+            return _db_instance
         raise RuntimeError("Firebase não está disponível")
-    
+
+    def collection(self, *args, **kwargs):
+        return self._cliente().collection(*args, **kwargs)
+
     def transaction(self, *args, **kwargs):
-        if ensure_firebase() and _db_instance:
-            return _db_instance.transaction(*args, **kwargs)
-        raise RuntimeError("Firebase não está disponível")
-    
+        return self._cliente().transaction(*args, **kwargs)
+
     def batch(self):
-        if ensure_firebase() and _db_instance:
-            return _db_instance.batch()
-        raise RuntimeError("Firebase não está disponível")
-    
+        return self._cliente().batch()
+
     def __getattr__(self, name):
-        if ensure_firebase() and _db_instance:
-            return getattr(_db_instance, name)
-        raise RuntimeError(f"Firebase não está disponível para acessar {name}")
+        return getattr(self._cliente(), name)
 
 db = DBProxy()
 
+# Contagem de chamadas à camada de dados por requisição (usada pelo perfilador).
+# Fora de uma contagem ativa o custo é um ContextVar.get por chamada.
+_chamadas_db: ContextVar[dict[str, int] | None] = ContextVar("_chamadas_db", default=None)
+
+def iniciar_contagem_chamadas():
+    """Começa a contar as chamadas do contexto atual; devolve o token para encerrar."""
+    return _chamadas_db.set({})
+
+def encerrar_contagem_chamadas(token) -> dict[str, int]:
+    contagem = _chamadas_db.get() or {}
+    _chamadas_db.reset(token)
+    return contagem
+
+def contagem_chamadas_ativa() -> bool:
+    return _chamadas_db.get() is not None
+
+def registrar_chamada(nome: str) -> None:
+    contagem = _chamadas_db.get()
+    if contagem is not None:
+        contagem[nome] = contagem.get(nome, 0) + 1
+
+def _contar_documentos(resultado: Any) -> int | None:
+    if isinstance(resultado, list):
+        return len(resultado)
+    if isinstance(resultado, dict):
+        return 1
+    if resultado is None:
+        return 0
+    return None
+
+OPERACOES_LEITURA = frozenset({
+    "list_professores", "list_rascunhos", "find_professor_by_cpf", "get_professor",
+    "get_estatisticas", "carregar_rascunho", "export_professores",
+    "get_professores_for_rateio", "get_totais_rateio",
+})
+
+def _operacao_db(funcao):
+    """Conta a chamada (perfilador) e registra operação, latência e documentos."""
+    nome = funcao.__name__
+
+    @wraps(funcao)
+    def envolvida(*args, **kwargs):
+        contagem = _chamadas_db.get()
+        if contagem is not None:
+            contagem[nome] = contagem.get(nome, 0) + 1
+        inicio = time.perf_counter()
+        if DB_CACHE_LEITURA and USE_FIREBASE and nome in OPERACOES_LEITURA:
+            resultado = _ler_com_cache(nome, funcao, args, kwargs)
+        else:
+            resultado = funcao(*args, **kwargs)
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        nivel = logging.WARNING if duracao_ms >= LOG_LENTO_MS else logging.DEBUG
+        if logger.isEnabledFor(nivel):
+            logger.log(
+                nivel,
+                "operação lenta" if nivel == logging.WARNING else "operação",
+                extra={
+                    "operacao": nome,
+                    "duracao_ms": round(duracao_ms, 2),
+                    "documentos": _contar_documentos(resultado),
+                    "backend": "firestore" if USE_FIREBASE else "nenhum",
+                },
+            )
+        return resultado
+    return envolvida
+
 def _now_str() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+def _revisao_str() -> str:
+    # com microssegundos: é a revisão usada no cache de linhas do index
+    return datetime.now().isoformat(sep=" ", timespec="microseconds")
+
 # Stubs de funções que podem falhar se Firebase não estiver disponível
+@_operacao_db
 def init_db() -> None:
     if not USE_FIREBASE:
         return  # SQLite não precisa inicializar
     try:
         meta_ref = db.collection("_meta").document("counters")
-        if not meta_ref.get().exists:
-            meta_ref.set({"last_professor_id": 0, "last_rascunho_id": 0})
+        if not _rpc(lambda op: meta_ref.get(**op)).exists:
+            _rpc(lambda op: meta_ref.set({"last_professor_id": 0, "last_rascunho_id": 0}, **op), leitura=False)
     except Exception as e:
-        print(f"[init_db] ERRO: {e}")
+        _falha("init_db", e)
 
+# Ids numéricos sem um documento quente: _meta/counters aguenta cerca de uma
+# escrita sustentada por segundo. Cada contador tem CONTADOR_SHARDS shards em
+# _meta/ids_<nome>/shards/<k>; o shard k emite base+k+1, base+k+1+N, ... Os ids
+# continuam inteiros, únicos e crescentes com o tempo (não estritamente: dois
+# cadastros simultâneos podem sair em ordem trocada). ``base`` e o número de
+# shards ficam gravados em _meta/ids_<nome> na primeira emissão e não mudam.
+CONTADOR_SHARDS = int(os.environ.get("CONTADOR_SHARDS", "8") or 1)
+_COLECOES_DOS_CONTADORES = {"professor": "professores", "rascunho": "rascunhos_professores"}
+_contadores: dict[str, tuple[int, int]] = {}
+
+def _maior_id_emitido(name: str) -> int:
+    # ids emitidos pelo contador antigo ou pelo fallback de timestamp
+    legado = _rpc(lambda op: db.collection("_meta").document("counters").get(**op))
+    maior = int((legado.to_dict() or {}).get(f"last_{name}_id") or 0) if legado.exists else 0
+    consulta = (
+        db.collection(_COLECOES_DOS_CONTADORES[name])
+        .order_by("id", direction=_fs.Query.DESCENDING)
+        .select(["id"])
+        .limit(1)
+    )
+    for doc in _rpc(lambda op: list(consulta.stream(**op))):
+        maior = max(maior, int((doc.to_dict() or {}).get("id") or 0))
+    return maior
+
+def _contador(name: str) -> tuple[int, int]:
+    """(base, shards) do contador ``name``, criados na primeira chamada."""
+    if name in _contadores:
+        return _contadores[name]
+    ref = db.collection("_meta").document(f"ids_{name}")
+    doc = _rpc(lambda op: ref.get(**op))
+    if doc.exists:
+        config = doc.to_dict() or {}
+    else:
+        base = _maior_id_emitido(name)
+
+        @_fs.transactional
+        def criar(transaction):
+            # outro processo pode ter criado a configuração nesse meio-tempo
+            atual = ref.get(transaction=transaction)
+            if atual.exists:
+                return atual.to_dict() or {}
+            config = {"base": base, "shards": CONTADOR_SHARDS}
+            transaction.set(ref, config)
+            return config
+
+        config = _rpc(lambda _op: criar(db.transaction()), leitura=False)
+    _contadores[name] = (int(config.get("base") or 0), max(int(config.get("shards") or 1), 1))
+    return _contadores[name]
+
+@_operacao_db
 def _next_id(name: str) -> int:
     if not USE_FIREBASE:
         return 0
     try:
-        meta_ref = db.collection("_meta").document("counters")
-        def transaction_increment(transaction):
-            snapshot = meta_ref.get(transaction=transaction)
-            data = snapshot.to_dict() or {}
-            key = f"last_{name}_id"
-            last = int(data.get(key, 0))
-            novo = last + 1
-            transaction.update(meta_ref, {key: novo})
-            return novo
-        return db.transaction()(transaction_increment)
+        base, shards = _contador(name)
+        shard = random.randrange(shards)
+        ref = db.collection("_meta").document(f"ids_{name}").collection("shards").document(str(shard))
+
+        @_fs.transactional
+        def incrementar(transaction):
+            emitidos = int((ref.get(transaction=transaction).to_dict() or {}).get("emitidos") or 0)
+            transaction.set(ref, {"emitidos": emitidos + 1}, merge=True)
+            return emitidos
+
+        # o SDK já repete a transação em conflito; _rpc só aplica prazo e disjuntor
+        emitidos = _rpc(lambda _op: incrementar(db.transaction()), leitura=False)
+        return base + emitidos * shards + shard + 1
     except Exception as e:
-        print(f"[_next_id] ERRO: {e}")
+        logger.warning("contador de ids indisponível", exc_info=e, extra={"operacao": "_next_id"})
         return 0
 
+@_operacao_db
+def ids_emitidos(name: str) -> int:
+    """Quantidade de ids emitidos pelo contador ``name`` (soma dos shards)."""
+    if not USE_FIREBASE:
+        return 0
+    try:
+        consulta = db.collection("_meta").document(f"ids_{name}").collection("shards")
+        return sum(
+            int((doc.to_dict() or {}).get("emitidos") or 0)
+            for doc in _rpc(lambda op: list(consulta.stream(**op)))
+        )
+    except Exception as e:
+        _falha("ids_emitidos", e)
+        return 0
+
+@_operacao_db
 def list_professores(order_desc: bool = True) -> list[dict[str, Any]]:
     if not USE_FIREBASE:
         return []
@@ -146,21 +588,30 @@ def list_professores(order_desc: bool = True) -> list[dict[str, Any]]:
             query = coll.order_by("id", direction=_fs.Query.DESCENDING if order_desc else _fs.Query.ASCENDING)
         else:
             query = coll.order_by("id")
-        docs = query.stream()
-        return [doc.to_dict() for doc in docs]
+        return _rpc(lambda op: [doc.to_dict() for doc in query.stream(**op)])
     except Exception as e:
-        print(f"[list_professores] ERRO: {e}")
+        _falha("list_professores", e)
         return []
 
-def list_rascunhos() -> list[dict[str, Any]]:
+CAMPOS_LISTAGEM_RASCUNHO = ["id", "nome_referencia", "cpf", "criado_em", "atualizado_em"]
+
+@_operacao_db
+def list_rascunhos(limite: int | None = None, deslocamento: int = 0) -> list[dict[str, Any]]:
+    """Lista rascunhos (mais recentes primeiro) lendo só os campos da listagem."""
     if not USE_FIREBASE:
         return []
     try:
-        docs = db.collection("rascunhos_professores").order_by(
-            "atualizado_em", direction=_fs.Query.DESCENDING if _fs else None
-        ).stream()
+        query = (
+            db.collection("rascunhos_professores")
+            .select(CAMPOS_LISTAGEM_RASCUNHO)
+            .order_by("atualizado_em", direction=_fs.Query.DESCENDING if _fs else None)
+        )
+        if deslocamento:
+            query = query.offset(deslocamento)
+        if limite is not None:
+            query = query.limit(limite)
         resultado: list[dict[str, Any]] = []
-        for doc in docs:
+        for doc in _rpc(lambda op: list(query.stream(**op))):
             data = doc.to_dict() or {}
             # garante que exista campo id numérico quando possível
             try:
@@ -171,72 +622,511 @@ def list_rascunhos() -> list[dict[str, Any]]:
             resultado.append(data)
         return resultado
     except Exception as e:
-        print(f"[list_rascunhos] ERRO: {e}")
+        _falha("list_rascunhos", e)
         return []
 
-def find_professor_by_cpf(cpf: str) -> dict[str, Any] | None:
+@_operacao_db
+def expirar_rascunhos(atualizado_antes_de: str, lote: int = 400) -> int:
+    """Remove rascunhos sem atualização desde ``atualizado_antes_de``.
+
+    As exclusões são feitas em WriteBatches de até ``lote`` documentos
+    (limite do Firestore: 500 operações por batch). Retorna quantos saíram.
+    """
     if not USE_FIREBASE:
+        return 0
+    removidos = 0
+    try:
+        coll = db.collection("rascunhos_professores")
+        while True:
+            consulta = coll.where("atualizado_em", "<", atualizado_antes_de).select(["atualizado_em"]).limit(lote)
+            docs = _rpc(lambda op: list(consulta.stream(**op)))
+            if not docs:
+                break
+            batch = db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            _rpc(lambda op: batch.commit(**op), leitura=False)
+            removidos += len(docs)
+            if len(docs) < lote:
+                break
+    except Exception as e:
+        _falha("expirar_rascunhos", e)
+    return removidos
+
+# Unicidade do CPF: cpf_index/<cpf> guarda o id do professor e é criado
+# (``create``, que falha se o documento existir) no mesmo batch que grava o
+# professor; edições que trocam o CPF movem a entrada e exclusões a removem.
+# Cadastros anteriores ao índice entram com scripts/reconstruir_indice_cpf.py,
+# que marca _meta/cpf_index como completo. Até lá, um CPF sem entrada ainda é
+# procurado na coleção (a consulta antiga) e, se achado, ganha a entrada.
+COLECAO_INDICE_CPF = "cpf_index"
+_indice_cpf_completo = False
+
+def _cpf_em_uso(exc: Exception) -> bool:
+    # google.api_core.exceptions.AlreadyExists (409), sem importar o pacote aqui
+    return type(exc).__name__ in ("AlreadyExists", "Conflict")
+
+def _indice_cpf(cpf: Any):
+    return db.collection(COLECAO_INDICE_CPF).document(str(cpf))
+
+def _indice_completo() -> bool:
+    global _indice_cpf_completo
+    if not _indice_cpf_completo:
+        marcador = _rpc(lambda op: db.collection("_meta").document("cpf_index").get(**op))
+        _indice_cpf_completo = bool(marcador.exists and (marcador.to_dict() or {}).get("completo"))
+    return _indice_cpf_completo
+
+def _verificar_cpf_sem_indice(cpf: str, professor_id: int | None = None) -> None:
+    """Recusa um CPF de cadastro anterior ao índice (enquanto ele não está completo).
+
+    O dono encontrado ganha a entrada em cpf_index, e as próximas
+    verificações desse CPF passam a ser só pela chave.
+    """
+    if not cpf or _indice_completo():
+        return
+    consulta = db.collection("professores").where("cpf", "==", cpf).select(["id"]).limit(2)
+    for doc in _rpc(lambda op: list(consulta.stream(**op))):
+        dono = int((doc.to_dict() or {}).get("id") or doc.id)
+        if dono == professor_id:
+            continue
+        batch = db.batch()
+        batch.create(_indice_cpf(cpf), {"professor_id": dono})
+        try:
+            _rpc(lambda op: batch.commit(**op), leitura=False)
+        except Exception as e:
+            if not _cpf_em_uso(e):
+                logger.warning("entrada de cpf_index não criada", exc_info=e, extra={"operacao": "cpf_index"})
+        raise CpfDuplicado(cpf)
+
+@_operacao_db
+def find_professor_by_cpf(cpf: str) -> dict[str, Any] | None:
+    """Busca pelo índice de CPF: leitura por chave, sem consulta."""
+    if not USE_FIREBASE or not cpf:
         return None
     try:
-        docs = db.collection("professores").where("cpf", "==", cpf).limit(1).stream()
-        for d in docs:
-            return d.to_dict()
+        indice = _rpc(lambda op: _indice_cpf(cpf).get(**op))
+        if not indice.exists:
+            if _indice_completo():
+                return None
+            consulta = db.collection("professores").where("cpf", "==", cpf).limit(1)
+            return next((doc.to_dict() for doc in _rpc(lambda op: list(consulta.stream(**op)))), None)
+        professor_id = (indice.to_dict() or {}).get("professor_id")
+        doc = _rpc(lambda op: db.collection("professores").document(str(professor_id)).get(**op))
+        if doc.exists:
+            return doc.to_dict()
     except Exception as e:
-        print(f"[find_professor_by_cpf] ERRO: {e}")
+        _falha("find_professor_by_cpf", e)
     return None
 
+@_operacao_db
 def get_professor(professor_id: int) -> dict[str, Any] | None:
     if not USE_FIREBASE:
         return None
     try:
-        docs = db.collection("professores").where("id", "==", int(professor_id)).limit(1).stream()
+        consulta = db.collection("professores").where("id", "==", int(professor_id)).limit(1)
+        docs = _rpc(lambda op: list(consulta.stream(**op)))
         for d in docs:
             return d.to_dict()
     except Exception as e:
-        print(f"[get_professor] ERRO: {e}")
+        _falha("get_professor", e)
     return None
 
+# Contadores agregados: {dimensão: {valor: quantidade}} e "total". Cada escrita
+# em "professores" soma seu delta, no mesmo WriteBatch, a um de
+# ESTATISTICAS_SHARDS shards sorteado (_meta/stats/shards/<k>), como os
+# contadores de ids: um documento único aguentaria cerca de uma escrita por
+# segundo e todo cadastro disputaria por ele. A leitura soma _meta/stats (base
+# gravada por reconstruir_estatisticas) e os shards.
+# O delta sai do ``anterior`` lido fora de transação; edições simultâneas do
+# mesmo cadastro podem desviar os contadores, e reconstruir_estatisticas
+# (scripts/reconstruir_estatisticas.py) os corrige.
+ESTATISTICAS_SHARDS = int(os.environ.get("ESTATISTICAS_SHARDS", "8") or 1)
+DIMENSOES_ESTATISTICAS = ("escola", "cargo", "situacao_servidor", "meses")
+VALOR_NAO_INFORMADO = "Não informado"
+
+def _valores_estatisticas(prof: dict[str, Any] | None) -> dict[str, str]:
+    if not prof:
+        return {}
+    valores = {}
+    for dimensao in DIMENSOES_ESTATISTICAS:
+        campo = "quantidade_meses_trabalhados" if dimensao == "meses" else dimensao
+        bruto = prof.get(campo)
+        try:
+            texto = str(int(bruto)) if dimensao == "meses" else str(bruto or "").strip()
+        except (TypeError, ValueError):
+            texto = ""
+        valores[dimensao] = texto or VALOR_NAO_INFORMADO
+    return valores
+
+def _delta_estatisticas(antes: dict[str, Any] | None, depois: dict[str, Any] | None) -> dict[str, Any]:
+    """Incrementos para levar os contadores do estado ``antes`` ao ``depois``."""
+    delta: dict[str, Any] = {}
+    total = (1 if depois else 0) - (1 if antes else 0)
+    if total:
+        delta["total"] = total
+    valores_antes = _valores_estatisticas(antes)
+    valores_depois = _valores_estatisticas(depois)
+    for dimensao in DIMENSOES_ESTATISTICAS:
+        contagem: dict[str, int] = {}
+        if dimensao in valores_antes:
+            contagem[valores_antes[dimensao]] = contagem.get(valores_antes[dimensao], 0) - 1
+        if dimensao in valores_depois:
+            contagem[valores_depois[dimensao]] = contagem.get(valores_depois[dimensao], 0) + 1
+        contagem = {valor: n for valor, n in contagem.items() if n}
+        if contagem:
+            delta[dimensao] = contagem
+    return delta
+
+def _somar_deltas(acumulado: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    for chave, valor in delta.items():
+        if isinstance(valor, dict):
+            destino = acumulado.setdefault(chave, {})
+            for item, n in valor.items():
+                destino[item] = destino.get(item, 0) + n
+        else:
+            acumulado[chave] = acumulado.get(chave, 0) + valor
+    return acumulado
+
+def _registrar_estatisticas(batch, delta: dict[str, Any]) -> None:
+    if not delta:
+        return
+    incrementos: dict[str, Any] = {}
+    for chave, valor in delta.items():
+        if isinstance(valor, dict):
+            incrementos[chave] = {item: _fs.Increment(n) for item, n in valor.items() if n}
+        elif valor:
+            incrementos[chave] = _fs.Increment(valor)
+    shard = db.collection("_meta").document("stats").collection("shards").document(
+        str(random.randrange(max(ESTATISTICAS_SHARDS, 1)))
+    )
+    # set(merge=True) trata as chaves dos mapas literalmente (valores podem ter ".")
+    batch.set(shard, incrementos, merge=True)
+
+@_operacao_db
+def get_estatisticas() -> dict[str, Any]:
+    if not USE_FIREBASE:
+        return {}
+    try:
+        base_ref = db.collection("_meta").document("stats")
+        base = _rpc(lambda op: base_ref.get(**op))
+        acumulado = _somar_deltas({}, (base.to_dict() or {}) if base.exists else {})
+        for doc in _rpc(lambda op: list(base_ref.collection("shards").stream(**op))):
+            _somar_deltas(acumulado, doc.to_dict() or {})
+        return acumulado
+    except Exception as e:
+        _falha("get_estatisticas", e)
+        return {}
+
+@_operacao_db
+def reconstruir_estatisticas() -> dict[str, Any]:
+    """Recalcula os contadores varrendo "professores" (corrige desvios).
+
+    Grava o total em _meta/stats e apaga os shards no mesmo batch; escritas
+    feitas durante a varredura podem ficar de fora, então rode fora do
+    horário de uso.
+    """
+    if not USE_FIREBASE:
+        return {}
+    campos = ["escola", "cargo", "situacao_servidor", "quantidade_meses_trabalhados"]
+    acumulado: dict[str, Any] = {}
+    consulta = db.collection("professores").select(campos)
+    for doc in _rpc(lambda op: list(consulta.stream(**op))):
+        _somar_deltas(acumulado, _delta_estatisticas(None, doc.to_dict() or {}))
+    acumulado.setdefault("total", 0)
+    base_ref = db.collection("_meta").document("stats")
+    batch = db.batch()
+    batch.set(base_ref, acumulado)
+    for shard in _rpc(lambda op: list(base_ref.collection("shards").select([]).stream(**op))):
+        batch.delete(shard.reference)
+    _rpc(lambda op: batch.commit(**op), leitura=False)
+    return acumulado
+
+@_operacao_db
+def reconstruir_indice_cpf(lote: int = 400) -> dict[str, Any]:
+    """Cria as entradas de cpf_index que faltam (cadastros anteriores ao índice).
+
+    Entradas existentes são mantidas. CPFs já repetidos na coleção ficam com o
+    menor id e são listados em ``repetidos`` para correção manual.
+    """
+    if not USE_FIREBASE:
+        return {}
+    consulta = db.collection("professores").select(["id", "cpf"])
+    donos: dict[str, int] = {}
+    repetidos: set[str] = set()
+    for doc in _rpc(lambda op: list(consulta.stream(**op))):
+        dados = doc.to_dict() or {}
+        cpf, professor_id = str(dados.get("cpf") or ""), int(dados.get("id") or doc.id)
+        if not cpf:
+            continue
+        if cpf in donos:
+            repetidos.add(cpf)
+            professor_id = min(professor_id, donos[cpf])
+        donos[cpf] = professor_id
+
+    existentes = {doc.id for doc in _rpc(lambda op: list(db.collection(COLECAO_INDICE_CPF).select([]).stream(**op)))}
+    faltantes = [(cpf, professor_id) for cpf, professor_id in donos.items() if cpf not in existentes]
+    for inicio in range(0, len(faltantes), lote):
+        batch = db.batch()
+        for cpf, professor_id in faltantes[inicio:inicio + lote]:
+            batch.set(_indice_cpf(cpf), {"professor_id": professor_id})
+        _rpc(lambda op: batch.commit(**op), leitura=False)
+    # daqui em diante a verificação de CPF é só pela chave (ver _verificar_cpf_sem_indice)
+    _rpc(
+        lambda op: db.collection("_meta").document("cpf_index").set({"completo": True, "em": _now_str()}, **op),
+        leitura=False,
+    )
+    return {"criados": len(faltantes), "existentes": len(existentes), "repetidos": sorted(repetidos)}
+
+@_operacao_db
 def insert_professor(prof_data: dict[str, Any]) -> int:
     if not USE_FIREBASE:
         return 0
     try:
+        _verificar_cpf_sem_indice(str(prof_data.get("cpf") or ""))
         professor_id = _next_id("professor")
         # Se o gerador de IDs falhar (retorna 0), usar timestamp para garantir unicidade
         if not professor_id:
             professor_id = int(time.time() * 1_000_000) % (2**31)  # microsegundos, mod para evitar overflow
         prof_data["id"] = professor_id
         prof_data["criado_em"] = _now_str()
-        db.collection("professores").document(str(professor_id)).set(prof_data)
+        batch = db.batch()
+        batch.create(_indice_cpf(prof_data["cpf"]), {"professor_id": professor_id})
+        batch.set(db.collection("professores").document(str(professor_id)), prof_data)
+        _registrar_estatisticas(batch, _delta_estatisticas(None, prof_data))
+        _rpc(lambda op: batch.commit(**op), leitura=False)
         return professor_id
+    except CpfDuplicado:
+        raise
     except Exception as e:
-        print(f"[insert_professor] ERRO: {e}")
+        if _cpf_em_uso(e):
+            raise CpfDuplicado(str(prof_data.get("cpf", ""))) from e
+        _falha("insert_professor", e)
         return 0
 
-def update_professor(professor_id: int, updates: dict[str, Any]) -> bool:
+def _professor_atual(professor_id: int, anterior: dict[str, Any] | None) -> dict[str, Any] | None:
+    if anterior is not None:
+        return anterior
+    doc = _rpc(lambda op: db.collection("professores").document(str(professor_id)).get(**op))
+    return (doc.to_dict() or {}) if doc.exists else None
+
+@_operacao_db
+def update_professor(
+    professor_id: int, updates: dict[str, Any], anterior: dict[str, Any] | None = None
+) -> bool:
+    """Atualiza um professor; ``anterior`` (documento atual) evita uma leitura extra."""
     if not USE_FIREBASE:
         return False
     try:
-        updates["atualizado_em"] = _now_str()
-        db.collection("professores").document(str(professor_id)).update(updates)
+        anterior = _professor_atual(professor_id, anterior)
+        updates["atualizado_em"] = _revisao_str()
+        batch = db.batch()
+        batch.update(db.collection("professores").document(str(professor_id)), updates)
+        cpf_antigo = (anterior or {}).get("cpf")
+        if updates.get("cpf") and updates["cpf"] != cpf_antigo:
+            _verificar_cpf_sem_indice(str(updates["cpf"]), int(professor_id))
+            batch.create(_indice_cpf(updates["cpf"]), {"professor_id": int(professor_id)})
+            if cpf_antigo:
+                batch.delete(_indice_cpf(cpf_antigo))
+        if anterior is not None:
+            _registrar_estatisticas(batch, _delta_estatisticas(anterior, {**anterior, **updates}))
+        _rpc(lambda op: batch.commit(**op), leitura=False)
         return True
+    except CpfDuplicado:
+        raise
     except Exception as e:
-        print(f"[update_professor] ERRO: {e}")
+        if _cpf_em_uso(e):
+            raise CpfDuplicado(str(updates.get("cpf", ""))) from e
+        _falha("update_professor", e)
         return False
 
-def delete_professor(professor_id: int) -> bool:
+@_operacao_db
+def delete_professor(professor_id: int, anterior: dict[str, Any] | None = None) -> bool:
     if not USE_FIREBASE:
         return False
     try:
-        db.collection("professores").document(str(professor_id)).delete()
+        anterior = _professor_atual(professor_id, anterior)
+        batch = db.batch()
+        batch.delete(db.collection("professores").document(str(professor_id)))
+        if anterior is not None:
+            if anterior.get("cpf"):
+                batch.delete(_indice_cpf(anterior["cpf"]))
+            _registrar_estatisticas(batch, _delta_estatisticas(anterior, None))
+        _rpc(lambda op: batch.commit(**op), leitura=False)
         return True
     except Exception as e:
-        print(f"[delete_professor] ERRO: {e}")
+        _falha("delete_professor", e)
         return False
 
+# Edição e exclusão em lote: cada fatia de ids custa uma leitura (get_all) e
+# um WriteBatch, com os contadores das estatísticas somados num único set.
+LIMITE_OPERACOES_BATCH = 500
+
+def _professores_por_id(ids: list[int]) -> dict[int, dict[str, Any]]:
+    refs = [db.collection("professores").document(str(professor_id)) for professor_id in ids]
+    return {
+        int(doc.id): doc.to_dict() or {}
+        for doc in _rpc(lambda op: list(db.get_all(refs, **op)))
+        if doc.exists
+    }
+
+@_operacao_db
+def update_professores_em_lote(ids: list[int], campos: dict[str, Any], lote: int = 400) -> dict[int, str]:
+    """Aplica ``campos`` aos professores ``ids``; devolve id -> resultado.
+
+    Resultados: "atualizado", "nao_encontrado" ou "erro" (a fatia inteira
+    falha junto, pois o batch é atômico). ``campos`` não deve incluir o CPF:
+    o índice cpf_index não é tocado aqui.
+    """
+    if not USE_FIREBASE:
+        return {}
+    lote = max(1, min(lote, LIMITE_OPERACOES_BATCH - 1))
+    resultado: dict[int, str] = {}
+    for inicio in range(0, len(ids), lote):
+        fatia = ids[inicio:inicio + lote]
+        try:
+            atuais = _professores_por_id(fatia)
+            alteracoes = {**campos, "atualizado_em": _revisao_str()}
+            batch = db.batch()
+            delta: dict[str, Any] = {}
+            for professor_id in fatia:
+                anterior = atuais.get(professor_id)
+                if anterior is None:
+                    continue
+                batch.update(db.collection("professores").document(str(professor_id)), alteracoes)
+                _somar_deltas(delta, _delta_estatisticas(anterior, {**anterior, **alteracoes}))
+            if atuais:
+                _registrar_estatisticas(batch, delta)
+                _rpc(lambda op: batch.commit(**op), leitura=False)
+            for professor_id in fatia:
+                resultado[professor_id] = "atualizado" if professor_id in atuais else "nao_encontrado"
+        except Exception as e:
+            for professor_id in fatia:
+                resultado[professor_id] = "erro"
+            _falha("update_professores_em_lote", e)
+    return resultado
+
+@_operacao_db
+def delete_professores_em_lote(ids: list[int], lote: int = 240) -> dict[int, str]:
+    """Exclui os professores ``ids`` (e suas entradas de cpf_index); id -> resultado.
+
+    Resultados: "excluido", "nao_encontrado" ou "erro", como em
+    ``update_professores_em_lote``.
+    """
+    if not USE_FIREBASE:
+        return {}
+    # duas operações por professor (documento e índice) + estatísticas
+    lote = max(1, min(lote, (LIMITE_OPERACOES_BATCH - 1) // 2))
+    resultado: dict[int, str] = {}
+    for inicio in range(0, len(ids), lote):
+        fatia = ids[inicio:inicio + lote]
+        try:
+            atuais = _professores_por_id(fatia)
+            batch = db.batch()
+            delta: dict[str, Any] = {}
+            for professor_id in fatia:
+                anterior = atuais.get(professor_id)
+                if anterior is None:
+                    continue
+                batch.delete(db.collection("professores").document(str(professor_id)))
+                if anterior.get("cpf"):
+                    batch.delete(_indice_cpf(anterior["cpf"]))
+                _somar_deltas(delta, _delta_estatisticas(anterior, None))
+            if atuais:
+                _registrar_estatisticas(batch, delta)
+                _rpc(lambda op: batch.commit(**op), leitura=False)
+            for professor_id in fatia:
+                resultado[professor_id] = "excluido" if professor_id in atuais else "nao_encontrado"
+        except Exception as e:
+            for professor_id in fatia:
+                resultado[professor_id] = "erro"
+            _falha("delete_professores_em_lote", e)
+    return resultado
+
+# Reimportação idempotente: importacoes/<sha256 do arquivo> registra cada
+# importação concluída e cada professor importado guarda em hash_importacao o
+# hash da linha de origem (vazio depois de uma edição manual).
+COLECAO_IMPORTACOES = "importacoes"
+
+@_operacao_db
+def get_importacao(hash_arquivo: str) -> dict[str, Any] | None:
+    if not USE_FIREBASE:
+        return None
+    try:
+        doc = _rpc(lambda op: db.collection(COLECAO_IMPORTACOES).document(hash_arquivo).get(**op))
+        return (doc.to_dict() or {}) if doc.exists else None
+    except Exception as e:
+        _falha("get_importacao", e)
+        return None
+
+@_operacao_db
+def registrar_importacao(hash_arquivo: str, dados: dict[str, Any]) -> bool:
+    if not USE_FIREBASE:
+        return False
+    try:
+        doc = db.collection(COLECAO_IMPORTACOES).document(hash_arquivo)
+        _rpc(lambda op: doc.set({**dados, "hash_arquivo": hash_arquivo}, **op), leitura=False)
+        return True
+    except Exception as e:
+        _falha("registrar_importacao", e)
+        return False
+
+# Limite de valores de um filtro "in" do Firestore.
+CPFS_POR_CONSULTA_IN = 30
+
+@_operacao_db
+def hashes_importacao(cpfs: list[str]) -> dict[str, tuple[int, str]]:
+    """CPF -> (id, hash_importacao) dos já cadastrados; duas leituras ``get_all`` no total.
+
+    Enquanto o cpf_index não está completo (``reconstruir_indice_cpf`` ainda
+    não rodou), os CPFs são buscados por consulta ``in`` em fatias.
+    """
+    if not USE_FIREBASE or not cpfs:
+        return {}
+    cpfs = list(dict.fromkeys(cpfs))
+    campos = ["id", "cpf", "hash_importacao"]
+    try:
+        if _indice_completo():
+            indices = _rpc(lambda op: list(db.get_all([_indice_cpf(cpf) for cpf in cpfs], **op)))
+            ids = [int((doc.to_dict() or {}).get("professor_id") or 0) for doc in indices if doc.exists]
+            refs = [db.collection("professores").document(str(professor_id)) for professor_id in ids if professor_id]
+            if not refs:
+                return {}
+            docs = _rpc(lambda op: list(db.get_all(refs, field_paths=campos, **op)))
+        else:
+            docs = []
+            for inicio in range(0, len(cpfs), CPFS_POR_CONSULTA_IN):
+                fatia = cpfs[inicio:inicio + CPFS_POR_CONSULTA_IN]
+                consulta = db.collection("professores").where("cpf", "in", fatia).select(campos)
+                docs.extend(_rpc(lambda op: list(consulta.stream(**op))))
+        resultado: dict[str, tuple[int, str]] = {}
+        for doc in docs:
+            if doc.exists:
+                dados = doc.to_dict() or {}
+                resultado[str(dados.get("cpf") or "")] = (int(dados.get("id") or doc.id), str(dados.get("hash_importacao") or ""))
+        return resultado
+    except Exception as e:
+        _falha("hashes_importacao", e)
+        return {}
+
+def _nao_encontrado(exc: Exception) -> bool:
+    # google.api_core.exceptions.NotFound, sem importar o pacote aqui
+    return type(exc).__name__ == "NotFound"
+
+def _campos_listagem_rascunho(dados: dict[str, Any]) -> dict[str, Any]:
+    campos: dict[str, Any] = {}
+    if "nome" in dados:
+        campos["nome_referencia"] = (dados.get("nome") or "")[:200]
+    if "cpf" in dados:
+        campos["cpf"] = dados.get("cpf", "")
+    return campos
+
+@_operacao_db
 def save_rascunho(form_data: dict[str, Any], rascunho_id: int | None = None) -> int:
     """Salva ou atualiza um rascunho em Firestore.
 
     Retorna o id numérico do rascunho (int) em caso de sucesso, ou 0 em falha.
+    Rascunhos existentes são atualizados sem leitura prévia; ``criado_em`` só
+    é gravado quando o documento ainda não existe.
     """
     if not USE_FIREBASE:
         return 0
@@ -244,27 +1134,25 @@ def save_rascunho(form_data: dict[str, Any], rascunho_id: int | None = None) ->
         agora = _now_str()
         # prepara documento com metadados e dados aninhados
         dados_payload = dict(form_data)
-        nome_referencia = (dados_payload.get("nome") or "")[:200]
-        cpf_val = dados_payload.get("cpf", "")
+        stored = {
+            "nome_referencia": "",
+            "cpf": "",
+            **_campos_listagem_rascunho(dados_payload),
+            "dados": dados_payload,
+            "atualizado_em": agora,
+        }
 
         if rascunho_id:
-            doc_id = str(int(rascunho_id))
-            doc_ref = db.collection("rascunhos_professores").document(doc_id)
-            existing = doc_ref.get()
-            if existing.exists:
-                existing_data = existing.to_dict() or {}
-                criado_em = existing_data.get("criado_em") or agora
-            else:
-                criado_em = agora
-            stored = {
-                "id": int(rascunho_id),
-                "nome_referencia": nome_referencia,
-                "cpf": cpf_val,
-                "dados": dados_payload,
-                "criado_em": criado_em,
-                "atualizado_em": agora,
-            }
-            doc_ref.set(stored)
+            doc_ref = db.collection("rascunhos_professores").document(str(int(rascunho_id)))
+            try:
+                _rpc(lambda op: doc_ref.update(stored, **op), leitura=False)
+            except Exception as e:
+                if not _nao_encontrado(e):
+                    raise
+                _rpc(
+                    lambda op: doc_ref.set({**stored, "id": int(rascunho_id), "criado_em": agora}, **op),
+                    leitura=False,
+                )
             return int(rascunho_id)
 
         # cria novo id via contador
@@ -272,26 +1160,54 @@ def save_rascunho(form_data: dict[str, Any], rascunho_id: int | None = None) ->
         if not novo_id:
             # fallback: usa timestamp em microsegundos como id se contador falhar
             novo_id = int(time.time() * 1_000_000) % (2**31)
-        doc_id = str(novo_id)
-        stored = {
-            "id": int(novo_id),
-            "nome_referencia": nome_referencia,
-            "cpf": cpf_val,
-            "dados": dados_payload,
-            "criado_em": agora,
-            "atualizado_em": agora,
-        }
-        db.collection("rascunhos_professores").document(doc_id).set(stored)
+        doc_ref = db.collection("rascunhos_professores").document(str(novo_id))
+        _rpc(lambda op: doc_ref.set({**stored, "id": int(novo_id), "criado_em": agora}, **op), leitura=False)
         return int(novo_id)
     except Exception as e:
-        print(f"[save_rascunho] ERRO: {e}")
+        _falha("save_rascunho", e)
+        return 0
+
+@_operacao_db
+def atualizar_campos_rascunho(rascunho_id: int | None, campos: dict[str, Any]) -> int:
+    """Grava apenas os campos alterados de um rascunho (autosave).
+
+    Usa ``update`` com caminhos ``dados.<campo>``, sem ler o documento.
+    Sem ``rascunho_id`` cria o rascunho. Se o documento não existir mais
+    (concluído ou excluído, talvez por outro worker), levanta
+    ``RascunhoNaoEncontrado`` em vez de recriá-lo pela metade.
+    Retorna o id do rascunho, ou 0 em falha.
+    """
+    if not USE_FIREBASE:
+        return 0
+    try:
+        if not rascunho_id:
+            return save_rascunho(campos)
+
+        agora = _now_str()
+        doc_ref = db.collection("rascunhos_professores").document(str(int(rascunho_id)))
+        alteracoes: dict[str, Any] = {f"dados.{campo}": valor for campo, valor in campos.items()}
+        alteracoes.update(_campos_listagem_rascunho(campos))
+        alteracoes["atualizado_em"] = agora
+        try:
+            _rpc(lambda op: doc_ref.update(alteracoes, **op), leitura=False)
+        except Exception as e:
+            if not _nao_encontrado(e):
+                raise
+            raise RascunhoNaoEncontrado(int(rascunho_id)) from e
+        return int(rascunho_id)
+    except RascunhoNaoEncontrado:
+        raise
+    except Exception as e:
+        _falha("atualizar_campos_rascunho", e)
         return 0
 
+@_operacao_db
 def carregar_rascunho(rascunho_id: int) -> dict[str, Any] | None:
     if not USE_FIREBASE:
         return None
     try:
-        doc = db.collection("rascunhos_professores").document(str(int(rascunho_id))).get()
+        doc_ref = db.collection("rascunhos_professores").document(str(int(rascunho_id)))
+        doc = _rpc(lambda op: doc_ref.get(**op))
         if doc.exists:
             data = doc.to_dict() or {}
             try:
@@ -300,35 +1216,85 @@ def carregar_rascunho(rascunho_id: int) -> dict[str, Any] | None:
                 data["id"] = data.get("id")
             return data
     except Exception as e:
-        print(f"[carregar_rascunho] ERRO: {e}")
+        _falha("carregar_rascunho", e)
     return None
 
+@_operacao_db
 def remover_rascunho(rascunho_id: int) -> bool:
     if not USE_FIREBASE:
         return False
     try:
-        db.collection("rascunhos_professores").document(str(int(rascunho_id))).delete()
+        doc_ref = db.collection("rascunhos_professores").document(str(int(rascunho_id)))
+        _rpc(lambda op: doc_ref.delete(**op), leitura=False)
         return True
     except Exception as e:
-        print(f"[remover_rascunho] ERRO: {e}")
+        _falha("remover_rascunho", e)
         return False
 
+@_operacao_db
 def export_professores() -> list[dict[str, Any]]:
     if not USE_FIREBASE:
         return []
     try:
-        docs = db.collection("professores").stream()
-        return [doc.to_dict() for doc in docs]
+        consulta = db.collection("professores")
+        return _rpc(lambda op: [doc.to_dict() for doc in consulta.stream(**op)])
     except Exception as e:
-        print(f"[export_professores] ERRO: {e}")
+        _falha("export_professores", e)
         return []
 
-def get_professores_for_rateio() -> list[tuple[int, str]]:
+CAMPOS_RATEIO = ["id", "nome", "cpf", "escola", "cargo", "situacao_servidor", "quantidade_meses_trabalhados"]
+
+@_operacao_db
+def get_professores_for_rateio() -> list[dict[str, Any]]:
+    """Campos usados no cálculo do rateio, em ordem de id."""
     if not USE_FIREBASE:
         return []
     try:
-        docs = db.collection("professores").stream()
-        return [(doc.get("id"), doc.get("nome", "")) for doc in docs]
+        consulta = db.collection("professores").select(CAMPOS_RATEIO)
+        docs = _rpc(lambda op: list(consulta.stream(**op)))
+        professores = [{campo: (doc.to_dict() or {}).get(campo) for campo in CAMPOS_RATEIO} for doc in docs]
+        return sorted(professores, key=lambda p: int(p.get("id") or 0))
     except Exception as e:
-        print(f"[get_professores_for_rateio] ERRO: {e}")
+        _falha("get_professores_for_rateio", e)
         return []
+
+def _meses_como_numero(valor: Any) -> int:
+    try:
+        return int(valor or 0)
+    except (TypeError, ValueError):
+        return 0
+
+@_operacao_db
+def get_totais_rateio() -> tuple[int, int]:
+    """(quantidade de professores, soma dos meses trabalhados).
+
+    Usa consultas de agregação do Firestore (``count`` e ``sum``), sem baixar
+    os documentos. Se o SDK não tiver ``sum`` (versões antigas), lê apenas o
+    campo de meses de cada documento.
+    """
+    if not USE_FIREBASE:
+        return 0, 0
+    try:
+        colecao = db.collection("professores")
+        consulta = colecao.count(alias="quantidade").sum("quantidade_meses_trabalhados", alias="soma_meses")
+        linhas = _rpc(lambda op: consulta.get(**op))
+        valores = {resultado.alias: resultado.value for linha in linhas for resultado in linha}
+        return int(valores.get("quantidade") or 0), int(valores.get("soma_meses") or 0)
+    except Exception as e:
+        # backend fora do ar: a leitura alternativa também falharia
+        if isinstance(e, CircuitoAberto) or _transitorio(e):
+            _falha("get_totais_rateio", e)
+            return 0, 0
+        logger.warning(
+            "agregação indisponível, lendo campos", exc_info=e, extra={"operacao": "get_totais_rateio"}
+        )
+    try:
+        quantidade = soma = 0
+        consulta = db.collection("professores").select(["quantidade_meses_trabalhados"])
+        for doc in _rpc(lambda op: list(consulta.stream(**op))):
+            quantidade += 1
+            soma += _meses_como_numero((doc.to_dict() or {}).get("quantidade_meses_trabalhados"))
+        return quantidade, soma
+    except Exception as e:
+        _falha("get_totais_rateio", e)
+        return 0, 0
@@ -0,0 +1,116 @@
+"""Arquivos estáticos com impressão digital e variantes pré-comprimidas.
+
+Na inicialização (uma vez no mestre do Gunicorn, com ``preload_app``) cada
+arquivo de ``static/`` é lido, ganha um nome com o hash do conteúdo
+(``style.css`` -> ``style.1a2b3c4d5e6f.css``) e, se for texto, versões gzip
+e brotli guardadas em memória. Como a URL muda sempre que o conteúdo muda, a
+resposta pode ser cacheada para sempre (``Cache-Control: immutable``): visitas
+seguintes não fazem nenhuma requisição pelos estáticos.
+
+Brotli depende do pacote opcional ``brotli``; sem ele só há gzip.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # pacote opcional
+    brotli = None
+
+TAMANHO_HASH = 12
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+_RE_VERSIONADO = re.compile(rf"^(?P<base>.+)\.[0-9a-f]{{{TAMANHO_HASH}}}(?P<extensao>\.[^./]+)?$")
+_TIPOS_COMPRIMIVEIS = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class ArquivoEstatico:
+    __slots__ = ("nome", "nome_versionado", "tipo", "hash", "variantes")
+
+    def __init__(self, nome: str, conteudo: bytes) -> None:
+        self.nome = nome
+        self.hash = hashlib.sha256(conteudo).hexdigest()[:TAMANHO_HASH]
+        caminho = Path(nome)
+        self.nome_versionado = str(caminho.with_name(f"{caminho.stem}.{self.hash}{caminho.suffix}"))
+        self.tipo = mimetypes.guess_type(nome)[0] or "application/octet-stream"
+        # codificação -> corpo; só entram variantes menores que o original
+        self.variantes: dict[str, bytes] = {"identity": conteudo}
+        if self.tipo.startswith(_TIPOS_COMPRIMIVEIS):
+            comprimidos = {"gzip": gzip.compress(conteudo, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                comprimidos["br"] = brotli.compress(conteudo, quality=11)
+            for codificacao, corpo in comprimidos.items():
+                if len(corpo) < len(conteudo):
+                    self.variantes[codificacao] = corpo
+
+
+def codificacoes_aceitas(accept_encoding: str) -> dict[str, float]:
+    """Cabeçalho Accept-Encoding -> {codificação: qualidade}."""
+    aceitas: dict[str, float] = {}
+    for parte in accept_encoding.split(","):
+        codificacao, _, parametros = parte.strip().partition(";")
+        qualidade = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                qualidade = float(parametros[2:])
+            except ValueError:
+                qualidade = 0.0
+        if codificacao:
+            aceitas[codificacao.strip().lower()] = qualidade
+    return aceitas
+
+
+class Estaticos:
+    def __init__(self, diretorio: Path) -> None:
+        self.diretorio = diretorio
+        self._por_nome: dict[str, ArquivoEstatico] = {}
+        self._por_versao: dict[str, ArquivoEstatico] = {}
+
+    def carregar(self) -> "Estaticos":
+        por_nome: dict[str, ArquivoEstatico] = {}
+        if self.diretorio.is_dir():
+            for caminho in sorted(self.diretorio.rglob("*")):
+                if caminho.is_file() and not caminho.name.startswith("."):
+                    nome = caminho.relative_to(self.diretorio).as_posix()
+                    por_nome[nome] = ArquivoEstatico(nome, caminho.read_bytes())
+        self._por_nome = por_nome
+        self._por_versao = {arquivo.nome_versionado: arquivo for arquivo in por_nome.values()}
+        return self
+
+    def nome_versionado(self, nome: str) -> str | None:
+        arquivo = self._por_nome.get(nome)
+        return arquivo.nome_versionado if arquivo else None
+
+    def buscar(self, nome_versionado: str) -> ArquivoEstatico | None:
+        return self._por_versao.get(nome_versionado)
+
+    def nome_original(self, nome_versionado: str) -> str | None:
+        """``style.<hash qualquer>.css`` -> ``style.css``, se o arquivo existir."""
+        encontrado = _RE_VERSIONADO.match(nome_versionado)
+        if not encontrado:
+            return None
+        nome = encontrado["base"] + (encontrado["extensao"] or "")
+        return nome if nome in self._por_nome else None
+
+    @staticmethod
+    def escolher_variante(arquivo: ArquivoEstatico, accept_encoding: str) -> str:
+        """Codificação a enviar: a mais compacta entre as aceitas pelo cliente."""
+        aceitas = codificacoes_aceitas(accept_encoding or "")
+        candidatas = [
+            codificacao for codificacao in arquivo.variantes
+            if codificacao != "identity" and aceitas.get(codificacao, aceitas.get("*", 0.0)) > 0
+        ]
+        if not candidatas:
+            return "identity"
+        return min(candidatas, key=lambda codificacao: len(arquivo.variantes[codificacao]))
+
+    def resumo(self) -> dict[str, dict[str, int]]:
+        return {
+            nome: {codificacao: len(corpo) for codificacao, corpo in arquivo.variantes.items()}
+            for nome, arquivo in self._por_nome.items()
+        }
@@ -0,0 +1,78 @@
+"""Configuração do Gunicorn (Render/Procfile): ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+A aplicação passa quase todo o tempo esperando o Firestore, então cada
+worker atende várias requisições ao mesmo tempo (threads no ``gthread``,
+greenlets no ``gevent``). Com ``preload_app`` o mestre importa a aplicação e
+o SDK do Firebase uma única vez; cada worker recria o cliente Firestore
+depois do fork, porque canais gRPC não sobrevivem a ``fork()``.
+
+Variáveis de ambiente (todas opcionais):
+- ``GUNICORN_WORKER_CLASS``: ``gthread`` (padrão) ou ``gevent`` (exige o
+  pacote ``gevent``; sem ele, volta para ``gthread``).
+- ``GUNICORN_WORKERS``: número de processos (padrão: 2 x CPUs + 1, limitado a
+  ``GUNICORN_MAX_WORKERS``, padrão 4, por causa da memória).
+- ``GUNICORN_THREADS``: threads por worker no ``gthread`` (padrão 8).
+- ``GUNICORN_WORKER_CONNECTIONS``: conexões por worker no ``gevent`` (padrão 200).
+- ``GUNICORN_PRELOAD``: ``0`` desativa o preload.
+"""
+import importlib.util
+import os
+
+
+def _cpus() -> int:
+    try:
+        # respeita o limite de CPUs do contêiner
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _inteiro(nome: str, padrao: int) -> int:
+    try:
+        return int(os.environ.get(nome, "") or padrao)
+    except ValueError:
+        return padrao
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread").strip() or "gthread"
+if worker_class == "gevent" and importlib.util.find_spec("gevent") is None:
+    worker_class = "gthread"
+
+workers = _inteiro(
+    "GUNICORN_WORKERS", min(2 * _cpus() + 1, _inteiro("GUNICORN_MAX_WORKERS", 4))
+)
+threads = _inteiro("GUNICORN_THREADS", 8) if worker_class == "gthread" else 1
+worker_connections = _inteiro("GUNICORN_WORKER_CONNECTIONS", 200)
+
+# No gevent o monkey patching acontece no worker, depois do import pelo mestre;
+# locks e sockets criados no preload ficariam sem patch. Por isso o preload só
+# é ligado por padrão no gthread.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1" if worker_class == "gthread" else "0") == "1"
+
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    if preload_app:
+        import db_layer
+
+        if db_layer.USE_FIREBASE and db_layer.preparar_firebase():
+            server.log.info("Firebase carregado no mestre (preload)")
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        try:
+            import grpc.experimental.gevent as grpc_gevent
+
+            grpc_gevent.init_gevent()
+        except ImportError:
+            pass
+
+    import db_layer
+
+    db_layer.reiniciar_cliente_apos_fork()
@@ -0,0 +1,203 @@
+"""Leitura das planilhas de importação (Excel e CSV) em fluxo.
+
+Os leitores devolvem ``(número da linha, payload)`` uma linha por vez, já
+com os cabeçalhos traduzidos por ``mapear_cabecalhos`` e sem as linhas sem
+nome; quem importa consome em lotes (``em_lotes``), então a memória fica
+limitada pelo tamanho do lote e não pelo tamanho do arquivo.
+
+No CSV, o delimitador (``;``, ``,``, tabulação ou ``|``) é detectado no
+cabeçalho. A codificação (UTF-8, com ou sem BOM, ou Windows-1252/Latin-1,
+comum nos sistemas de RH) sai de ``analisar_arquivo``, que lê o arquivo
+inteiro: um dump de RH pode ter milhares de linhas só em ASCII antes do
+primeiro acento.
+
+``analisar_arquivo`` também calcula o hash que identifica o upload, para que
+o mesmo arquivo não seja importado duas vezes.
+
+``preparar_em_processos`` distribui a validação dos lotes (CPU pura) entre
+processos, para arquivos grandes.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import hashlib
+import io
+from collections import deque
+from concurrent.futures import Executor, Future
+from itertools import islice
+from typing import IO, Any, Callable, Iterable, Iterator, NamedTuple
+
+from validacao import linha_para_payload, mapear_cabecalhos, preparar_lote_importacao
+
+TAMANHO_AMOSTRA = 64 * 1024
+DELIMITADORES = (";", ",", "\t", "|")
+EXTENSOES_EXCEL = (".xlsx", ".xls")
+EXTENSOES_CSV = (".csv", ".txt")
+# bytes sem caractere no Windows-1252 (em Latin-1 são caracteres de controle)
+_INDEFINIDOS_CP1252 = b"\x81\x8d\x8f\x90\x9d"
+
+
+def em_lotes(iteravel: Iterable[Any], tamanho: int) -> Iterator[list[Any]]:
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+
+Lote = list[tuple[int, dict[str, str]]]
+Preparados = list[tuple[str, dict[str, Any] | None, str | None]]
+
+
+def preparar_em_processos(
+    lotes: Iterable[Lote],
+    obter_executor: Callable[[], Executor | None],
+    linhas_seriais: int,
+    janela: int,
+) -> Iterator[tuple[Lote, Preparados | None]]:
+    """Devolve cada lote, na ordem, com ``preparar_lote_importacao`` já aplicado.
+
+    As primeiras ``linhas_seriais`` linhas saem com ``None`` (quem chama valida
+    na própria thread): uploads pequenos nem chegam a criar o pool. Depois
+    disso, até ``janela`` lotes ficam em validação nos processos enquanto
+    quem chama grava os anteriores; só esses lotes ficam em memória.
+    ``obter_executor`` é chamado uma vez, na primeira linha além do limite;
+    se devolver None, tudo segue em série.
+    """
+    iterador = iter(lotes)
+    lidas = 0
+    for lote in iterador:
+        yield lote, None
+        lidas += len(lote)
+        if lidas >= linhas_seriais:
+            break
+
+    executor = obter_executor() if lidas >= linhas_seriais else None
+    if executor is None:
+        for lote in iterador:
+            yield lote, None
+        return
+
+    em_andamento: deque[tuple[Lote, Future]] = deque()
+    try:
+        for lote in iterador:
+            em_andamento.append((lote, executor.submit(preparar_lote_importacao, [bruto for _, bruto in lote])))
+            if len(em_andamento) >= janela:
+                lote, futuro = em_andamento.popleft()
+                yield lote, futuro.result()
+        while em_andamento:
+            lote, futuro = em_andamento.popleft()
+            yield lote, futuro.result()
+    finally:
+        # importação interrompida: não deixa lotes na fila do pool
+        for _, futuro in em_andamento:
+            futuro.cancel()
+
+
+def _payloads(campos: list[str | None], linhas: Iterable[Iterable[Any]], primeira: int) -> Iterator[tuple[int, dict[str, str]]]:
+    for numero, valores in enumerate(linhas, start=primeira):
+        payload = linha_para_payload(campos, valores)
+        # pular linhas vazias
+        if payload.get("nome"):
+            yield numero, payload
+
+
+class AnaliseArquivo(NamedTuple):
+    hash: str
+    # codificação do arquivo inteiro, se for texto (ver linhas_csv)
+    codificacao: str
+
+
+def analisar_arquivo(fluxo: IO[bytes], tamanho_bloco: int = 1024 * 1024) -> AnaliseArquivo:
+    """SHA-256 e codificação do upload, numa única leitura em blocos; o fluxo volta ao início."""
+    resumo = hashlib.sha256()
+    decodificador = codecs.getincrementaldecoder("utf-8")()
+    utf8 = cp1252 = True
+    inicio = b""
+    while bloco := fluxo.read(tamanho_bloco):
+        resumo.update(bloco)
+        inicio = inicio or bloco[:len(codecs.BOM_UTF8)]
+        if utf8:
+            try:
+                decodificador.decode(bloco)
+            except UnicodeDecodeError:
+                utf8 = False
+        if cp1252 and any(byte in bloco for byte in _INDEFINIDOS_CP1252):
+            cp1252 = False
+    fluxo.seek(0)
+    if utf8:
+        try:
+            decodificador.decode(b"", final=True)
+        except UnicodeDecodeError:
+            utf8 = False
+
+    if utf8:
+        codificacao = "utf-8-sig" if inicio.startswith(codecs.BOM_UTF8) else "utf-8"
+    else:
+        codificacao = "cp1252" if cp1252 else "latin-1"
+    return AnaliseArquivo(resumo.hexdigest(), codificacao)
+
+
+def linhas_excel(arquivo: IO[bytes]) -> Iterator[tuple[int, dict[str, str]]]:
+    """Linhas da aba ativa; a planilha é lida em modo somente leitura (em fluxo)."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        if sheet is None:
+            raise ValueError("Arquivo Excel vazio.")
+        linhas = sheet.iter_rows(values_only=True)
+        cabecalhos = next(linhas, None)
+        if not cabecalhos or not any(cabecalhos):
+            raise ValueError("Arquivo não contém cabeçalhos.")
+        yield from _payloads(mapear_cabecalhos(cabecalhos), linhas, 2)
+    finally:
+        workbook.close()
+
+
+def detectar_codificacao(amostra: bytes) -> str:
+    """Palpite pela amostra, para quando o arquivo não passou por ``analisar_arquivo``."""
+    if amostra.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False: a amostra pode cortar um caractere de vários bytes no fim
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        amostra.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def detectar_delimitador(cabecalho: str) -> str:
+    """O delimitador mais frequente na linha de cabeçalho (``;`` no empate)."""
+    contagens = {delimitador: cabecalho.count(delimitador) for delimitador in DELIMITADORES}
+    melhor = max(DELIMITADORES, key=lambda d: contagens[d])
+    return melhor if contagens[melhor] else ";"
+
+
+def linhas_csv(fluxo: IO[bytes], codificacao: str | None = None) -> Iterator[tuple[int, dict[str, str]]]:
+    """Linhas de um CSV lido em fluxo (o upload nunca é carregado inteiro).
+
+    ``codificacao`` deve vir de ``analisar_arquivo``; sem ela, é estimada
+    pela amostra do início. ``fluxo`` precisa permitir ``seek(0)`` para
+    voltar ao início depois da amostra (o upload do Flask é um arquivo
+    temporário, então permite).
+    """
+    amostra = fluxo.read(TAMANHO_AMOSTRA)
+    fluxo.seek(0)
+    codificacao = codificacao or detectar_codificacao(amostra)
+    texto = io.TextIOWrapper(fluxo, encoding=codificacao, newline="")
+    try:
+        cabecalho = next(iter(amostra.decode(codificacao, errors="ignore").splitlines()), "")
+        leitor = csv.reader(texto, delimiter=detectar_delimitador(cabecalho))
+        cabecalhos = next(leitor, None)
+        if not cabecalhos or not any(c.strip() for c in cabecalhos):
+            raise ValueError("Arquivo não contém cabeçalhos.")
+        yield from _payloads(mapear_cabecalhos(cabecalhos), leitor, 2)
+    finally:
+        # não fecha o upload junto com o wrapper
+        texto.detach()
@@ -0,0 +1,107 @@
+"""Logs estruturados: uma linha JSON por evento, escrita fora da requisição.
+
+Os loggers da aplicação (``fundef.*``) só enfileiram o registro; uma thread
+do próprio processo formata e grava em stderr. Assim uma escrita lenta no
+stdout/stderr não segura a thread que atende a requisição. Se a fila
+encher, novos registros são descartados (e contados) em vez de bloquear.
+
+A thread é criada no primeiro log de cada processo, o que mantém o esquema
+válido depois do fork dos workers do Gunicorn (``preload_app``).
+
+Variáveis de ambiente: ``LOG_NIVEL`` (padrão ``INFO``).
+"""
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOGGER_RAIZ = "fundef"
+CAMPOS_EXTRAS = ("operacao", "duracao_ms", "documentos", "backend", "erro", "rascunho_id")
+
+
+class FormatadorJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for campo in CAMPOS_EXTRAS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                dados[campo] = valor
+        if record.exc_text:
+            dados["excecao"] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    def __init__(self, destino: logging.Handler, capacidade: int = 10_000) -> None:
+        super().__init__(queue.Queue(capacidade))
+        self.destino = destino
+        self.descartados = 0
+        self._pid: int | None = None
+        self._ouvinte: logging.handlers.QueueListener | None = None
+        self._lock = threading.Lock()
+
+    def _garantir_ouvinte(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            # após um fork a thread do processo pai não existe aqui
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._ouvinte = logging.handlers.QueueListener(
+                self.queue, self.destino, respect_handler_level=True
+            )
+            self._ouvinte.start()
+            self._pid = pid
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # mensagem e traceback viram texto aqui; os campos extras são preservados
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._garantir_ouvinte()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def parar(self) -> None:
+        if self._ouvinte is not None and self._pid == os.getpid():
+            self._ouvinte.stop()
+
+
+_handler: HandlerFila | None = None
+
+
+def configurar_logs(nivel: str | None = None) -> logging.Logger:
+    """Instala o handler com fila no logger ``fundef`` (idempotente)."""
+    global _handler
+    raiz = logging.getLogger(LOGGER_RAIZ)
+    raiz.setLevel((nivel or os.environ.get("LOG_NIVEL", "INFO")).upper())
+    if _handler is None:
+        destino = logging.StreamHandler(sys.stderr)
+        destino.setFormatter(FormatadorJSON())
+        _handler = HandlerFila(destino)
+        raiz.addHandler(_handler)
+        raiz.propagate = False
+        atexit.register(_handler.parar)
+    return raiz
@@ -0,0 +1,138 @@
+"""Perfilamento sob demanda de uma única requisição (cProfile).
+
+``MiddlewarePerfil`` envolve a aplicação WSGI. Quando a requisição traz o
+cabeçalho ``X-Perfil`` com o segredo configurado, ela roda sob cProfile e
+o resultado vai para o diretório de perfis:
+
+- ``<carimbo>-<endpoint>.prof``: estatísticas no formato do ``pstats``
+  (abra com ``python -m pstats`` ou snakeviz);
+- ``<carimbo>-<endpoint>.json``: rota, endpoint, status, duração, chamadas
+  à camada de dados e as funções mais caras.
+
+O nome dos arquivos volta no cabeçalho de resposta ``X-Perfil-Arquivo``.
+A cada gravação, perfis com mais de ``ttl_horas`` são apagados e só os
+``max_perfis`` mais recentes ficam no diretório.
+Requisições sem o cabeçalho passam direto. Só a thread da requisição é
+perfilada; consultas disparadas em paralelo (``em_paralelo``) aparecem como
+espera, mas entram na contagem de chamadas.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import pstats
+import re
+import secrets
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+CABECALHO_ENVIRON = "HTTP_X_PERFIL"
+FUNCOES_NO_RESUMO = 30
+EXTENSOES_PERFIL = (".prof", ".json")
+
+
+class MiddlewarePerfil:
+    def __init__(
+        self,
+        aplicacao_wsgi: Callable,
+        segredo: str,
+        diretorio: Callable[[], Path],
+        resolver_endpoint: Callable[[dict[str, Any]], str],
+        iniciar_contagem: Callable[[], Any],
+        encerrar_contagem: Callable[[Any], dict[str, int]],
+        max_perfis: int = 200,
+        ttl_horas: float = 24,
+    ) -> None:
+        self.aplicacao_wsgi = aplicacao_wsgi
+        self.segredo = segredo
+        self.diretorio = diretorio
+        self.resolver_endpoint = resolver_endpoint
+        self.iniciar_contagem = iniciar_contagem
+        self.encerrar_contagem = encerrar_contagem
+        self.max_perfis = max_perfis
+        self.ttl_horas = ttl_horas
+
+    def __call__(self, environ: dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        valor = environ.get(CABECALHO_ENVIRON)
+        if not valor or not secrets.compare_digest(valor.encode(), self.segredo.encode()):
+            return self.aplicacao_wsgi(environ, start_response)
+        return self._perfilar(environ, start_response)
+
+    def _perfilar(self, environ: dict[str, Any], start_response: Callable) -> list[bytes]:
+        endpoint = self.resolver_endpoint(environ)
+        base = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{re.sub(r'[^0-9A-Za-z_.-]', '_', endpoint)}"
+        resposta: dict[str, Any] = {}
+
+        def capturar_inicio(status, cabecalhos, exc_info=None):
+            resposta["status"] = status
+            resposta["cabecalhos"] = list(cabecalhos)
+            resposta["exc_info"] = exc_info
+            return lambda dados: corpo.append(dados)
+
+        corpo: list[bytes] = []
+        token = self.iniciar_contagem()
+        perfilador = cProfile.Profile()
+        inicio = time.perf_counter()
+        perfilador.enable()
+        try:
+            iteravel = self.aplicacao_wsgi(environ, capturar_inicio)
+            try:
+                # o corpo é consumido aqui para que respostas em streaming entrem no perfil
+                corpo.extend(iteravel)
+            finally:
+                if hasattr(iteravel, "close"):
+                    iteravel.close()
+        finally:
+            perfilador.disable()
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            chamadas = self.encerrar_contagem(token)
+
+        self._gravar(base, perfilador, {
+            "endpoint": endpoint,
+            "metodo": environ.get("REQUEST_METHOD"),
+            "caminho": environ.get("PATH_INFO"),
+            "consulta": environ.get("QUERY_STRING", ""),
+            "status": resposta.get("status"),
+            "duracao_ms": round(duracao_ms, 2),
+            "bytes_resposta": sum(len(parte) for parte in corpo),
+            "chamadas_db": chamadas,
+        })
+        cabecalhos = resposta.get("cabecalhos", []) + [("X-Perfil-Arquivo", base)]
+        start_response(resposta.get("status", "500 INTERNAL SERVER ERROR"), cabecalhos, resposta.get("exc_info"))
+        return corpo
+
+    def _gravar(self, base: str, perfilador: cProfile.Profile, metadados: dict[str, Any]) -> None:
+        diretorio = self.diretorio()
+        diretorio.mkdir(parents=True, exist_ok=True)
+        perfilador.dump_stats(str(diretorio / f"{base}.prof"))
+
+        texto = io.StringIO()
+        estatisticas = pstats.Stats(perfilador, stream=texto)
+        estatisticas.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(FUNCOES_NO_RESUMO)
+        metadados["resumo"] = texto.getvalue().splitlines()
+        (diretorio / f"{base}.json").write_text(
+            json.dumps(metadados, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        self._podar(diretorio)
+
+    def _podar(self, diretorio: Path) -> None:
+        # o carimbo no início do nome faz a ordem alfabética ser a cronológica
+        arquivos = sorted(
+            (arquivo for arquivo in diretorio.iterdir() if arquivo.suffix in EXTENSOES_PERFIL),
+            key=lambda arquivo: arquivo.name,
+            reverse=True,
+        )
+        limite = time.time() - self.ttl_horas * 3600
+        mantidos: set[str] = set()
+        for arquivo in arquivos:
+            try:
+                if arquivo.stem not in mantidos:
+                    if len(mantidos) >= self.max_perfis or arquivo.stat().st_mtime < limite:
+                        arquivo.unlink()
+                        continue
+                    mantidos.add(arquivo.stem)
+            except OSError:
+                pass
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""Remove rascunhos abandonados (sem atualização há mais de N dias).
+
+Uso:
+  python scripts/expirar_rascunhos.py              # usa RASCUNHO_TTL_DIAS (padrão 90)
+  python scripts/expirar_rascunhos.py --dias 30 --lote 200
+
+Funciona com Firestore (USE_FIREBASE=1) ou SQLite (USE_FIREBASE=0), com as
+mesmas variáveis de ambiente da aplicação. Pode ser agendado (cron, Render
+Cron Job) para rodar diariamente.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import app  # noqa: E402
+
+parser = argparse.ArgumentParser(description="Remove rascunhos abandonados.")
+parser.add_argument("--dias", type=int, default=None, help="TTL em dias (padrão: RASCUNHO_TTL_DIAS)")
+parser.add_argument("--lote", type=int, default=400, help="exclusões por batch/transação")
+args = parser.parse_args()
+
+ttl = app.RASCUNHO_TTL_DIAS if args.dias is None else args.dias
+removidos = app.expirar_rascunhos(ttl, lote=args.lote)
+print(f"Rascunhos sem atualização há mais de {ttl} dias removidos: {removidos}")
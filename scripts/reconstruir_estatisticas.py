@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""Recalcula os contadores do painel a partir da coleção/tabela professores.
+
+Uso:
+  python scripts/reconstruir_estatisticas.py
+
+Os contadores são mantidos a cada inclusão, edição e exclusão; este comando
+corrige desvios (edições feitas fora da aplicação, falhas parciais). Funciona
+com Firestore (USE_FIREBASE=1) ou SQLite (USE_FIREBASE=0).
+"""
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import app  # noqa: E402
+
+app.reconstruir_estatisticas()
+print(json.dumps(app.resumo_estatisticas(), ensure_ascii=False, indent=2))
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Cria no Firestore as entradas de cpf_index dos cadastros que não têm.
+
+Uso:
+  USE_FIREBASE=1 python scripts/reconstruir_indice_cpf.py
+
+Rode uma vez após a implantação do índice de CPF: cadastros gravados antes
+dele não têm entrada, e até o fim deste comando cada gravação ainda consulta
+a coleção para não aceitar o CPF deles de novo. Ao terminar, o índice é
+marcado como completo (_meta/cpf_index) e a consulta deixa de ser feita.
+Pode ser repetido sem efeito colateral. CPFs que já aparecem em
+mais de um cadastro são listados em ``repetidos``. No SQLite a unicidade
+vem da restrição UNIQUE da tabela e o comando não faz nada.
+"""
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from db_layer import reconstruir_indice_cpf  # noqa: E402
+
+print(json.dumps(reconstruir_indice_cpf(), ensure_ascii=False, indent=2))
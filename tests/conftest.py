@@ -0,0 +1,12 @@
+"""Os testes rodam contra um SQLite novo, num DATA_DIR temporário."""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# antes de qualquer ``import app``: a configuração é lida na importação
+os.environ["USE_FIREBASE"] = "0"
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="testes-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
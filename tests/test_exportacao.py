@@ -0,0 +1,20 @@
+"""Exportação CSV com documentos que trazem campos fora de EXPORT_COLUMNS."""
+from __future__ import annotations
+
+import csv
+
+import app as aplicacao
+
+
+def test_csv_segue_o_cabecalho_mesmo_com_campos_extras(tmp_path, monkeypatch):
+    # no Firestore o documento vem inteiro, em ordem qualquer e com campos internos
+    registro = {coluna: f"valor-{coluna}" for coluna in reversed(aplicacao.EXPORT_COLUMNS)}
+    registro.update(hash_importacao="abc123", atualizado_em="2024-01-01T00:00:00")
+    monkeypatch.setattr(aplicacao, "exportar_professores", lambda: [registro])
+
+    destino = tmp_path / "cadastros.csv"
+    aplicacao._gerar_csv(destino)
+    with open(destino, newline="", encoding="utf-8") as arquivo:
+        cabecalho, linha = list(csv.reader(arquivo))
+    assert cabecalho == aplicacao.EXPORT_COLUMNS
+    assert linha == [f"valor-{coluna}" for coluna in aplicacao.EXPORT_COLUMNS]
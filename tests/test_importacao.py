@@ -0,0 +1,120 @@
+"""Importação de planilhas contra um SQLite temporário."""
+from __future__ import annotations
+
+import io
+import random
+
+import pytest
+
+import app as aplicacao
+import importacao
+from benchmarks.sinteticos import gerar_cpf
+
+CPF = "52998224725"
+
+
+@pytest.fixture
+def cliente():
+    with aplicacao.get_connection() as conn:
+        conn.execute("DELETE FROM professores")
+        conn.execute("DELETE FROM importacoes")
+    aplicacao.marcar_registro_alterado()
+    return aplicacao.app.test_client()
+
+
+def _enviar(cliente, conteudo: str, **campos: str):
+    dados = {"file": (io.BytesIO(conteudo.encode("utf-8")), "professores.csv"), **campos}
+    return cliente.post("/importar-excel", data=dados, content_type="multipart/form-data")
+
+
+def _professor() -> dict[str, object]:
+    (professor,) = aplicacao.listar_professores()
+    return professor
+
+
+def test_atualizacao_importada_preserva_colunas_ausentes(cliente):
+    _enviar(
+        cliente,
+        "nome;cpf;escola;cargo;telefone;situacao_servidor\n"
+        f"Maria da Silva;{CPF};Escola;Professora;(11) 99999-8888;Aposentado\n",
+    )
+    assert _professor()["telefone"] == "11999998888"
+
+    _enviar(
+        cliente,
+        f"nome;cpf;escola;cargo\nMaria da Silva;{CPF};Escola;Coordenadora\n",
+        atualizar_alterados="on",
+    )
+    professor = _professor()
+    assert professor["cargo"] == "Coordenadora"
+    assert professor["telefone"] == "11999998888"
+    assert professor["situacao_servidor"] == "Aposentado"
+
+
+def test_mesmo_arquivo_volta_em_outro_modo_ou_com_reimportar(cliente):
+    conteudo = f"nome;cpf;escola;cargo\nMaria da Silva;{CPF};Escola;Professora\n"
+    _enviar(cliente, conteudo)
+    with aplicacao.get_connection() as conn:
+        conn.execute("DELETE FROM professores")
+    aplicacao.marcar_registro_alterado()
+
+    resposta = _enviar(cliente, conteudo)
+    assert "já foi importado" in resposta.get_data(as_text=True)
+    assert aplicacao.listar_professores() == []
+
+    _enviar(cliente, conteudo, reimportar="on")
+    assert _professor()["cargo"] == "Professora"
+
+    resposta = _enviar(cliente, conteudo, atualizar_alterados="on")
+    assert "já foi importado" not in resposta.get_data(as_text=True)
+
+
+def test_csv_cp1252_com_acentos_depois_da_amostra(cliente):
+    rng = random.Random(47)
+    linhas = [f"Professor {i};{gerar_cpf(rng)};Escola;Professor" for i in range(3000)]
+    linhas.append(f"João Conceição;{CPF};Escola;Professor")
+    conteudo = ("nome;cpf;escola;cargo\n" + "\n".join(linhas) + "\n").encode("cp1252")
+    assert len(conteudo) > importacao.TAMANHO_AMOSTRA
+    assert importacao.analisar_arquivo(io.BytesIO(conteudo)).codificacao == "cp1252"
+
+    dados = {"file": (io.BytesIO(conteudo), "rh.csv")}
+    cliente.post("/importar-excel", data=dados, content_type="multipart/form-data")
+    nomes = {professor["nome"] for professor in aplicacao.listar_professores()}
+    assert len(nomes) == 3001
+    assert "João Conceição" in nomes
+
+
+def test_falha_depois_de_lotes_gravados_informa_o_que_foi_gravado(cliente, monkeypatch):
+    monkeypatch.setattr(aplicacao, "IMPORTACAO_LOTE", 1)
+
+    def linhas_com_falha(_fluxo):
+        yield 2, {"nome": "Maria da Silva", "cpf": CPF, "escola": "Escola", "cargo": "Professora"}
+        raise ValueError("linha ilegível")
+
+    monkeypatch.setattr(aplicacao, "_leitor_da_planilha", lambda *_: linhas_com_falha)
+    resposta = _enviar(cliente, "nome\n")
+    texto = resposta.get_data(as_text=True)
+    assert "depois de 1 linhas" in texto
+    assert "1 cadastros foram inseridos" in texto
+
+
+def test_linha_recusada_nao_torna_cpf_repetido(cliente):
+    _enviar(
+        cliente,
+        "nome;cpf;escola;cargo\n"
+        f"Maria da Silva;{CPF};Escola;\n"
+        f"Maria da Silva;{CPF};Escola;Professora\n",
+    )
+    assert _professor()["nome"] == "Maria da Silva"
+
+
+def test_cpf_repetido_entre_linhas_validas(cliente):
+    resposta = _enviar(
+        cliente,
+        "nome;cpf;escola;cargo\n"
+        f"Maria da Silva;{CPF};Escola;Professora\n"
+        f"Maria Souza;{CPF};Escola;Professora\n",
+    )
+    aviso = cliente.get("/").get_data(as_text=True) + resposta.get_data(as_text=True)
+    assert _professor()["nome"] == "Maria da Silva"
+    assert "já informado na linha 2" in aviso
@@ -0,0 +1,47 @@
+"""Rotação dos arquivos de perfil."""
+from __future__ import annotations
+
+import os
+import time
+
+from perfil import MiddlewarePerfil
+
+
+def _aplicacao(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"ok"]
+
+
+def _middleware(pasta, **limites) -> MiddlewarePerfil:
+    return MiddlewarePerfil(
+        _aplicacao,
+        segredo="segredo",
+        diretorio=lambda: pasta,
+        resolver_endpoint=lambda environ: "index",
+        iniciar_contagem=lambda: None,
+        encerrar_contagem=lambda token: {},
+        **limites,
+    )
+
+
+def _perfilar(middleware: MiddlewarePerfil) -> None:
+    environ = {"HTTP_X_PERFIL": "segredo", "REQUEST_METHOD": "GET", "PATH_INFO": "/"}
+    middleware(environ, lambda status, cabecalhos, exc_info=None: None)
+
+
+def test_mantem_so_os_perfis_mais_recentes(tmp_path):
+    middleware = _middleware(tmp_path, max_perfis=3)
+    for _ in range(5):
+        _perfilar(middleware)
+    assert len(list(tmp_path.glob("*.prof"))) == 3
+    assert len(list(tmp_path.glob("*.json"))) == 3
+
+
+def test_apaga_perfis_antigos(tmp_path):
+    antigo = tmp_path / "20000101-000000-000000-index.prof"
+    antigo.write_bytes(b"")
+    dois_dias = time.time() - 48 * 3600
+    os.utime(antigo, (dois_dias, dois_dias))
+    _perfilar(_middleware(tmp_path, ttl_horas=24))
+    assert not antigo.exists()
+    assert len(list(tmp_path.glob("*.prof"))) == 1
@@ -0,0 +1,34 @@
+"""Autosave de rascunhos."""
+from __future__ import annotations
+
+import pytest
+
+import app as aplicacao
+
+
+@pytest.fixture
+def cliente():
+    return aplicacao.app.test_client()
+
+
+def _autosave(cliente, rascunho_id, **campos: str):
+    return cliente.post("/rascunho/autosave", json={"rascunho_id": rascunho_id, "campos": campos})
+
+
+def test_autosave_atrasado_nao_recria_rascunho_removido(cliente):
+    rascunho_id = _autosave(cliente, None, nome="Maria").get_json()["rascunho_id"]
+    aplicacao.remover_rascunho(rascunho_id)
+
+    resposta = _autosave(cliente, rascunho_id, nome="Maria da Silva")
+    assert resposta.status_code == 410
+    assert aplicacao.carregar_rascunho_cadastro(rascunho_id) is None
+
+
+def test_autosave_poda_rascunhos_fora_da_janela():
+    gravados = []
+    autosave = aplicacao.AutosaveRascunhos(lambda rascunho_id, campos: gravados.append(rascunho_id), 0)
+    for rascunho_id in range(1, 1001):
+        autosave.agendar(rascunho_id, {"nome": "x"})
+    assert len(gravados) == 1000
+    assert len(autosave._ultima_gravacao) < 300
+    assert len(autosave._locks_gravacao) < 300
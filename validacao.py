@@ -0,0 +1,436 @@
+"""Validação e normalização dos dados de cadastro.
+
+Tudo aqui é montado uma única vez na importação do módulo (expressões
+regulares, tabelas de campos, pesos dos dígitos do CPF) e não depende de
+Flask nem da camada de dados, para poder ser usado tanto pelas rotas quanto
+por scripts e benchmarks.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from datetime import date
+from operator import mul
+from typing import Any, Iterable, NamedTuple, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional: sem ele o lote usa a validação escalar
+    np = None
+
+FUNDEF_DATA_INICIAL = date(1997, 1, 1)
+FUNDEF_DATA_FINAL = date(2006, 12, 31)
+CARGA_HORARIA_SEMANAL_FIXA = 20
+ESCOLA_OPCOES = {
+    "escola": "Escola",
+    "seduc": "Seduc",
+}
+SITUACAO_SERVIDOR_OPCOES = {
+    "ativo": "Ativo",
+    "aposentado": "Aposentado",
+    "falecido": "Falecido",
+    "sem vínculo": "Sem vínculo",
+    "sem vinculo": "Sem vínculo",
+}
+
+CAMPOS_OBRIGATORIOS = (
+    ("nome", "Nome completo"),
+    ("cpf", "CPF"),
+    ("escola", "Local de Trabalho"),
+    ("cargo", "Cargo"),
+    ("situacao_servidor", "Situação do servidor"),
+    ("data_admissao", "Data de admissão"),
+    ("endereco", "Endereço"),
+    ("banco", "Banco"),
+    ("agencia", "Agência"),
+    ("conta", "Conta"),
+    ("tipo_conta", "Tipo de conta"),
+    ("data_inicio_fundef", "Data inicial FUNDEF"),
+    ("data_fim_fundef", "Data final FUNDEF"),
+    ("carga_horaria", "Carga horária"),
+)
+CAMPOS_OBRIGATORIOS_IMPORTACAO = ("nome", "cpf", "escola", "cargo")
+# Campos que podem ser corrigidos de uma vez em vários cadastros (nunca os
+# que identificam a pessoa, como nome e CPF).
+CAMPOS_EDICAO_EM_LOTE = {
+    "escola": "Local de Trabalho",
+    "cargo": "Cargo",
+    "situacao_servidor": "Situação do servidor",
+}
+
+# Cabeçalho da planilha (já em minúsculas e sem espaços nas pontas) -> campo.
+ALIASES_COLUNAS_IMPORTACAO = {
+    "nome": "nome",
+    "nome_completo": "nome",
+    "cpf": "cpf",
+    "rg": "rg",
+    "matricula": "matricula",
+    "escola": "escola",
+    "local de trabalho": "escola",
+    "cargo": "cargo",
+    "situacao_servidor": "situacao_servidor",
+    "situação do servidor": "situacao_servidor",
+    "data_admissao": "data_admissao",
+    "data de admissão": "data_admissao",
+    "telefone": "telefone",
+    "email": "email",
+    "e-mail": "email",
+    "endereco": "endereco",
+    "endereço": "endereco",
+    "banco": "banco",
+    "agencia": "agencia",
+    "agência": "agencia",
+    "conta": "conta",
+    "tipo_conta": "tipo_conta",
+    "tipo de conta": "tipo_conta",
+    "data_inicio_fundef": "data_inicio_fundef",
+    "data inicial do fundef": "data_inicio_fundef",
+    "data_fim_fundef": "data_fim_fundef",
+    "data final do fundef": "data_fim_fundef",
+    "carga_horaria": "carga_horaria",
+    "quantidade_meses_trabalhados": "quantidade_meses_trabalhados",
+    "aceitou_declaracao": "aceitou_declaracao",
+}
+
+_RE_NAO_DIGITOS = re.compile(r"[^0-9]")
+_RE_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_RE_DATA_ISO = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+_PESOS_DV1 = tuple(range(10, 1, -1))
+_PESOS_DV2 = tuple(range(11, 1, -1))
+_ESCOLAS_VALIDAS = frozenset(ESCOLA_OPCOES.values())
+_SITUACOES_VALIDAS = frozenset(SITUACAO_SERVIDOR_OPCOES.values())
+
+
+def only_digits(value: str) -> str:
+    if not value:
+        return ""
+    if value.isascii() and value.isdigit():
+        return value
+    return _RE_NAO_DIGITOS.sub("", value)
+
+
+def cpf_valido(cpf: str) -> bool:
+    cpf = only_digits(cpf)
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+
+    digitos = [ord(c) - 48 for c in cpf]
+    digito_1 = (sum(map(mul, digitos, _PESOS_DV1)) * 10 % 11) % 10
+    if digito_1 != digitos[9]:
+        return False
+    digito_2 = (sum(map(mul, digitos, _PESOS_DV2)) * 10 % 11) % 10
+    return digito_2 == digitos[10]
+
+
+def calcular_meses_trabalhados(data_inicio: date, data_fim: date) -> int:
+    return (data_fim.year - data_inicio.year) * 12 + (data_fim.month - data_inicio.month) + 1
+
+
+def normalizar_escola(value: str) -> str:
+    texto = (value or "").strip()
+    return ESCOLA_OPCOES.get(texto.lower(), texto)
+
+
+def normalizar_situacao_servidor(value: str) -> str:
+    texto = (value or "").strip()
+    return SITUACAO_SERVIDOR_OPCOES.get(texto.lower(), texto)
+
+
+def _parse_data_iso(texto: str) -> date:
+    """Equivalente a ``datetime.strptime(texto, "%Y-%m-%d").date()``."""
+    encontrado = _RE_DATA_ISO.fullmatch(texto or "")
+    if not encontrado:
+        raise ValueError(f"data inválida: {texto!r}")
+    ano, mes, dia = encontrado.groups()
+    return date(int(ano), int(mes), int(dia))
+
+
+def validar_dados(form: dict[str, str]) -> tuple[list[str], int | None]:
+    erros: list[str] = []
+    meses_calculados: int | None = None
+
+    for campo, nome_legivel in CAMPOS_OBRIGATORIOS:
+        if not form.get(campo, "").strip():
+            erros.append(f"{nome_legivel} é obrigatório.")
+
+    cpf = form.get("cpf", "")
+    if cpf and not cpf_valido(cpf):
+        erros.append("CPF inválido.")
+
+    escola = normalizar_escola(form.get("escola", ""))
+    if escola and escola not in _ESCOLAS_VALIDAS:
+        erros.append('O campo Local de Trabalho deve ser "Escola" ou "Seduc".')
+
+    situacao_servidor = normalizar_situacao_servidor(form.get("situacao_servidor", ""))
+    if situacao_servidor and situacao_servidor not in _SITUACOES_VALIDAS:
+        erros.append(
+            'A situação do servidor deve ser "Ativo", "Aposentado", "Falecido" ou "Sem vínculo".'
+        )
+
+    telefone = only_digits(form.get("telefone", ""))
+    if telefone and len(telefone) not in (10, 11):
+        erros.append("Telefone deve ter 10 ou 11 dígitos.")
+
+    email = form.get("email", "").strip()
+    if email and not _RE_EMAIL.match(email):
+        erros.append("E-mail inválido.")
+
+    try:
+        data_inicio_dt = _parse_data_iso(form.get("data_inicio_fundef", ""))
+        data_fim_dt = _parse_data_iso(form.get("data_fim_fundef", ""))
+        if data_inicio_dt > data_fim_dt:
+            erros.append("A data inicial do FUNDEF não pode ser maior que a data final.")
+        else:
+            if data_inicio_dt < FUNDEF_DATA_INICIAL or data_fim_dt > FUNDEF_DATA_FINAL:
+                erros.append(
+                    "As datas do FUNDEF devem estar entre 01/01/1997 e 31/12/2006 "
+                    "(período de vigência)."
+                )
+            else:
+                meses_calculados = calcular_meses_trabalhados(data_inicio_dt, data_fim_dt)
+                if meses_calculados < 1 or meses_calculados > 120:
+                    erros.append(
+                        "O período informado deve resultar em quantidade de meses entre 1 e 120."
+                    )
+    except ValueError:
+        erros.append("As datas do FUNDEF devem estar em formato válido.")
+
+    try:
+        carga = int(form.get("carga_horaria", "0"))
+        if carga != CARGA_HORARIA_SEMANAL_FIXA:
+            erros.append(
+                "A carga horária do período do FUNDEF é fixa em 20 horas semanais."
+            )
+    except ValueError:
+        erros.append("A carga horária deve ser numérica.")
+
+    if form.get("aceitou_declaracao") != "on":
+        erros.append("É necessário aceitar a declaração de veracidade.")
+
+    return erros, meses_calculados
+
+
+def normalizar_dados_formulario(dados: dict[str, str]) -> dict[str, str]:
+    dados_normalizados = dict(dados)
+    dados_normalizados["escola"] = normalizar_escola(dados_normalizados.get("escola", ""))
+    dados_normalizados["situacao_servidor"] = normalizar_situacao_servidor(
+        dados_normalizados.get("situacao_servidor", "")
+    )
+    dados_normalizados["carga_horaria"] = str(CARGA_HORARIA_SEMANAL_FIXA)
+    dados_normalizados["cpf"] = only_digits(dados_normalizados.get("cpf", ""))
+    return dados_normalizados
+
+
+def tentar_calcular_meses_validos(dados: dict[str, str]) -> int | None:
+    data_inicio = dados.get("data_inicio_fundef", "")
+    data_fim = dados.get("data_fim_fundef", "")
+    if not data_inicio or not data_fim:
+        return None
+
+    try:
+        data_inicio_dt = _parse_data_iso(data_inicio)
+        data_fim_dt = _parse_data_iso(data_fim)
+    except ValueError:
+        return None
+
+    if data_inicio_dt > data_fim_dt:
+        return None
+    if data_inicio_dt < FUNDEF_DATA_INICIAL or data_fim_dt > FUNDEF_DATA_FINAL:
+        return None
+
+    meses = calcular_meses_trabalhados(data_inicio_dt, data_fim_dt)
+    if meses < 1 or meses > 120:
+        return None
+    return meses
+
+
+def mapear_cabecalhos(cabecalhos: Iterable[Any]) -> list[str | None]:
+    """Traduz os cabeçalhos da planilha para os campos do cadastro (None = ignorar)."""
+    return [
+        ALIASES_COLUNAS_IMPORTACAO.get(c.strip().lower()) if isinstance(c, str) else None
+        for c in cabecalhos
+    ]
+
+
+def linha_para_payload(campos: list[str | None], valores: Iterable[Any]) -> dict[str, str]:
+    payload: dict[str, str] = {}
+    for campo, valor in zip(campos, valores):
+        if campo is not None:
+            payload[campo] = str(valor).strip() if valor else ""
+    return payload
+
+
+def hash_linha(payload: dict[str, str]) -> str:
+    """Impressão digital do conteúdo de uma linha importada, antes da normalização.
+
+    Não depende da ordem das colunas nem de colunas vazias: a mesma linha em
+    duas planilhas dá o mesmo hash.
+    """
+    conteudo = "\x1e".join(f"{campo}\x1f{valor}" for campo, valor in sorted(payload.items()) if valor)
+    return hashlib.blake2b(conteudo.encode(), digest_size=16).hexdigest()
+
+
+def preparar_linha_importacao(payload: dict[str, str]) -> tuple[dict[str, Any] | None, str | None]:
+    """Valida e normaliza uma linha importada.
+
+    Retorna ``(payload normalizado, None)`` ou ``(None, mensagem de erro)``.
+    Não consulta o banco: a checagem de CPF já cadastrado fica com quem chama.
+    """
+    faltam = [c for c in CAMPOS_OBRIGATORIOS_IMPORTACAO if not payload.get(c)]
+    if faltam:
+        return None, f"faltam campos {', '.join(faltam)}"
+
+    cpf_val = payload["cpf"]
+    cpf_limpo = only_digits(cpf_val)
+    if not cpf_valido(cpf_limpo):
+        return None, f"CPF inválido ({cpf_val})"
+
+    normalizado: dict[str, Any] = dict(payload)
+    normalizado["cpf"] = cpf_limpo
+    normalizado["escola"] = normalizar_escola(payload["escola"])
+    normalizado["situacao_servidor"] = normalizar_situacao_servidor(
+        payload.get("situacao_servidor", "Ativo")
+    )
+    normalizado["telefone"] = only_digits(payload.get("telefone", ""))
+    normalizado["carga_horaria"] = str(CARGA_HORARIA_SEMANAL_FIXA)
+    normalizado["quantidade_meses_trabalhados"] = tentar_calcular_meses_validos(payload) or 1
+    normalizado["aceitou_declaracao"] = 1
+    return normalizado, None
+
+
+def alteracoes_importacao(bruto: dict[str, str], payload: dict[str, Any]) -> dict[str, Any]:
+    """Campos que uma linha importada muda num cadastro já existente.
+
+    Só entram as colunas preenchidas na linha, com o valor normalizado de
+    ``payload``, e os meses trabalhados quando as duas datas vieram na linha.
+    Os padrões que ``preparar_linha_importacao`` preenche (telefone vazio,
+    situação "Ativo"...) não sobrescrevem o que está gravado.
+    """
+    alteracoes = {
+        campo: payload[campo]
+        for campo, valor in bruto.items()
+        if valor and campo in payload and campo not in ("id", "criado_em", "quantidade_meses_trabalhados")
+    }
+    if bruto.get("data_inicio_fundef") and bruto.get("data_fim_fundef"):
+        alteracoes["quantidade_meses_trabalhados"] = payload["quantidade_meses_trabalhados"]
+    return alteracoes
+
+
+def preparar_lote_importacao(
+    linhas: list[dict[str, str]],
+) -> list[tuple[str, dict[str, Any] | None, str | None]]:
+    """``(hash_linha, payload, erro)`` de cada linha, na ordem.
+
+    É a parte da importação que só usa CPU, executada nos processos de
+    ``importacao.preparar_em_processos``.
+    """
+    preparar = preparar_linha_importacao
+    return [(hash_linha(linha), *preparar(linha)) for linha in linhas]
+
+
+def validar_edicao_em_lote(campos: dict[str, Any]) -> tuple[dict[str, str], list[str]]:
+    """Normaliza as alterações de uma edição em lote.
+
+    Retorna ``(campos normalizados, erros)``; com erros, nada deve ser gravado.
+    """
+    erros: list[str] = []
+    normalizados: dict[str, str] = {}
+    for campo, valor in campos.items():
+        if campo not in CAMPOS_EDICAO_EM_LOTE:
+            erros.append(f"O campo {campo} não pode ser alterado em lote.")
+            continue
+        texto = str(valor or "").strip()
+        if not texto:
+            erros.append(f"{CAMPOS_EDICAO_EM_LOTE[campo]} é obrigatório.")
+            continue
+        normalizados[campo] = texto
+    if "escola" in normalizados:
+        normalizados["escola"] = normalizar_escola(normalizados["escola"])
+        if normalizados["escola"] not in _ESCOLAS_VALIDAS:
+            erros.append('O campo Local de Trabalho deve ser "Escola" ou "Seduc".')
+    if "situacao_servidor" in normalizados:
+        normalizados["situacao_servidor"] = normalizar_situacao_servidor(normalizados["situacao_servidor"])
+        if normalizados["situacao_servidor"] not in _SITUACOES_VALIDAS:
+            erros.append(
+                'A situação do servidor deve ser "Ativo", "Aposentado", "Falecido" ou "Sem vínculo".'
+            )
+    if not campos:
+        erros.append("Informe ao menos um campo para alterar.")
+    return normalizados, erros
+
+
+def validar_lote(
+    linhas: Iterable[dict[str, str]],
+) -> list[tuple[dict[str, Any] | None, str | None]]:
+    """Aplica ``preparar_linha_importacao`` a cada linha, preservando a ordem."""
+    preparar = preparar_linha_importacao
+    return [preparar(linha) for linha in linhas]
+
+
+class LoteCPF(NamedTuple):
+    validos: list[bool]
+    normalizados: list[str]
+    # índice (na entrada) da primeira ocorrência do mesmo CPF válido, ou None
+    duplicado_de: list[int | None]
+
+
+if np is not None:
+    # Colunas: pesos do 1º e do 2º dígito verificador; os dígitos fora de cada
+    # soma têm peso zero, assim as duas somas saem de um único produto matricial.
+    _MATRIZ_PESOS_DV = np.array(
+        [list(_PESOS_DV1) + [0, 0], list(_PESOS_DV2) + [0]], dtype=np.int64
+    ).T
+    _POTENCIAS_10 = 10 ** np.arange(10, -1, -1, dtype=np.int64)
+
+
+def validar_cpfs_lote(cpfs: Sequence[str]) -> LoteCPF:
+    """Valida e deduplica uma sequência de CPFs de uma vez.
+
+    Os dígitos verificadores são calculados com NumPy como um produto
+    ``(n, 11) @ (11, 2)``; duplicados são detectados entre os CPFs válidos
+    pelo valor numérico. Sem NumPy, cai na validação escalar.
+    """
+    normalizados = [only_digits(cpf) for cpf in cpfs]
+    if np is None:
+        return _validar_cpfs_lote_escalar(normalizados)
+
+    total = len(normalizados)
+    validos = np.zeros(total, dtype=bool)
+    duplicado_de = np.full(total, -1, dtype=np.int64)
+
+    com_11 = np.flatnonzero(np.fromiter((len(c) == 11 for c in normalizados), bool, total))
+    if com_11.size:
+        texto = "".join([normalizados[i] for i in com_11]).encode("ascii")
+        digitos = np.frombuffer(texto, dtype=np.uint8).reshape(-1, 11).astype(np.int64) - 48
+
+        verificadores = (digitos @ _MATRIZ_PESOS_DV) * 10 % 11 % 10
+        repetidos = (digitos == digitos[:, :1]).all(axis=1)
+        ok = (verificadores[:, 0] == digitos[:, 9]) & (verificadores[:, 1] == digitos[:, 10])
+        ok &= ~repetidos
+        validos[com_11] = ok
+
+        indices_validos = com_11[ok]
+        if indices_validos.size:
+            valores = digitos[ok] @ _POTENCIAS_10
+            _, primeiro, inverso = np.unique(valores, return_index=True, return_inverse=True)
+            primeira_ocorrencia = indices_validos[primeiro][inverso]
+            repetido = primeira_ocorrencia != indices_validos
+            duplicado_de[indices_validos[repetido]] = primeira_ocorrencia[repetido]
+
+    return LoteCPF(
+        validos=validos.tolist(),
+        normalizados=normalizados,
+        duplicado_de=[None if i < 0 else i for i in duplicado_de.tolist()],
+    )
+
+
+def _validar_cpfs_lote_escalar(normalizados: list[str]) -> LoteCPF:
+    validos: list[bool] = []
+    duplicado_de: list[int | None] = []
+    vistos: dict[str, int] = {}
+    for indice, cpf in enumerate(normalizados):
+        valido = cpf_valido(cpf)
+        validos.append(valido)
+        primeiro = vistos.setdefault(cpf, indice) if valido else indice
+        duplicado_de.append(None if primeiro == indice else primeiro)
+    return LoteCPF(validos=validos, normalizados=normalizados, duplicado_de=duplicado_de)